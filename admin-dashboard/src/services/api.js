@@ -24,6 +24,10 @@ export const adminApi = {
   createCategory: (data) => api.post('/products/admin/categories/', data, { headers: { 'Content-Type': 'multipart/form-data' } }),
   updateCategory: (id, data) => api.patch(`/products/admin/categories/${id}/`, data, { headers: { 'Content-Type': 'multipart/form-data' } }),
   deleteCategory: (id) => api.delete(`/products/admin/categories/${id}/`),
+
+  // Scent notes
+  getNotes: (params) => api.get('/products/admin/notes/', { params }),
+  mergeNotes: (id, sources) => api.post(`/products/admin/notes/${id}/merge/`, { sources }),
 };
 
 export default api;
@@ -4,7 +4,7 @@ from rest_framework import viewsets, filters, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from orders.models import Order, OrderItem
-from products.models import Product
+from products.models import Product, ProductDailyViews
 from crm.models import CustomerProfile
 from django.utils import timezone
 from datetime import timedelta
@@ -58,6 +58,12 @@ class DashboardStatsView(APIView):
             .annotate(total_sold=Sum('quantity'), revenue=Sum('total_price')) \
             .order_by('-total_sold')[:5]
 
+        # Most Viewed (daily rollups flushed by products.counters)
+        most_viewed = ProductDailyViews.objects.filter(date__gte=this_month_start.date()) \
+            .values('product__name_ar', 'product__slug') \
+            .annotate(views=Sum('views')) \
+            .order_by('-views')[:5]
+
         # City Sales
         city_sales = Order.objects.values('city') \
             .annotate(revenue=Sum('total'), count=Count('id')) \
@@ -86,6 +92,7 @@ class DashboardStatsView(APIView):
             },
             'monthly_sales': monthly_sales,
             'top_products': top_products,
+            'most_viewed': most_viewed,
             'city_sales': city_sales,
             'customer_segments': customer_segments,
             'recent_orders': OrderSerializer(recent_orders, many=True).data
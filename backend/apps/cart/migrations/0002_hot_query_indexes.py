@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cartitem",
+            name="cart",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="items",
+                to="cart.cart",
+                verbose_name="السلة",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cartitem",
+            index=models.Index(fields=["cart", "variant"], name="cart_item_lookup_idx"),
+        ),
+    ]
@@ -18,7 +18,8 @@ class Cart(models.Model):
         return f"سلة جلسة {self.session_key}"
 
 class CartItem(models.Model):
-    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items', verbose_name="السلة")
+    # Indexed by cart_item_lookup_idx below
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items', verbose_name="السلة", db_index=False)
     variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, verbose_name="العبوة")
     quantity = models.PositiveIntegerField(default=1, verbose_name="الكمية")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -26,3 +27,5 @@ class CartItem(models.Model):
     class Meta:
         verbose_name = "عنصر في السلة"
         verbose_name_plural = "عناصر السلة"
+        # Session carts are looked up through Cart.session_key's unique index
+        indexes = [models.Index(fields=['cart', 'variant'], name='cart_item_lookup_idx')]
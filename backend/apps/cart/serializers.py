@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
 from products.serializers import ProductVariantSerializer
+from products.fastpath import FastPathMixin
 
 class CartItemSerializer(serializers.ModelSerializer):
     variant = ProductVariantSerializer(read_only=True)
@@ -14,7 +15,7 @@ class CartItemSerializer(serializers.ModelSerializer):
     def get_total_price(self, obj):
         return obj.variant.current_price * obj.quantity
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(FastPathMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_amount = serializers.SerializerMethodField()
 
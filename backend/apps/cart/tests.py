@@ -1,4 +1,5 @@
 from django.urls import reverse
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
@@ -71,3 +72,23 @@ class CartTests(APITestCase):
         response = self.client.delete(self.url_clear)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['items']), 0)
+
+
+class CartFastSerializerTests(APITestCase):
+    def setUp(self):
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        for i in range(3):
+            product = Product.objects.create(name_ar=f'منتج {i}', slug=f'product-{i}', brand=brand, gender='unisex')
+            variant = ProductVariant.objects.create(
+                product=product, size_ml=100, price=100 + i, sale_price=80 if i == 1 else None, stock_quantity=10, sku=f'CART-FAST-{i}'
+            )
+            self.client.post(reverse('cart-add-item'), {'variant_id': variant.id, 'quantity': i + 1})
+
+    def test_cart_is_byte_identical(self):
+        contents = []
+        for fast in (False, True):
+            with override_settings(FAST_SERIALIZERS=fast):
+                response = self.client.get(reverse('cart-list'))
+            self.assertEqual(len(response.data['items']), 3)
+            contents.append(response.content)
+        self.assertEqual(contents[0], contents[1])
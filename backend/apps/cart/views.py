@@ -1,13 +1,14 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.db.models import prefetch_related_objects
 from .models import Cart, CartItem
 from .serializers import CartSerializer, CartItemSerializer
 from products.models import ProductVariant
 
 class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
-    queryset = Cart.objects.all()
+    queryset = Cart.objects.prefetch_related('items__variant__product')
     permission_classes = [permissions.AllowAny]
     authentication_classes = []  # Allow anonymous access (session-based carts)
 
@@ -25,6 +26,7 @@ class CartViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         cart = self.get_cart()
+        prefetch_related_objects([cart], 'items__variant__product')
         serializer = self.get_serializer(cart)
         return Response(serializer.data)
 
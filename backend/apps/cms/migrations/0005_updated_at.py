@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cms", "0004_alter_heroslide_button_link_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="banner",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="heroslide",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="storesettings",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -17,6 +17,7 @@ class HeroSlide(models.Model):
     
     start_date = models.DateTimeField(null=True, blank=True, verbose_name="بداية العرض")
     end_date = models.DateTimeField(null=True, blank=True, verbose_name="نهاية العرض")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "سلايدر العرض"
@@ -38,6 +39,7 @@ class Banner(models.Model):
     link = models.CharField(max_length=200, verbose_name="الرابط")
     position = models.CharField(max_length=20, choices=POSITION_CHOICES, verbose_name="المكان")
     is_active = models.BooleanField(default=True, verbose_name="نشط")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "بانر"
@@ -56,6 +58,7 @@ class StoreSettings(models.Model):
     facebook_link = models.URLField(blank=True, verbose_name="رابط فيسبوك")
     instagram_link = models.URLField(blank=True, verbose_name="رابط انستغرام")
     tiktok_link = models.URLField(blank=True, verbose_name="رابط تيك توك")
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "إعدادات المتجر"
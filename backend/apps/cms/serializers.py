@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from .models import HeroSlide, Banner, StoreSettings
+from products.images import SrcsetField
 
 class HeroSlideSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField(source='image')
+    image_mobile_srcset = SrcsetField(source='image_mobile')
+
     class Meta:
         model = HeroSlide
         fields = '__all__'
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from products.cache import bump_generation_on_commit
+from products.images import image_fields_changed, image_fields_deleted
+from .models import HeroSlide, Banner, StoreSettings
+
+@receiver(post_save, sender=HeroSlide)
+@receiver(post_delete, sender=HeroSlide)
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+@receiver(post_save, sender=StoreSettings)
+@receiver(post_delete, sender=StoreSettings)
+def cms_changed(sender, **kwargs):
+    # Invalidates the ETags handed out by the cms endpoints
+    bump_generation_on_commit('cms')
+
+post_save.connect(image_fields_changed, sender=HeroSlide, dispatch_uid='image-derivatives-HeroSlide')
+post_delete.connect(image_fields_deleted, sender=HeroSlide, dispatch_uid='image-derivatives-delete-HeroSlide')
@@ -65,3 +65,24 @@ class CMSTests(APITestCase):
         url = reverse('heroslide-list')
         response = self.client.post(url, {}) # POST should be protected
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_conditional_get(self):
+        Banner.objects.create(title='بنر', image='cms/banners/a.gif', link='/', position='home_top')
+        url = reverse('banner-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag, modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        settings_url = reverse('settings-list')
+        settings_etag = self.client.get(settings_url)['ETag']
+        self.settings.store_name = 'المصطفى للعطور'
+        self.settings.save()
+        response = self.client.get(settings_url, HTTP_IF_NONE_MATCH=settings_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['store_name'], 'المصطفى للعطور')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
@@ -1,8 +1,16 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
+from django.db.models import Max
+from products.cache import conditional_response
 from .models import HeroSlide, Banner, StoreSettings
 from .serializers import HeroSlideSerializer, BannerSerializer, StoreSettingsSerializer
 
+def cms_last_modified(view, request, kwargs):
+    qs = view.get_queryset()
+    if 'pk' in kwargs:
+        qs = qs.filter(pk=kwargs['pk'])
+    return qs.order_by().aggregate(changed=Max('updated_at'))['changed']
+
 class HeroSlideViewSet(viewsets.ModelViewSet):
     queryset = HeroSlide.objects.all()
     serializer_class = HeroSlideSerializer
@@ -20,6 +28,9 @@ class HeroSlideViewSet(viewsets.ModelViewSet):
             return HeroSlide.objects.all()
         return HeroSlide.objects.filter(is_active=True)
 
+    list = conditional_response(cms_last_modified, namespace='cms')(viewsets.ModelViewSet.list)
+    retrieve = conditional_response(cms_last_modified, namespace='cms')(viewsets.ModelViewSet.retrieve)
+
 class BannerViewSet(viewsets.ModelViewSet):
     queryset = Banner.objects.all()
     serializer_class = BannerSerializer
@@ -37,6 +48,9 @@ class BannerViewSet(viewsets.ModelViewSet):
             return Banner.objects.all()
         return Banner.objects.filter(is_active=True)
 
+    list = conditional_response(cms_last_modified, namespace='cms')(viewsets.ModelViewSet.list)
+    retrieve = conditional_response(cms_last_modified, namespace='cms')(viewsets.ModelViewSet.retrieve)
+
 class StoreSettingsViewSet(viewsets.ModelViewSet):
     queryset = StoreSettings.objects.all()
     serializer_class = StoreSettingsSerializer
@@ -50,6 +64,7 @@ class StoreSettingsViewSet(viewsets.ModelViewSet):
             return []
         return super().get_authenticators()
 
+    @conditional_response(cms_last_modified, namespace='cms')
     def list(self, request, *args, **kwargs):
         settings = StoreSettings.objects.first()
         if not settings:
@@ -57,6 +72,8 @@ class StoreSettingsViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(settings)
         return Response(serializer.data)
 
+    retrieve = conditional_response(cms_last_modified, namespace='cms')(viewsets.ModelViewSet.retrieve)
+
     def create(self, request, *args, **kwargs):
         return Response({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
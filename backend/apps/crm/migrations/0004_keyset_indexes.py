@@ -0,0 +1,31 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0003_alter_customerprofile_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customerprofile",
+            index=models.Index(
+                fields=["created_at", "id"], name="crm_custome_created_4d5c19_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customerprofile",
+            index=models.Index(
+                fields=["total_spent", "id"], name="crm_custome_total_s_1a0c59_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customerprofile",
+            index=models.Index(
+                fields=["last_order_date", "id"], name="crm_custome_last_or_976114_idx"
+            ),
+        ),
+    ]
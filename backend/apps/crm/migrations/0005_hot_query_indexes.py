@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0004_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customerprofile",
+            index=models.Index(fields=["phone"], name="customer_phone_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="customerprofile",
+            index=models.Index(
+                fields=["segment", "created_at"], name="customer_segment_created_idx"
+            ),
+        ),
+    ]
@@ -63,6 +63,14 @@ class CustomerProfile(models.Model):
         verbose_name_plural = "ملفات العملاء"
         unique_together = ('name', 'phone')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['total_spent', 'id']),
+            models.Index(fields=['last_order_date', 'id']),
+            # unique_together leads with name, so phone lookups need their own
+            models.Index(fields=['phone'], name='customer_phone_idx'),
+            models.Index(fields=['segment', 'created_at'], name='customer_segment_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.phone}"
@@ -1,14 +1,17 @@
 from rest_framework import serializers
 from .models import CustomerProfile, CustomerTag, CustomerInteraction
 from products.models import Brand, FragranceFamily
+from products.fieldsets import SparseFieldsetMixin
 
 class CustomerTagSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomerTag
         fields = '__all__'
 
-class CustomerInteractionSerializer(serializers.ModelSerializer):
+class CustomerInteractionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     created_by_name = serializers.ReadOnlyField(source='created_by.get_full_name')
+
+    related_paths = {'created_by': 'created_by', 'created_by_name': 'created_by'}
     
     class Meta:
         model = CustomerInteraction
@@ -18,19 +21,32 @@ class CustomerInteractionSerializer(serializers.ModelSerializer):
             'created_by': {'read_only': True}
         }
 
-class CustomerProfileSerializer(serializers.ModelSerializer):
+class CustomerProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tags_display = CustomerTagSerializer(source='tags', many=True, read_only=True)
-    interactions_count = serializers.IntegerField(source='interactions.count', read_only=True)
+    interactions_count = serializers.SerializerMethodField()
+
+    related_paths = {'tags': 'tags', 'tags_display': 'tags', 'favorite_brands': 'favorite_brands', 'favorite_families': 'favorite_families'}
     
     class Meta:
         model = CustomerProfile
         fields = '__all__'
 
+    def get_interactions_count(self, obj):
+        # Annotated by CustomerProfileViewSet; nested profiles count their own
+        if hasattr(obj, 'interactions_count'):
+            return obj.interactions_count
+        return obj.interactions.count()
+
 class CustomerProfileDetailSerializer(CustomerProfileSerializer):
     interactions = CustomerInteractionSerializer(many=True, read_only=True)
     orders = serializers.SerializerMethodField()
     favorite_brands_display = serializers.StringRelatedField(source='favorite_brands', many=True)
     favorite_families_display = serializers.StringRelatedField(source='favorite_families', many=True)
+
+    related_paths = {
+        **CustomerProfileSerializer.related_paths, 'interactions': 'interactions',
+        'favorite_brands_display': 'favorite_brands', 'favorite_families_display': 'favorite_families',
+    }
     
     class Meta(CustomerProfileSerializer.Meta):
         fields = '__all__'
@@ -38,5 +54,5 @@ class CustomerProfileDetailSerializer(CustomerProfileSerializer):
     def get_orders(self, obj):
         from orders.serializers import OrderSerializer
         from orders.models import Order
-        orders = Order.objects.filter(customer=obj).order_by('-created_at')
+        orders = Order.objects.filter(customer=obj).prefetch_related('items', 'status_history').order_by('-created_at')
         return OrderSerializer(orders, many=True).data
@@ -1,7 +1,10 @@
 from rest_framework import viewsets, filters, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db.models import Count
 from django_filters.rest_framework import DjangoFilterBackend
+from products.pagination import KeysetPagination
+from products.fieldsets import SparseFieldsetViewMixin
 from .models import CustomerProfile, CustomerTag, CustomerInteraction
 from .serializers import (
     CustomerProfileSerializer, 
@@ -16,7 +19,7 @@ class CustomerTagViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAdminUser]
 
 class CustomerInteractionViewSet(viewsets.ModelViewSet):
-    queryset = CustomerInteraction.objects.all()
+    queryset = CustomerInteraction.objects.select_related('created_by')
     serializer_class = CustomerInteractionSerializer
     permission_classes = [permissions.IsAdminUser]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -26,13 +29,16 @@ class CustomerInteractionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class CustomerProfileViewSet(viewsets.ModelViewSet):
-    queryset = CustomerProfile.objects.all()
+class CustomerProfileViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    # interactions_count in one query instead of one per row
+    queryset = CustomerProfile.objects.annotate(interactions_count=Count('interactions', distinct=True))
     permission_classes = [permissions.IsAdminUser]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['segment', 'city', 'tags']
     search_fields = ['name', 'phone', 'email']
     ordering_fields = ['total_spent', 'total_orders', 'last_order_date', 'created_at']
+    pagination_class = KeysetPagination
+    cursor_ordering_fields = ['created_at', 'total_spent', 'last_order_date']
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
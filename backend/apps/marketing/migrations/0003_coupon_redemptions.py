@@ -0,0 +1,90 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0007_idempotency_keys"),
+        ("crm", "0005_hot_query_indexes"),
+        ("marketing", "0002_alter_coupon_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="coupon",
+            name="per_customer_limit",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="حد الاستخدام لكل عميل"
+            ),
+        ),
+        migrations.CreateModel(
+            name="CouponRedemption",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "customer_phone",
+                    models.CharField(max_length=20, verbose_name="رقم الهاتف"),
+                ),
+                (
+                    "discount_amount",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=10, verbose_name="قيمة الخصم"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "coupon",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="redemptions",
+                        to="marketing.coupon",
+                        verbose_name="الكوبون",
+                    ),
+                ),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="coupon_redemptions",
+                        to="crm.customerprofile",
+                        verbose_name="العميل",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="coupon_redemptions",
+                        to="orders.order",
+                        verbose_name="الطلب",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "استخدام كوبون",
+                "verbose_name_plural": "استخدامات الكوبونات",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["coupon", "customer_phone"],
+                        name="redemption_customer_idx",
+                    )
+                ],
+            },
+        ),
+    ]
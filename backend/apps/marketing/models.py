@@ -15,6 +15,7 @@ class Coupon(models.Model):
     
     usage_limit = models.PositiveIntegerField(null=True, blank=True, verbose_name="حد الاستخدام")
     used_count = models.PositiveIntegerField(default=0, verbose_name="مرات الاستخدام")
+    per_customer_limit = models.PositiveIntegerField(null=True, blank=True, verbose_name="حد الاستخدام لكل عميل")
     
     valid_from = models.DateTimeField(verbose_name="صالح من")
     valid_to = models.DateTimeField(verbose_name="صالح إلى")
@@ -37,3 +38,25 @@ class Coupon(models.Model):
             self.valid_from <= now <= self.valid_to and
             (self.usage_limit is None or self.used_count < self.usage_limit)
         )
+
+
+class CouponRedemption(models.Model):
+    """One use of a coupon by one order (see marketing.redemption)."""
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='redemptions', verbose_name="الكوبون")
+    order = models.ForeignKey('orders.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='coupon_redemptions', verbose_name="الطلب")
+    customer = models.ForeignKey('crm.CustomerProfile', on_delete=models.SET_NULL, null=True, blank=True, related_name='coupon_redemptions', verbose_name="العميل")
+    # Per-customer limits count by phone, as checkout identifies customers
+    customer_phone = models.CharField(max_length=20, verbose_name="رقم الهاتف")
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="قيمة الخصم")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "استخدام كوبون"
+        verbose_name_plural = "استخدامات الكوبونات"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['coupon', 'customer_phone'], name='redemption_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.coupon.code} - {self.customer_phone}"
@@ -0,0 +1,105 @@
+"""
+Coupon lookups and redemption.
+
+``get_coupon`` reads coupon definitions through the cache for
+``COUPON_CACHE_TIMEOUT`` seconds (default 60). Every save or delete of a
+coupon clears its entry (marketing.signals), so the cart page's
+``validate`` calls do not reach the database. The cached ``used_count``
+may trail the real one by the timeout. Validation only advises, though;
+``redeem`` decides.
+
+``redeem`` claims one use with a single conditional statement:
+
+    UPDATE coupon SET used_count = used_count + 1
+    WHERE id = ... AND code = ... AND is_active AND valid_from <= now <= valid_to
+      AND (usage_limit IS NULL OR used_count < usage_limit)
+
+No parallel checkout can take the last use twice, and no increment is
+lost. Matching the code as well as the id refuses a renamed code whose
+old definition is still cached somewhere. The same statement also locks
+the coupon row until the order commits. The per-customer count that
+follows therefore sees every earlier redemption of the code, even on
+PostgreSQL under READ COMMITTED.
+Each use is recorded as a ``CouponRedemption`` row, which is also the
+audit trail. A refusal raises ``CouponError`` and takes back the claimed
+use.
+"""
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Coupon, CouponRedemption
+
+KEY = 'coupon:{code}'
+# Cached for unknown codes too, so guessing does not reach the database
+MISSING = 'missing'
+
+
+class CouponError(Exception):
+    pass
+
+
+def cache_timeout():
+    return getattr(settings, 'COUPON_CACHE_TIMEOUT', 60)
+
+
+def get_coupon(code):
+    """The coupon with ``code``, or None; cached."""
+    if not code:
+        return None
+    key = KEY.format(code=code)
+    coupon = cache.get(key)
+    if coupon is None:
+        coupon = Coupon.objects.filter(code=code).first() or MISSING
+        cache.set(key, coupon, cache_timeout())
+    return None if coupon == MISSING else coupon
+
+
+def forget(code):
+    cache.delete(KEY.format(code=code))
+
+
+def discount_for(coupon, subtotal):
+    if coupon.discount_type == 'percentage':
+        discount = (subtotal * Decimal(str(coupon.discount_value))) / Decimal('100.00')
+        if coupon.max_discount_amount:
+            discount = min(discount, coupon.max_discount_amount)
+        return discount
+    return Decimal(str(coupon.discount_value))
+
+
+def redeem(code, subtotal, customer_phone):
+    """
+    Claim one use of ``code`` for an order of ``subtotal``; returns the
+    coupon and the discount. Call ``record`` once the order exists, in the
+    same transaction.
+    """
+    coupon = get_coupon(code)
+    if coupon is None:
+        raise CouponError('الكوبون غير صحيح')
+    if subtotal < coupon.min_order_amount:
+        raise CouponError(f'الحد الأدنى للطلب لاستخدام هذا الكوبون هو {coupon.min_order_amount}')
+
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = Coupon.objects.filter(
+            Q(usage_limit__isnull=True) | Q(used_count__lt=F('usage_limit')),
+            id=coupon.id, code=code, is_active=True, valid_from__lte=now, valid_to__gte=now,
+        ).update(used_count=F('used_count') + 1)
+        if not claimed:
+            raise CouponError('الكوبون منتهي الصلاحية أو غير نشط')
+        if coupon.per_customer_limit is not None:
+            used = CouponRedemption.objects.filter(coupon_id=coupon.id, customer_phone=customer_phone).count()
+            if used >= coupon.per_customer_limit:
+                # Leaving the block with the error gives the use back
+                raise CouponError('لقد استخدمت هذا الكوبون من قبل')
+    return coupon, discount_for(coupon, subtotal)
+
+
+def record(coupon, order, discount_amount):
+    return CouponRedemption.objects.create(
+        coupon=coupon, order=order, customer_id=order.customer_id,
+        customer_phone=order.customer_phone, discount_amount=discount_amount,
+    )
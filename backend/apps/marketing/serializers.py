@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Coupon
+from .models import Coupon, CouponRedemption
 
 class CouponSerializer(serializers.ModelSerializer):
     is_valid_now = serializers.ReadOnlyField(source='is_valid')
@@ -7,3 +7,11 @@ class CouponSerializer(serializers.ModelSerializer):
     class Meta:
         model = Coupon
         fields = '__all__'
+
+
+class CouponRedemptionSerializer(serializers.ModelSerializer):
+    order_number = serializers.CharField(source='order.order_number', read_only=True, default=None)
+
+    class Meta:
+        model = CouponRedemption
+        fields = ['id', 'order', 'order_number', 'customer', 'customer_phone', 'discount_amount', 'created_at']
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Coupon
+from .redemption import forget
+
+@receiver(pre_save, sender=Coupon)
+def coupon_previous_code(sender, instance, raw=False, **kwargs):
+    # A renamed code must leave the cache too
+    if instance.pk and not raw:
+        instance._previous_code = Coupon.objects.filter(pk=instance.pk).values_list('code', flat=True).first()
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def coupon_changed(sender, instance, **kwargs):
+    codes = {instance.code, getattr(instance, '_previous_code', None)} - {None}
+    # Now, and again after commit so a read in between cannot re-cache the old row
+    for code in codes:
+        forget(code)
+    transaction.on_commit(lambda: [forget(code) for code in codes])
@@ -1,8 +1,18 @@
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import cache
+from django.db import connections
 from django.urls import reverse
+from django.test import TransactionTestCase
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from django.contrib.auth.models import User
-from .models import Coupon
+from orders.models import Order
+from products.models import Brand, Product, ProductVariant
+from .models import Coupon, CouponRedemption
+from . import redemption
 
 class MarketingTests(APITestCase):
     def setUp(self):
@@ -68,3 +78,128 @@ class MarketingTests(APITestCase):
         url = reverse('coupon-validate')
         response = self.client.post(url, {'code': 'NOTREAL', 'cart_total': 100.0})
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def checkout(client, variant, phone, code):
+    return client.post(reverse('order-list'), {
+        'customer_name': 'عميل', 'customer_phone': phone, 'city': 'طرابلس', 'address': 'شارع 1',
+        'items': [{'variant_id': variant.id, 'quantity': 1}], 'coupon_code': code,
+    }, format='json')
+
+
+class CouponRedemptionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_superuser(username='admin', password='password', email='admin@example.com')
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        self.variant = ProductVariant.objects.create(product=product, size_ml=100, price=200, stock_quantity=10, sku='CPN-1')
+        self.coupon = Coupon.objects.create(
+            code='ONCE', discount_type='percentage', discount_value=10, per_customer_limit=1,
+            valid_from='2020-01-01', valid_to='2030-01-01',
+        )
+
+    def test_checkout_records_redemption(self):
+        response = checkout(self.client, self.variant, '0911111111', 'ONCE')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        row = CouponRedemption.objects.get()
+        self.assertEqual(row.order.order_number, response.data['order_number'])
+        self.assertEqual(row.customer_phone, '0911111111')
+        self.assertEqual(row.discount_amount, 20)
+        self.assertEqual(row.order.discount_amount, 20)
+
+    def test_per_customer_limit_rolls_back_checkout(self):
+        self.assertEqual(checkout(self.client, self.variant, '0911111111', 'ONCE').status_code, status.HTTP_201_CREATED)
+        response = checkout(self.client, self.variant, '0911111111', 'ONCE')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock_quantity, 9)
+        self.assertEqual(Order.objects.count(), 1)
+        # Another customer still gets it
+        self.assertEqual(checkout(self.client, self.variant, '0922222222', 'ONCE').status_code, status.HTTP_201_CREATED)
+
+    def test_exhausted_coupon_is_refused(self):
+        self.coupon.usage_limit = self.coupon.used_count = 1
+        self.coupon.save()
+        response = checkout(self.client, self.variant, '0911111111', 'ONCE')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock_quantity, 10)
+
+    def test_validate_reads_cached_coupon(self):
+        url = reverse('coupon-validate')
+        self.client.post(url, {'code': 'ONCE', 'cart_total': 100.0})
+        self.client.post(url, {'code': 'NOPE', 'cart_total': 100.0})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.post(url, {'code': 'ONCE', 'cart_total': 100.0}).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.post(url, {'code': 'NOPE', 'cart_total': 100.0}).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.coupon.is_active = False
+        self.coupon.save()
+        self.assertEqual(self.client.post(url, {'code': 'ONCE', 'cart_total': 100.0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_renamed_code_is_evicted_and_refused(self):
+        self.assertIsNotNone(redemption.get_coupon('ONCE'))
+        self.coupon.code = 'TWICE'
+        self.coupon.save()
+        self.assertIsNone(redemption.get_coupon('ONCE'))
+        self.assertEqual(checkout(self.client, self.variant, '0911111111', 'ONCE').status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Even with the old definition still cached (another process's cache, say)
+        cache.set(redemption.KEY.format(code='ONCE'), self.coupon, 60)
+        self.assertEqual(checkout(self.client, self.variant, '0911111111', 'ONCE').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(checkout(self.client, self.variant, '0911111111', 'TWICE').status_code, status.HTTP_201_CREATED)
+
+    def test_redemptions_admin(self):
+        checkout(self.client, self.variant, '0911111111', 'ONCE')
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(reverse('coupon-redemptions', args=['ONCE']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['customer_phone'], '0911111111')
+
+
+class CouponConcurrencyTests(TransactionTestCase):
+    def test_parallel_checkouts_respect_usage_limit(self):
+        cache.clear()
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        variant = ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=500, sku='CPN-RACE')
+        Coupon.objects.create(
+            code='RACE', discount_type='fixed', discount_value=10, usage_limit=25,
+            valid_from='2020-01-01', valid_to='2030-01-01',
+        )
+
+        def place(number):
+            client = APIClient(raise_request_exception=False)
+            try:
+                for attempt in range(200):
+                    response = checkout(client, variant, f'09{number:08d}', 'RACE')
+                    if response.status_code == 201:
+                        return 'placed'
+                    if response.status_code == 400 and 'الكوبون' in str(response.data.get('error', '')):
+                        return 'refused'
+                    # Lock contention; the whole checkout rolled back
+                    time.sleep(random.uniform(0, 0.002 * 2 ** min(attempt, 7)))
+                return 'failed'
+            finally:
+                connections.close_all()
+
+        logging.disable(logging.ERROR)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            outcomes = list(pool.map(place, range(100)))
+
+        self.assertEqual(outcomes.count('failed'), 0)
+        self.assertEqual(outcomes.count('placed'), 25)
+        self.assertEqual(outcomes.count('refused'), 75)
+        self.assertEqual(Coupon.objects.get(code='RACE').used_count, 25)
+        self.assertEqual(CouponRedemption.objects.count(), 25)
+        self.assertEqual(Order.objects.filter(coupon__code='RACE').count(), 25)
+        self.assertEqual(Order.objects.filter(coupon__isnull=True).count(), 0)
+        self.assertEqual(ProductVariant.objects.get(id=variant.id).stock_quantity, 475)
@@ -2,7 +2,8 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Coupon
-from .serializers import CouponSerializer
+from .serializers import CouponRedemptionSerializer, CouponSerializer
+from .redemption import get_coupon
 from django.utils import timezone
 
 class CouponViewSet(viewsets.ModelViewSet):
@@ -19,23 +20,31 @@ class CouponViewSet(viewsets.ModelViewSet):
         code = request.data.get('code')
         cart_total = float(request.data.get('cart_total', 0))
         
-        try:
-            coupon = Coupon.objects.get(code=code)
-            if not coupon.is_valid:
-                return Response({'valid': False, 'message': 'الكوبون منتهي الصلاحية أو غير نشط'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if cart_total < coupon.min_order_amount:
-                return Response({
-                    'valid': False, 
-                    'message': f'الحد الأدنى للطلب لاستخدام هذا الكوبون هو {coupon.min_order_amount}'
-                }, status=status.HTTP_400_BAD_REQUEST)
-                
+        # Cached; checkout's redemption makes the binding check
+        coupon = get_coupon(code)
+        if coupon is None:
+            return Response({'valid': False, 'message': 'الكوبون غير صحيح'}, status=status.HTTP_404_NOT_FOUND)
+        if not coupon.is_valid:
+            return Response({'valid': False, 'message': 'الكوبون منتهي الصلاحية أو غير نشط'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if cart_total < coupon.min_order_amount:
             return Response({
-                'valid': True,
-                'discount_type': coupon.discount_type,
-                'discount_value': coupon.discount_value,
-                'max_discount': coupon.max_discount_amount
-            })
+                'valid': False, 
+                'message': f'الحد الأدنى للطلب لاستخدام هذا الكوبون هو {coupon.min_order_amount}'
+            }, status=status.HTTP_400_BAD_REQUEST)
             
-        except Coupon.DoesNotExist:
-            return Response({'valid': False, 'message': 'الكوبون غير صحيح'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'valid': True,
+            'discount_type': coupon.discount_type,
+            'discount_value': coupon.discount_value,
+            'max_discount': coupon.max_discount_amount
+        })
+
+    @action(detail=True, methods=['get'])
+    def redemptions(self, request, code=None):
+        coupon = self.get_object()
+        queryset = coupon.redemptions.select_related('order')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(CouponRedemptionSerializer(page, many=True).data)
+        return Response(CouponRedemptionSerializer(queryset, many=True).data)
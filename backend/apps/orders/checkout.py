@@ -0,0 +1,152 @@
+"""
+Checkout engine: turns the requested lines into reserved stock and order items.
+
+``quantities`` validates the request and merges repeated variant ids.
+``reserve`` then takes the stock in a single conditional statement:
+
+    UPDATE variant SET stock_quantity = stock_quantity - CASE id ... END
+    WHERE id IN (...) AND stock_quantity >= CASE id ... END
+
+The database checks the stock and decrements it in the same step, so two
+checkouts cannot both see the last unit in stock. If fewer rows change
+than were requested, a variant is missing or short. The savepoint is
+rolled back, and only then is the stock read again for the
+``CheckoutError`` that says which one. On success the
+variants and their products are read in one query and priced.
+
+The view makes this UPDATE the first statement of its transaction. On
+SQLite a transaction that writes first waits on the busy timeout for the
+database lock. One that reads first fails at once when another
+connection is already writing. On backends with row locks (PostgreSQL)
+the rows are first locked with ``SELECT ... FOR UPDATE`` in id order.
+This keeps two multi-item orders from deadlocking each other. Under READ
+COMMITTED the UPDATE re-checks its WHERE clause against the row the
+other transaction committed.
+
+``create_items`` writes the order items with one ``bulk_create``, and
+``record_customer_order`` updates the customer totals with F()
+expressions rather than read-modify-write. Neither the reservation nor
+``bulk_create`` sends signals. The product price summaries and the caches
+are therefore refreshed here, once per checkout.
+"""
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from products import detail
+from products.cache import bump_generation_on_commit
+from products.models import Product, ProductVariant
+from crm.models import CustomerProfile
+from .models import OrderItem
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+    def response(self):
+        return Response({'error': self.message}, status=self.status_code)
+
+
+class _Short(Exception):
+    pass
+
+
+class Line:
+    __slots__ = ('variant', 'quantity', 'unit_price', 'total_price')
+
+    def __init__(self, variant, quantity):
+        price = variant.current_price
+        self.variant = variant
+        self.quantity = quantity
+        self.unit_price = price if isinstance(price, Decimal) else Decimal(str(price))
+        self.total_price = self.unit_price * quantity
+
+
+def quantities(items_data):
+    """``{variant id: quantity}`` in request order, repeated variants summed."""
+    wanted = {}
+    try:
+        for item in items_data:
+            variant_id, quantity = int(item['variant_id']), int(item['quantity'])
+            if quantity <= 0:
+                raise CheckoutError('الكمية يجب أن تكون رقماً موجباً')
+            wanted[variant_id] = wanted.get(variant_id, 0) + quantity
+    except (KeyError, TypeError, ValueError):
+        raise CheckoutError('حدث خطأ في معالجة المنتجات')
+    return wanted
+
+
+def _on_sale():
+    return ProductVariant.objects.filter(is_active=True, product__is_active=True)
+
+
+def _refusal(wanted):
+    variants = _on_sale().filter(id__in=wanted).select_related('product').in_bulk()
+    if len(variants) != len(wanted):
+        return CheckoutError('المنتج المحدد غير موجود', status.HTTP_404_NOT_FOUND)
+    short = next((variants[variant_id] for variant_id, n in wanted.items() if variants[variant_id].stock_quantity < n), None)
+    if short is None:
+        # Stock came back between the UPDATE and this read
+        return CheckoutError('عذراً، بعض المنتجات المطلوبة غير متوفرة حالياً، يرجى المحاولة مرة أخرى')
+    return CheckoutError(
+        f'عذراً، الكمية المطلوبة من {short.product.name_ar} ({short.size_ml}مل) غير متوفرة حالياً. المتاح: {short.stock_quantity}'
+    )
+
+
+def reserve(wanted):
+    """Take the stock for every variant in ``wanted`` or for none; the priced lines."""
+    quantity = Case(*[When(id=variant_id, then=Value(n)) for variant_id, n in wanted.items()], output_field=IntegerField())
+    try:
+        with transaction.atomic():
+            if connection.features.has_select_for_update:
+                list(ProductVariant.objects.select_for_update().filter(id__in=wanted).order_by('id').values_list('id', flat=True))
+            reserved = _on_sale().filter(id__in=wanted, stock_quantity__gte=quantity).update(
+                stock_quantity=F('stock_quantity') - quantity, updated_at=timezone.now(),
+            )
+            if reserved != len(wanted):
+                # Leaving the block undoes the rows that were taken
+                raise _Short
+    except _Short:
+        # Read after the rollback, or the partial decrements would show
+        raise _refusal(wanted)
+
+    variants = ProductVariant.objects.filter(id__in=wanted).select_related('product').in_bulk()
+    lines = [Line(variants[variant_id], n) for variant_id, n in wanted.items()]
+    product_ids = {line.variant.product_id for line in lines}
+    Product.objects.refresh_price_summary(product_ids)
+    bump_generation_on_commit()
+    detail.invalidate(product_ids)
+    return lines
+
+
+def create_items(order, lines):
+    return OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            variant=line.variant,
+            product_name=line.variant.product.name_ar,
+            variant_size=line.variant.size_ml,
+            quantity=line.quantity,
+            unit_price=line.unit_price,
+            total_price=line.total_price,
+        )
+        for line in lines
+    ])
+
+
+def record_customer_order(customer_id, total):
+    CustomerProfile.objects.filter(id=customer_id).update(
+        total_orders=F('total_orders') + 1,
+        total_spent=F('total_spent') + total,
+        # Cast, or SQLite divides whole-number totals as integers
+        avg_order_value=ExpressionWrapper(
+            Cast(F('total_spent') + total, FloatField()) / (F('total_orders') + 1), output_field=DecimalField(),
+        ),
+        last_order_date=timezone.now(),
+    )
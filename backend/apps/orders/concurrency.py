@@ -0,0 +1,86 @@
+"""
+Concurrent checkout load.
+
+``hammer`` sends ``attempts`` checkouts for one variant to the public order
+endpoint from a pool of threads. Each thread has its own database
+connection, so the checkouts really do race for the same stock row.
+Every request ends in one of two ways. A 201 means the order was placed.
+A 400 carrying the stock message means it was refused as sold out. Any
+other answer, such as SQLite's "database is locked" while another writer
+holds the file, rolls the whole checkout back. Those requests are
+retried after a short random pause, and the number of retries is counted.
+
+The report has the units sold, the stock left and ``oversold`` (units
+sold beyond the starting stock, which must be 0), plus orders per second
+over the wall-clock time. OrderConcurrencyTests runs it against a
+small stock, and ``benchmark_checkout`` runs it at size.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products.models import ProductVariant
+from .models import OrderItem
+
+SOLD_OUT = 'غير متوفرة حالياً'
+
+
+def _place(variant_id, quantity, number, phone_prefix, max_retries):
+    # The client re-raises exceptions it hears of through a process-wide
+    # signal, other threads' included; a 500 response is per request
+    client = APIClient(raise_request_exception=False)
+    payload = {
+        'customer_name': f'عميل {number}',
+        'customer_phone': f'{phone_prefix}{number:08d}',
+        'city': 'طرابلس',
+        'address': 'شارع 1',
+        'items': [{'variant_id': variant_id, 'quantity': quantity}],
+    }
+    retries = 0
+    try:
+        while True:
+            response = client.post(reverse('order-list'), payload, format='json')
+            if response.status_code == 201:
+                return 'placed', retries
+            if response.status_code == 400 and SOLD_OUT in str(getattr(response, 'data', {}).get('error', '')):
+                return 'sold_out', retries
+            if retries >= max_retries:
+                return 'failed', retries
+            retries += 1
+            # Full jitter, so the losers of one collision do not collide again
+            time.sleep(random.uniform(0, 0.002 * 2 ** min(retries, 7)))
+    finally:
+        connections.close_all()
+
+
+def hammer(variant_id, attempts, workers=32, quantity=1, phone_prefix='09', max_retries=200):
+    """Race ``attempts`` checkouts of ``quantity`` units of one variant; the outcome counts."""
+    stock = ProductVariant.objects.values_list('stock_quantity', flat=True).get(id=variant_id)
+    sold_before = sum(OrderItem.objects.filter(variant_id=variant_id).values_list('quantity', flat=True))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(lambda n: _place(variant_id, quantity, n, phone_prefix, max_retries), range(attempts)))
+    elapsed = time.perf_counter() - started
+
+    left = ProductVariant.objects.values_list('stock_quantity', flat=True).get(id=variant_id)
+    sold = sum(OrderItem.objects.filter(variant_id=variant_id).values_list('quantity', flat=True)) - sold_before
+    placed = sum(1 for outcome, _ in outcomes if outcome == 'placed')
+    return {
+        'attempts': attempts,
+        'workers': workers,
+        'starting_stock': stock,
+        'placed': placed,
+        'sold_out': sum(1 for outcome, _ in outcomes if outcome == 'sold_out'),
+        'failed': sum(1 for outcome, _ in outcomes if outcome == 'failed'),
+        'retries': sum(retries for _, retries in outcomes),
+        'units_sold': sold,
+        'stock_left': left,
+        'oversold': max(0, sold - stock),
+        'consistent': stock - sold == left,
+        'seconds': round(elapsed, 3),
+        'orders_per_second': round(placed / elapsed, 1) if elapsed else None,
+        'checkouts_per_second': round(attempts / elapsed, 1) if elapsed else None,
+    }
@@ -0,0 +1,147 @@
+"""
+Idempotent order submission.
+
+The storefront sends an ``Idempotency-Key`` header with each checkout. A
+slow POST that is retried, or a confirm button tapped twice, then places
+one order. The first request with a key claims it. It inserts an
+``IdempotencyKey`` row with a hash of the body, in its own short
+transaction, before the order transaction starts. The response is stored
+on that row in the same transaction as the order, so an order never
+commits without its answer.
+
+A request that finds the key already claimed gets one of these answers:
+
+- completed with the same body: the stored status and body come back,
+  marked ``Idempotent-Replayed``. The order is not placed again, so stock,
+  coupons and customer counters stay untouched.
+- a different body: 422, because the key belongs to another order.
+- still in progress: it polls for up to ``IDEMPOTENCY_WAIT`` seconds
+  (default 5) for the first attempt to finish, then answers 409 with
+  ``Retry-After``.
+
+Server errors (5xx) roll the order back, and they release the key so the
+retry runs again. A claim older than ``IDEMPOTENCY_LOCK_TIMEOUT`` seconds
+(default 60) belongs to a worker that died and may be taken over. Keys
+live ``IDEMPOTENCY_KEY_TTL`` seconds (default a day). After that they
+count as new, and ``purge_idempotency_keys`` deletes them in batches.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+
+
+def lock_timeout():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+
+def request_hash(data):
+    if hasattr(data, 'lists'):
+        # Form posts arrive as a QueryDict
+        data = {key: values for key, values in data.lists()}
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _claim(key, digest):
+    """``(row, owned)``: the key's row, and whether this request now holds it."""
+    for _ in range(3):
+        now = timezone.now()
+        row = IdempotencyKey.objects.filter(key=key).first()
+        if row is None:
+            try:
+                with transaction.atomic():
+                    return IdempotencyKey.objects.create(
+                        key=key, request_hash=digest, locked_until=now + lock_timeout(), expires_at=now + ttl(),
+                    ), True
+            except IntegrityError:
+                # Claimed by a parallel request in between
+                continue
+        if row.expires_at <= now:
+            IdempotencyKey.objects.filter(id=row.id, expires_at__lte=now).delete()
+            continue
+        if row.status == 'started' and row.request_hash == digest and row.locked_until <= now:
+            taken = IdempotencyKey.objects.filter(id=row.id, status='started', locked_until__lte=now).update(
+                locked_until=now + lock_timeout(),
+            )
+            if taken:
+                return row, True
+        return row, False
+    return row, False
+
+
+def _replay(row):
+    response = Response(row.response_body, status=row.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def respond(request, handler):
+    """``handler(request)`` once per ``Idempotency-Key``; without the header, every time."""
+    key = request.headers.get(HEADER)
+    if key is None:
+        return handler(request)
+    if not key.strip() or len(key) > MAX_LENGTH:
+        return Response({'error': 'مفتاح الطلب غير صالح'}, status=status.HTTP_400_BAD_REQUEST)
+
+    digest = request_hash(request.data)
+    deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT', 5)
+    while True:
+        row, owned = _claim(key, digest)
+        if owned:
+            break
+        if row is not None:
+            if row.request_hash != digest:
+                return Response({'error': 'مفتاح الطلب مستخدم لطلب مختلف'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if row.status == 'completed':
+                return _replay(row)
+        if time.monotonic() >= deadline:
+            response = Response({'error': 'الطلب قيد المعالجة، يرجى المحاولة بعد قليل'}, status=status.HTTP_409_CONFLICT)
+            response['Retry-After'] = '1'
+            return response
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        with transaction.atomic():
+            response = handler(request)
+            if response.status_code < 500:
+                IdempotencyKey.objects.filter(id=row.id).update(
+                    status='completed',
+                    response_status=response.status_code,
+                    response_body=response.data,
+                    order_id=response.data.get('id') if response.status_code == status.HTTP_201_CREATED else None,
+                )
+    except Exception:
+        release(row)
+        raise
+    if response.status_code >= 500:
+        release(row)
+    return response
+
+
+def release(row):
+    IdempotencyKey.objects.filter(id=row.id, status='started').delete()
+
+
+def purge(batch_size=5000):
+    """Delete expired keys in batches; returns how many went."""
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,60 @@
+import json
+import logging
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from crm.models import CustomerProfile
+from products.models import Brand, Product, ProductVariant
+from orders.concurrency import hammer
+from orders.models import Order
+
+PHONE_PREFIX = 'bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Races parallel checkouts for one synthetic SKU through the order endpoint and reports '
+        'orders per second and oversell. Orders are committed for real, then deleted again'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=200)
+        parser.add_argument('--attempts', type=int, default=1000)
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        # Sold-out answers and lock retries would log one line per request
+        logging.disable(logging.ERROR)
+        report = []
+        for workers in options['workers']:
+            variant = self.create_sku(options['stock'])
+            try:
+                result = hammer(variant.id, options['attempts'], workers=workers, phone_prefix=PHONE_PREFIX)
+            finally:
+                self.clean_up(variant)
+            report.append(result)
+            self.stdout.write(
+                f"{workers:>4} workers: {result['placed']} placed, {result['sold_out']} sold out, {result['failed']} failed, "
+                f"{result['retries']} retries in {result['seconds']}s -> {result['orders_per_second']} orders/s, "
+                f"{result['checkouts_per_second']} checkouts/s, oversold {result['oversold']}"
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump({'generated_at': timezone.now().isoformat(), 'runs': report}, fh, indent=2)
+
+    def create_sku(self, stock):
+        stamp = f'{timezone.now().timestamp():.0f}'
+        brand = Brand.objects.create(name_ar='براند اختبار', slug=f'benchmark-checkout-{stamp}')
+        product = Product.objects.create(name_ar='عطر اختبار الطلبات', slug=f'benchmark-checkout-{stamp}', brand=brand, gender='unisex')
+        return ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=stock,
+                                             sku=f'BENCH-CHECKOUT-{product.id}')
+
+    @transaction.atomic
+    def clean_up(self, variant):
+        Order.objects.filter(items__variant=variant).delete()
+        CustomerProfile.objects.filter(phone__startswith=PHONE_PREFIX).delete()
+        product = variant.product
+        variant.delete()
+        product.delete()
+        product.brand.delete()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from orders import idempotency
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired checkout idempotency keys (orders.idempotency); meant for a daily cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge(batch_size=options['batch_size'])
+        self.stdout.write(f"{deleted} expired keys deleted")
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from orders import outbox
+
+
+class Command(BaseCommand):
+    help = 'Sends the due emails in the outbox (orders.outbox); with --loop keeps polling, for hosts that run a worker process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep draining instead of exiting after one pass')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            totals = outbox.drain_all()
+            if totals['claimed'] or not options['loop']:
+                self.stdout.write(f"{totals['sent']} sent, {totals['failed']} not sent of {totals['claimed']} due")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0003_alter_orderitem_variant_size"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["created_at", "id"], name="orders_orde_created_0fb29d_idx"
+            ),
+        ),
+    ]
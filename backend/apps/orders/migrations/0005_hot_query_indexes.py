@@ -0,0 +1,27 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["status", "created_at"], name="order_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["customer_phone"], name="order_phone_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["city", "total"], name="order_city_total_idx"),
+        ),
+    ]
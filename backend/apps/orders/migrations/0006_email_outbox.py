@@ -0,0 +1,88 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0005_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "recipient",
+                    models.EmailField(max_length=254, verbose_name="المستلم"),
+                ),
+                ("subject", models.CharField(max_length=255, verbose_name="العنوان")),
+                ("body", models.TextField(verbose_name="النص")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "في الانتظار"),
+                            ("sent", "تم الإرسال"),
+                            ("failed", "فشل الإرسال"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="الحالة",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="المحاولات"),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="المحاولة التالية",
+                    ),
+                ),
+                ("claim", models.CharField(blank=True, default="", max_length=32)),
+                ("last_error", models.TextField(blank=True, verbose_name="آخر خطأ")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "sent_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="تاريخ الإرسال"
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="emails",
+                        to="orders.order",
+                        verbose_name="الطلب",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "بريد صادر",
+                "verbose_name_plural": "البريد الصادر",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"], name="outbox_due_idx"
+                    )
+                ],
+            },
+        ),
+    ]
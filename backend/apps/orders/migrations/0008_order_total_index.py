@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0007_idempotency_keys"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["total"], name="order_total_idx"),
+        ),
+    ]
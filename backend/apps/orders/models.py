@@ -1,4 +1,6 @@
 from django.db import models
+from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
 from crm.models import CustomerProfile
 from products.models import ProductVariant
@@ -57,6 +59,16 @@ class Order(models.Model):
         verbose_name = "الطلب"
         verbose_name_plural = "الطلبات"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            # Admin status tabs and the dashboard revenue windows
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['customer_phone'], name='order_phone_idx'),
+            # Covers the dashboard's revenue-by-city grouping
+            models.Index(fields=['city', 'total'], name='order_city_total_idx'),
+            # The admin orders table's total range filter
+            models.Index(fields=['total'], name='order_total_idx'),
+        ]
 
     def __str__(self):
         return self.order_number
@@ -87,3 +99,59 @@ class OrderStatusHistory(models.Model):
     class Meta:
         verbose_name = "تاريخ حالة الطلب"
         verbose_name_plural = "تاريخ حالات الطلب"
+
+class OutboxEmail(models.Model):
+    """Customer email written with the order change and sent after commit (see orders.outbox)."""
+    STATUS_CHOICES = [
+        ('pending', 'في الانتظار'),
+        ('sent', 'تم الإرسال'),
+        ('failed', 'فشل الإرسال'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails', verbose_name="الطلب")
+    recipient = models.EmailField(verbose_name="المستلم")
+    subject = models.CharField(max_length=255, verbose_name="العنوان")
+    body = models.TextField(verbose_name="النص")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="الحالة")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="المحاولات")
+    # Next retry, or the end of a worker's claim on the row
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="المحاولة التالية")
+    claim = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, verbose_name="آخر خطأ")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="تاريخ الإرسال")
+
+    class Meta:
+        verbose_name = "بريد صادر"
+        verbose_name_plural = "البريد الصادر"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} - {self.subject}"
+
+class IdempotencyKey(models.Model):
+    """An ``Idempotency-Key`` sent with an order and the response it got (see orders.idempotency)."""
+    STATUS_CHOICES = [
+        ('started', 'قيد المعالجة'),
+        ('completed', 'مكتمل'),
+    ]
+
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='started')
+    # How long the first attempt may hold the key before a retry takes it over
+    locked_until = models.DateTimeField()
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "مفتاح طلب"
+        verbose_name_plural = "مفاتيح الطلبات"
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,153 @@
+"""
+Transactional email outbox.
+
+Order signals used to call ``send_mail`` from ``post_save``. That put an
+SMTP handshake inside the checkout transaction and inside every status
+change. ``enqueue`` now only writes an ``OutboxEmail`` row. The row is
+written in the same transaction, so a rolled-back order sends nothing
+and a committed one cannot lose its email. The commit then wakes the
+worker.
+
+The worker is a daemon thread per process. It wakes after each commit
+and every ``OUTBOX_POLL_INTERVAL`` seconds (default 30) for due retries.
+With ``OUTBOX_ASYNC = False`` the draining happens on commit in the
+request instead, which the tests use. Hosts that recycle processes
+often, or want mail sent from elsewhere, can run ``send_outbox --loop``
+or call ``send_outbox`` from cron. Celery is pinned in the requirements,
+but no app is configured, so it is not used.
+
+``drain`` claims up to ``OUTBOX_BATCH_SIZE`` due rows. It stamps them
+with a token and pushes ``next_attempt_at`` out by ``OUTBOX_CLAIM_TIMEOUT``
+in one conditional UPDATE, so threads and processes draining at once
+never send the same email twice. A worker that dies mid-batch releases
+its rows when the claim expires. The batch goes out over one mail
+connection. A failed email is retried after ``OUTBOX_RETRY_DELAY``
+seconds (default 60), doubling each time up to ``OUTBOX_RETRY_MAX_DELAY``.
+After ``OUTBOX_MAX_ATTEMPTS`` tries it is marked failed.
+"""
+import logging
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+_wake = threading.Event()
+_lock = threading.Lock()
+_worker = None
+
+
+def batch_size():
+    return getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+
+
+def retry_delay(attempts):
+    delay = getattr(settings, 'OUTBOX_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, getattr(settings, 'OUTBOX_RETRY_MAX_DELAY', 3600)))
+
+
+def enqueue(subject, body, recipient, order=None):
+    """Queue an email in the current transaction; it is sent after commit."""
+    email = OutboxEmail.objects.create(subject=subject, body=body, recipient=recipient, order=order)
+    transaction.on_commit(wake)
+    return email
+
+
+def _claim(now):
+    due = OutboxEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size()])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_TIMEOUT', 300))
+    # Rows another worker took between the SELECT and here no longer match
+    due.filter(id__in=ids).update(claim=token, next_attempt_at=now + lease)
+    return list(OutboxEmail.objects.filter(status='pending', claim=token).order_by('id'))
+
+
+def _failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    email.claim = ''
+    if email.attempts >= getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8):
+        email.status = 'failed'
+        logger.error(f"Outbox email {email.id} to {email.recipient} failed for good: {error}")
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'claim', 'status', 'next_attempt_at'])
+
+
+def drain():
+    """Send one batch of due emails; returns how many were claimed, sent and not sent."""
+    emails = _claim(timezone.now())
+    sent, errors = [], 0
+    if emails:
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            # Nothing can go out this round; every claimed row is retried
+            for email in emails:
+                _failed(email, e)
+            return {'claimed': len(emails), 'sent': 0, 'failed': len(emails)}
+        try:
+            for email in emails:
+                message = EmailMessage(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.recipient], connection=connection)
+                try:
+                    message.send()
+                    sent.append(email.id)
+                except Exception as e:
+                    errors += 1
+                    _failed(email, e)
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        OutboxEmail.objects.filter(id__in=sent).update(status='sent', sent_at=timezone.now(), claim='', attempts=F('attempts') + 1)
+    return {'claimed': len(emails), 'sent': len(sent), 'failed': errors}
+
+
+def drain_all():
+    """Drain batch after batch until nothing due is left; the totals."""
+    totals = {'claimed': 0, 'sent': 0, 'failed': 0}
+    while True:
+        result = drain()
+        for key in totals:
+            totals[key] += result[key]
+        if result['claimed'] < batch_size():
+            return totals
+
+
+def _run():
+    while True:
+        _wake.wait(getattr(settings, 'OUTBOX_POLL_INTERVAL', 30))
+        _wake.clear()
+        try:
+            drain_all()
+        except Exception:
+            logger.exception('Outbox drain failed')
+        finally:
+            close_old_connections()
+
+
+def wake():
+    """Send what is due: in the background worker, or right here without ``OUTBOX_ASYNC``."""
+    global _worker
+    if not getattr(settings, 'OUTBOX_ASYNC', True):
+        try:
+            drain_all()
+        except Exception:
+            logger.exception('Outbox drain failed')
+        return
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='email-outbox', daemon=True)
+            _worker.start()
+    _wake.set()
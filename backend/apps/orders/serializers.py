@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderStatusHistory
+from products.fieldsets import SparseFieldsetMixin
+from products.fastpath import FastPathMixin
+from crm.serializers import CustomerProfileSerializer
 
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,11 +14,32 @@ class OrderStatusHistorySerializer(serializers.ModelSerializer):
         model = OrderStatusHistory
         fields = '__all__'
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(FastPathMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     status_history = OrderStatusHistorySerializer(many=True, read_only=True)
 
+    related_paths = {'items': 'items', 'status_history': 'status_history', 'customer': 'customer'}
+    expandable_fields = {'customer': lambda: CustomerProfileSerializer(read_only=True)}
+
     class Meta:
         model = Order
         fields = '__all__'
         read_only_fields = ['order_number', 'status', 'total']
+
+
+class OrderListSerializer(FastPathMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    """One row of the admin orders table; the nested items and history are left to ``OrderSerializer``."""
+    # Annotated by OrderViewSet.get_queryset
+    item_count = serializers.IntegerField(read_only=True)
+    last_status_at = serializers.DateTimeField(read_only=True)
+
+    expandable_fields = {'customer': lambda: CustomerProfileSerializer(read_only=True)}
+    related_paths = {'customer': 'customer'}
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_number', 'customer', 'customer_name', 'customer_phone', 'city', 'area',
+            'subtotal', 'discount_amount', 'shipping_cost', 'total', 'coupon', 'status', 'assigned_to',
+            'item_count', 'last_status_at', 'created_at', 'updated_at',
+        ]
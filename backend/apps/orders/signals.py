@@ -1,12 +1,8 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
-from django.conf import settings
-import logging
 from .models import Order, OrderStatusHistory
-
-logger = logging.getLogger(__name__)
+from . import outbox
 
 @receiver(post_save, sender=Order)
 def order_create_notification(sender, instance, created, **kwargs):
@@ -19,16 +15,8 @@ def order_create_notification(sender, instance, created, **kwargs):
             # In a real app, use render_to_string with an HTML template
             # html_message = render_to_string('emails/order_confirmation.html', {'order': instance})
             
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [instance.customer_email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                logger.error(f"Error sending email: {e}")
+            # Sent after commit, outside the checkout (see orders.outbox)
+            outbox.enqueue(subject, message, instance.customer_email, order=instance)
 
 @receiver(post_save, sender=OrderStatusHistory)
 def order_status_change_notification(sender, instance, created, **kwargs):
@@ -41,13 +29,4 @@ def order_status_change_notification(sender, instance, created, **kwargs):
             subject = f'تحديث حالة طلبك {order.order_number} - {status_label}'
             message = f'مرحباً {order.customer_name}، تم تحديث حالة طلبك إلى: {status_label}.\n\nملاحظات: {instance.notes}'
             
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [order.customer_email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                logger.error(f"Error sending status email: {e}")
+            outbox.enqueue(subject, message, order.customer_email, order=order)
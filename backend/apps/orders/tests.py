@@ -1,10 +1,27 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection, connections
+from django.core.mail.backends.locmem import EmailBackend
+from django.utils import timezone
 from django.urls import reverse
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from django.contrib.auth.models import User
-from .models import Order, OrderItem, OrderStatusHistory
+from .models import IdempotencyKey, Order, OrderItem, OrderStatusHistory, OutboxEmail
 from products.models import Product, ProductVariant, Category, Brand
 from crm.models import CustomerProfile
+from .concurrency import hammer
+from . import checkout, idempotency, outbox
 
 class OrderTests(APITestCase):
     def setUp(self):
@@ -103,3 +120,431 @@ class OrderTests(APITestCase):
         history = OrderStatusHistory.objects.filter(order=self.order, status='shipped').first()
         self.assertIsNotNone(history)
         self.assertEqual(history.notes, 'Handed to courier')
+
+
+class OrderFastSerializerTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username='admin', password='password', email='admin@example.com')
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        variant = ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=10, sku='ORD-FAST-1')
+        customer = CustomerProfile.objects.create(name='عميل', phone='0912345678')
+        for i in range(3):
+            order = Order.objects.create(
+                order_number=f'ORD-FAST-{i}', customer=customer if i else None, customer_name='عميل', customer_phone='0912345678',
+                city='Tripoli', area='Center', address='Street 1', subtotal=100, shipping_cost=10, total=110,
+            )
+            OrderItem.objects.create(order=order, variant=variant, product_name='منتج', variant_size=100, quantity=1, unit_price=100, total_price=100)
+            OrderStatusHistory.objects.create(order=order, status='pending', notes='')
+
+    def test_order_list_is_byte_identical(self):
+        self.client.force_authenticate(user=self.admin_user)
+        contents = []
+        for fast in (False, True):
+            with override_settings(FAST_SERIALIZERS=fast):
+                response = self.client.get(reverse('order-list'))
+            self.assertEqual(len(response.data['results']), 3)
+            contents.append(response.content)
+        self.assertEqual(contents[0], contents[1])
+
+
+class CheckoutTests(APITestCase):
+    def setUp(self):
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        self.product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        self.first = ProductVariant.objects.create(product=self.product, size_ml=50, price=60, stock_quantity=5, sku='CHK-50')
+        self.second = ProductVariant.objects.create(product=self.product, size_ml=100, price=100, sale_price=90, stock_quantity=1, sku='CHK-100')
+        self.payload = {'customer_name': 'عميل', 'customer_phone': '0912345678', 'city': 'طرابلس', 'address': 'شارع 1'}
+
+    def checkout(self, items):
+        return self.client.post(reverse('order-list'), {**self.payload, 'items': items}, format='json')
+
+    def test_checkout_reserves_stock_and_bulk_creates_items(self):
+        items = [{'variant_id': self.first.id, 'quantity': 2}, {'variant_id': self.second.id, 'quantity': 1}, {'variant_id': self.first.id, 'quantity': 1}]
+        response = self.checkout(items)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        order = Order.objects.get()
+        self.assertEqual(order.total, Decimal('270.00'))
+        self.assertEqual(sorted(order.items.values_list('variant_id', 'quantity')), [(self.first.id, 3), (self.second.id, 1)])
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.stock_quantity, self.second.stock_quantity), (2, 0))
+        customer = CustomerProfile.objects.get()
+        self.assertEqual((customer.total_orders, customer.total_spent, customer.avg_order_value), (1, Decimal('270.00'), Decimal('270.00')))
+
+        self.second.stock_quantity = 1
+        self.second.save()
+        self.assertEqual(self.checkout([{'variant_id': self.first.id, 'quantity': 1}]).status_code, status.HTTP_201_CREATED)
+        customer.refresh_from_db()
+        self.assertEqual((customer.total_orders, customer.total_spent, customer.avg_order_value), (2, Decimal('330.00'), Decimal('165.00')))
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.in_stock)
+
+    def test_shortfall_takes_nothing(self):
+        # The first line fits; the second does not, so neither is taken
+        ProductVariant.objects.filter(id=self.second.id).update(stock_quantity=0)
+        response = self.checkout([{'variant_id': self.first.id, 'quantity': 2}, {'variant_id': self.second.id, 'quantity': 1}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('المتاح: 0', response.data['error'])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.stock_quantity, 5)
+        self.assertFalse(Order.objects.exists())
+
+    def test_refusal_names_the_short_line(self):
+        # The second line is taken before the first turns out short; the message must not see that
+        response = self.checkout([{'variant_id': self.second.id, 'quantity': 1}, {'variant_id': self.first.id, 'quantity': 7}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('(50مل)', response.data['error'])
+        self.assertIn('المتاح: 5', response.data['error'])
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.stock_quantity, 1)
+
+        # Nothing short any more by the time it is read again
+        refusal = checkout._refusal({self.first.id: 1})
+        self.assertEqual(refusal.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_lines(self):
+        self.assertEqual(self.checkout([{'variant_id': self.first.id, 'quantity': 0}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.checkout([{'variant_id': self.first.id, 'quantity': -3}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.checkout([{'variant_id': 'x', 'quantity': 1}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.checkout([{'variant_id': 999999, 'quantity': 1}]).status_code, status.HTTP_404_NOT_FOUND)
+        self.first.is_active = False
+        self.first.save()
+        self.assertEqual(self.checkout([{'variant_id': self.first.id, 'quantity': 1}]).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderConcurrencyTests(TransactionTestCase):
+    def test_parallel_checkouts_never_oversell(self):
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        variant = ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=40, sku='RACE-1')
+
+        # Lock contention is logged by the view on every retry
+        logging.disable(logging.ERROR)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        report = hammer(variant.id, attempts=300, workers=16)
+        self.assertEqual(report['failed'], 0, report)
+        self.assertEqual(report['oversold'], 0, report)
+        self.assertTrue(report['consistent'], report)
+        self.assertEqual(report['placed'], 40, report)
+        self.assertEqual(report['sold_out'], 260, report)
+        self.assertEqual(report['stock_left'], 0)
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertGreater(report['orders_per_second'], 0)
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP down')
+
+
+class SlowBackend(EmailBackend):
+    release = threading.Event()
+
+    def send_messages(self, messages):
+        SlowBackend.release.wait(10)
+        return super().send_messages(messages)
+
+
+@override_settings(OUTBOX_ASYNC=False, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username='admin', password='password', email='admin@example.com')
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        self.variant = ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=10, sku='MAIL-1')
+
+    def place_order(self):
+        return self.client.post(reverse('order-list'), {
+            'customer_name': 'عميل', 'customer_phone': '0912345678', 'customer_email': 'customer@example.com',
+            'city': 'طرابلس', 'address': 'شارع 1', 'items': [{'variant_id': self.variant.id, 'quantity': 1}],
+        }, format='json')
+
+    def test_order_email_is_sent_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.place_order().status_code, status.HTTP_201_CREATED)
+            # Two rows: the confirmation and the initial status entry
+            self.assertEqual(OutboxEmail.objects.filter(status='pending').count(), 2)
+            self.assertEqual(len(mail.outbox), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['customer@example.com'])
+        self.assertEqual(OutboxEmail.objects.filter(status='sent').count(), 2)
+
+        order = Order.objects.get()
+        self.client.force_authenticate(user=self.admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('order-update-status', args=[order.id]), {'status': 'shipped'}, format='json')
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn(order.order_number, mail.outbox[2].subject)
+
+    def test_rolled_back_order_sends_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('order-list'), {
+                'customer_name': 'عميل', 'customer_phone': '0912345678', 'customer_email': 'customer@example.com',
+                'city': 'طرابلس', 'address': 'شارع 1', 'items': [{'variant_id': self.variant.id, 'quantity': 50}],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OutboxEmail.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_batch_shares_one_connection(self):
+        for i in range(5):
+            OutboxEmail.objects.create(subject=f'رسالة {i}', body='-', recipient=f'c{i}@example.com')
+        CountingBackend.opened = 0
+        with override_settings(EMAIL_BACKEND='orders.tests.CountingBackend', OUTBOX_BATCH_SIZE=3):
+            totals = outbox.drain_all()
+        self.assertEqual(totals, {'claimed': 5, 'sent': 5, 'failed': 0})
+        # One connection per batch of three
+        self.assertEqual(CountingBackend.opened, 2)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(OUTBOX_RETRY_DELAY=60, OUTBOX_MAX_ATTEMPTS=3)
+    def test_failed_send_is_retried_with_backoff(self):
+        email = OutboxEmail.objects.create(subject='تأكيد', body='-', recipient='customer@example.com')
+        with override_settings(EMAIL_BACKEND='orders.tests.FailingBackend'):
+            started = timezone.now()
+            self.assertEqual(outbox.drain(), {'claimed': 1, 'sent': 0, 'failed': 1})
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts, email.claim), ('pending', 1, ''))
+            self.assertIn('SMTP down', email.last_error)
+            self.assertGreaterEqual(email.next_attempt_at, started + timedelta(seconds=60))
+            # Not due yet
+            self.assertEqual(outbox.drain()['claimed'], 0)
+
+            OutboxEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+            outbox.drain()
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 2)
+            self.assertGreaterEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=119))
+
+        OutboxEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.drain()['sent'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'sent')
+        self.assertEqual(len(mail.outbox), 1)
+
+        failing = OutboxEmail.objects.create(subject='تأكيد', body='-', recipient='other@example.com', attempts=2)
+        with override_settings(EMAIL_BACKEND='orders.tests.FailingBackend'), self.assertLogs('orders.outbox', 'ERROR'):
+            outbox.drain()
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, 'failed')
+
+    def test_claimed_rows_are_not_sent_twice(self):
+        OutboxEmail.objects.create(subject='تأكيد', body='-', recipient='customer@example.com')
+        claimed = outbox._claim(timezone.now())
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(outbox._claim(timezone.now()), [])
+        # An expired claim (a worker that died) is picked up again
+        self.assertEqual(len(outbox._claim(timezone.now() + timedelta(hours=1))), 1)
+
+
+class OutboxWorkerTests(TransactionTestCase):
+    @override_settings(OUTBOX_ASYNC=True, EMAIL_BACKEND='orders.tests.SlowBackend')
+    def test_checkout_does_not_wait_for_the_mail_server(self):
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        variant = ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=10, sku='MAIL-2')
+        SlowBackend.release.clear()
+        self.addCleanup(SlowBackend.release.set)
+
+        started = time.perf_counter()
+        response = self.client.post(reverse('order-list'), {
+            'customer_name': 'عميل', 'customer_phone': '0912345678', 'customer_email': 'customer@example.com',
+            'city': 'طرابلس', 'address': 'شارع 1', 'items': [{'variant_id': variant.id, 'quantity': 1}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # The mail server is stuck, the customer is not
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertEqual(len(mail.outbox), 0)
+
+        SlowBackend.release.set()
+        deadline = time.monotonic() + 10
+        while OutboxEmail.objects.filter(status='sent').count() < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(OutboxEmail.objects.filter(status='sent').count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        self.variant = ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=10, sku='IDEM-1')
+        self.payload = {
+            'customer_name': 'عميل', 'customer_phone': '0912345678', 'city': 'طرابلس', 'address': 'شارع 1',
+            'items': [{'variant_id': self.variant.id, 'quantity': 2}],
+        }
+
+    def post(self, key, payload=None):
+        return self.client.post(reverse('order-list'), payload or self.payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_the_first_order_without_side_effects(self):
+        first = self.post('checkout-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(1):
+            again = self.post('checkout-1')
+        self.assertEqual(again.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(again['Idempotent-Replayed'], 'true')
+        self.assertEqual(again.data['order_number'], first.data['order_number'])
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock_quantity, 8)
+        self.assertEqual(CustomerProfile.objects.get().total_orders, 1)
+        self.assertEqual(IdempotencyKey.objects.get().order.order_number, first.data['order_number'])
+
+        # Another key is another order
+        self.assertEqual(self.post('checkout-2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_reused_key_with_another_body_is_rejected(self):
+        self.post('checkout-1')
+        response = self.post('checkout-1', {**self.payload, 'items': [{'variant_id': self.variant.id, 'quantity': 1}]})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_refusals_are_replayed_and_server_errors_released(self):
+        payload = {**self.payload, 'items': [{'variant_id': self.variant.id, 'quantity': 50}]}
+        self.assertEqual(self.post('checkout-1', payload).status_code, status.HTTP_400_BAD_REQUEST)
+        self.variant.stock_quantity = 100
+        self.variant.save()
+        self.assertEqual(self.post('checkout-1', payload).status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch('orders.checkout.create_items', side_effect=RuntimeError('disk full')), self.assertLogs('orders.views', 'ERROR'):
+            self.assertEqual(self.post('checkout-2').status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(IdempotencyKey.objects.filter(key='checkout-2').exists())
+        self.assertEqual(self.post('checkout-2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT=0.2)
+    def test_in_progress_key_gets_a_conflict(self):
+        now = timezone.now()
+        IdempotencyKey.objects.create(key='checkout-1', request_hash=idempotency.request_hash(self.payload),
+                                      locked_until=now + timedelta(minutes=1), expires_at=now + timedelta(days=1))
+        response = self.post('checkout-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Retry-After'], '1')
+
+        # A claim left by a worker that died is taken over
+        IdempotencyKey.objects.filter(key='checkout-1').update(locked_until=now - timedelta(seconds=1))
+        self.assertEqual(self.post('checkout-1').status_code, status.HTTP_201_CREATED)
+
+    def test_expired_keys_are_new_and_purged(self):
+        self.post('checkout-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.post('checkout-1').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.post('checkout-2')
+        call_command('purge_idempotency_keys', batch_size=1, stdout=StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['checkout-2'])
+
+    def test_invalid_key(self):
+        self.assertEqual(self.post('x' * 300).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+
+class IdempotencyConcurrencyTests(TransactionTestCase):
+    def test_parallel_duplicates_place_one_order(self):
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        variant = ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=10, sku='IDEM-2')
+        payload = {
+            'customer_name': 'عميل', 'customer_phone': '0912345678', 'city': 'طرابلس', 'address': 'شارع 1',
+            'items': [{'variant_id': variant.id, 'quantity': 1}],
+        }
+
+        def submit(_):
+            client = APIClient(raise_request_exception=False)
+            try:
+                # Like the storefront, retry server errors (SQLite lock contention here) with the same key
+                for _ in range(50):
+                    response = client.post(reverse('order-list'), payload, format='json', HTTP_IDEMPOTENCY_KEY='double-tap')
+                    if response.status_code < 500:
+                        return response.status_code, response.data.get('order_number')
+                    time.sleep(0.02)
+                return response.status_code, None
+            finally:
+                connections.close_all()
+
+        logging.disable(logging.ERROR)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(submit, range(8)))
+        self.assertEqual({code for code, _ in results}, {201}, results)
+        self.assertEqual(len({number for _, number in results}), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock_quantity, 9)
+
+
+class OrderListTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username='admin', password='password', email='admin@example.com')
+        brand = Brand.objects.create(name_ar='براند', slug='brand')
+        product = Product.objects.create(name_ar='منتج', slug='product', brand=brand, gender='unisex')
+        self.variant = ProductVariant.objects.create(product=product, size_ml=100, price=100, stock_quantity=100, sku='LIST-1')
+        self.client.force_authenticate(user=self.admin_user)
+
+    def make_orders(self, count, total=100):
+        orders = []
+        for i in range(count):
+            order = Order.objects.create(
+                order_number=f'LIST-{total}-{Order.objects.count()}', customer_name='عميل', customer_phone='0912345678',
+                city='طرابلس', area='المركز', address='شارع 1', subtotal=total, shipping_cost=0, total=total,
+            )
+            for size in (50, 100):
+                OrderItem.objects.create(
+                    order=order, variant=self.variant, product_name='منتج', variant_size=size, quantity=1, unit_price=total, total_price=total,
+                )
+            OrderStatusHistory.objects.create(order=order, status='pending')
+            orders.append(order)
+        return orders
+
+    def list_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_list_is_a_summary(self):
+        order = self.make_orders(1)[0]
+        response, _ = self.list_queries()
+        row = response.data['results'][0]
+        self.assertNotIn('items', row)
+        self.assertNotIn('status_history', row)
+        self.assertEqual(row['item_count'], 2)
+        self.assertIsNotNone(row['last_status_at'])
+
+        detail = self.client.get(reverse('order-detail', args=[order.id]))
+        self.assertEqual(len(detail.data['items']), 2)
+        self.assertEqual(len(detail.data['status_history']), 1)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        self.make_orders(2)
+        _, few = self.list_queries()
+        self.make_orders(10)
+        response, many = self.list_queries()
+        self.assertEqual(len(response.data['results']), 12)
+        self.assertEqual(few, many)
+
+    def test_range_filters(self):
+        self.make_orders(2, total=100)
+        self.make_orders(3, total=400)
+        response, _ = self.list_queries(total__gte=200, total__lte=500)
+        self.assertEqual(len(response.data['results']), 3)
+        Order.objects.filter(total=100).update(created_at=timezone.now() - timedelta(days=10))
+        response, _ = self.list_queries(created_at__gte=(timezone.now() - timedelta(days=1)).isoformat())
+        self.assertEqual(len(response.data['results']), 3)
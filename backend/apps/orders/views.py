@@ -1,28 +1,57 @@
 import datetime
 import random
 import logging
-from django.db import transaction
-from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Order, OrderItem, OrderStatusHistory
-from .serializers import OrderSerializer
+from .serializers import OrderListSerializer, OrderSerializer
+from . import checkout, idempotency
 from cart.models import Cart
-from products.models import ProductVariant
+from marketing import redemption
+from products.pagination import KeysetPagination
+from products.fieldsets import SparseFieldsetViewMixin
 
 from crm.models import CustomerProfile
 
 logger = logging.getLogger(__name__)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
 
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['order_number', 'customer_name', 'customer_phone']
-    filterset_fields = ['status']
+    # Ranges are served by the (created_at, id) and order_total_idx indexes
+    filterset_fields = {'status': ['exact'], 'created_at': ['gte', 'lte'], 'total': ['gte', 'lte']}
+    pagination_class = KeysetPagination
+    cursor_ordering_fields = ['created_at']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        # Correlated subqueries run for the rows of the page only; a GROUP BY
+        # over both joins would aggregate every matching order first
+        per_order = {'order': OuterRef('pk')}
+        return queryset.annotate(
+            item_count=Coalesce(Subquery(
+                OrderItem.objects.filter(**per_order).order_by().values('order').annotate(n=Count('id')).values('n'),
+                output_field=IntegerField(),
+            ), 0),
+            last_status_at=Subquery(
+                OrderStatusHistory.objects.filter(**per_order).order_by().values('order').annotate(at=Max('created_at')).values('at'),
+            ),
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderListSerializer
+        return OrderSerializer
 
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -36,10 +65,23 @@ class OrderViewSet(viewsets.ModelViewSet):
         random_str = ''.join(random.choices('0123456789', k=6))
         return f"ORD-{date_str}-{random_str}"
 
-    @transaction.atomic
+    def create_order(self, attempts=5, **fields):
+        # Busy days make a clash of the random suffix likely enough to retry
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    return Order.objects.create(order_number=self.generate_order_number(), **fields)
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
+
     def create(self, request, *args, **kwargs):
+        # A retry with the same Idempotency-Key gets the first answer back
+        return idempotency.respond(request, self.place_order)
+
+    @transaction.atomic
+    def place_order(self, request):
         from decimal import Decimal
-        from marketing.models import Coupon
         
         data = request.data
         items_data = data.get('items', [])
@@ -48,11 +90,18 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not items_data:
             return Response({'error': 'السلة فارغة، لا يمكن إتمام الطلب'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 1. CRM Integration: Create or Update Customer Profile
         cust_name = data.get('customer_name')
         if not cust_name:
             return Response({'error': 'اسم العميل مطلوب'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Stock is the first write, before anything is read (see orders.checkout)
+        try:
+            lines = checkout.reserve(checkout.quantities(items_data))
+        except checkout.CheckoutError as e:
+            return e.response()
+        subtotal = sum((line.total_price for line in lines), Decimal('0.00'))
+
+        # 1. CRM Integration: Create or Update Customer Profile
         b_day = data.get('birth_day') or None
         b_month = data.get('birth_month') or None
         b_year = data.get('birth_year') or None
@@ -93,68 +142,26 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         except Exception as e:
             logger.error(f"CRM Error: {e}")
+            transaction.set_rollback(True)
             return Response({'error': 'حدث خطأ في معالجة بيانات العميل'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Calculate totals
-        subtotal = Decimal('0.00')
-        order_items = []
-        
-        for item in items_data:
-            try:
-                variant = ProductVariant.objects.get(id=item['variant_id'])
-                qty = int(item['quantity'])
-                
-                # Check Stock
-                if variant.stock_quantity < qty:
-                    return Response({'error': f'عذراً، الكمية المطلوبة من {variant.product.name_ar} ({variant.size_ml}مل) غير متوفرة حالياً. المتاح: {variant.stock_quantity}'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Variant price - ensure it's Decimal
-                price = variant.current_price 
-                if not isinstance(price, Decimal):
-                    price = Decimal(str(price))
-                    
-                item_total = price * Decimal(qty)
-                subtotal += item_total
-                
-                order_items.append({
-                    'variant': variant,
-                    'quantity': qty,
-                    'unit_price': price,
-                    'total_price': item_total
-                })
-            except ProductVariant.DoesNotExist:
-                return Response({'error': f'المنتج المحدد غير موجود'}, status=status.HTTP_404_NOT_FOUND)
-            except Exception as e:
-                logger.error(f"Item Error: {e}")
-                return Response({'error': 'حدث خطأ في معالجة المنتجات'}, status=status.HTTP_400_BAD_REQUEST)
-
         # Handle Coupon
         discount_amount = Decimal('0.00')
         applied_coupon = None
         if coupon_code:
             try:
-                coupon = Coupon.objects.get(code=coupon_code)
-                if coupon.is_valid and subtotal >= coupon.min_order_amount:
-                    if coupon.discount_type == 'percentage':
-                        discount_amount = (subtotal * Decimal(str(coupon.discount_value))) / Decimal('100.00')
-                        if coupon.max_discount_amount:
-                            discount_amount = min(discount_amount, coupon.max_discount_amount)
-                    else:
-                        discount_amount = Decimal(str(coupon.discount_value))
-                    
-                    applied_coupon = coupon
-                    coupon.used_count += 1
-                    coupon.save()
-            except Coupon.DoesNotExist:
-                pass # Or return error if strict
+                applied_coupon, discount_amount = redemption.redeem(coupon_code, subtotal, data.get('customer_phone') or '')
+            except redemption.CouponError as e:
+                # The reserved stock goes back too
+                transaction.set_rollback(True)
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         shipping_cost = Decimal('0.00') # Shipping removed per user request
         total = subtotal + shipping_cost - discount_amount
         if total < 0: total = Decimal('0.00')
 
         try:
-            order = Order.objects.create(
-                order_number=self.generate_order_number(),
+            order = self.create_order(
                 customer=customer_profile,
                 customer_name=cust_name,
                 customer_phone=data.get('customer_phone'),
@@ -173,27 +180,10 @@ class OrderViewSet(viewsets.ModelViewSet):
                 coupon=applied_coupon,
                 notes=data.get('notes', '')
             )
-
-            for item in order_items:
-                OrderItem.objects.create(
-                    order=order,
-                    variant=item['variant'],
-                    product_name=item['variant'].product.name_ar,
-                    variant_size=item['variant'].size_ml,
-                    quantity=item['quantity'],
-                    unit_price=item['unit_price'],
-                    total_price=item['total_price']
-                )
-                # Update stock
-                item['variant'].stock_quantity -= item['quantity']
-                item['variant'].save()
-
-            # Update customer stats
-            customer_profile.total_orders += 1
-            customer_profile.total_spent += total
-            customer_profile.avg_order_value = customer_profile.total_spent / customer_profile.total_orders
-            customer_profile.last_order_date = timezone.now()
-            customer_profile.save()
+            checkout.create_items(order, lines)
+            if applied_coupon:
+                redemption.record(applied_coupon, order, discount_amount)
+            checkout.record_customer_order(customer_profile.id, total)
 
             # Initial history
             OrderStatusHistory.objects.create(
@@ -223,6 +213,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             
         except Exception as e:
             logger.error(f"Order Creation Error: {e}", exc_info=True)
+            # The reserved stock goes back
+            transaction.set_rollback(True)
             return Response({'error': 'فشل إنشاء الطلب في النظام. يرجى المحاولة مرة أخرى.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=True, methods=['patch'])
@@ -0,0 +1,116 @@
+"""
+Helpers for the benchmark_* management commands.
+
+The synthetic catalogue is written inside ``rolled_back()`` so benchmarks can
+run against a real database without leaving rows behind.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db import transaction
+from .models import Brand, Category, FragranceFamily, Product, ProductVariant, ProductNote
+from .notes import assign_terms
+
+NAME_WORDS = [
+    'عود', 'العود', 'مسك', 'المسك', 'عنبر', 'ورد', 'الورد', 'أسطورة', 'اسطوره', 'ملكي', 'الملكي',
+    'ليلة', 'ليله', 'إمارات', 'أميرة', 'فخامة', 'سحر', 'الشرق', 'ذهبي', 'أبيض', 'نسيم', 'غموض',
+    'زعفران', 'ياسمين', 'كهرمان', 'صندل', 'بخور', 'مُسك', 'عُود', 'ليلى', 'نجمة', 'قمر',
+]
+NOTE_WORDS = [
+    'عود', 'زعفران', 'ورد طائفي', 'مسك أبيض', 'عنبر', 'فانيلا', 'صندل', 'باتشولي', 'برغموت',
+    'ياسمين', 'هيل', 'قرفة', 'جلد', 'توباكو', 'ليمون', 'لافندر', 'فلفل وردي', 'بخور',
+]
+OCCASIONS = ['ليلي', 'حفلات', 'كلاسيكي', 'يومي', 'عمل', 'مناسبات']
+VIBES = ['قوي', 'دافئ', 'رجولي', 'ناعم', 'منعش', 'جذاب']
+GENDERS = ['men', 'women', 'unisex']
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def build_synthetic_catalogue(n_products, seed=42, brands=40, categories=8, families=10, batch_size=2000):
+    """Bulk-insert a random but reproducible catalogue; returns the product ids."""
+    rng = random.Random(seed)
+    brand_objs = Brand.objects.bulk_create([
+        Brand(name_ar=f'{rng.choice(NAME_WORDS)} {i}', slug=f'synthetic-brand-{i}') for i in range(brands)
+    ])
+    category_objs = Category.objects.bulk_create([
+        Category(name_ar=f'فئة {i}', slug=f'synthetic-category-{i}', order=i) for i in range(categories)
+    ])
+    family_objs = FragranceFamily.objects.bulk_create([
+        FragranceFamily(name_ar=rng.choice(NOTE_WORDS), icon='', color='#000000') for _ in range(families)
+    ])
+
+    products = Product.objects.bulk_create([
+        Product(
+            name_ar=' '.join(rng.sample(NAME_WORDS, rng.randint(2, 3))),
+            slug=f'synthetic-{seed}-{i}',
+            description=' '.join(rng.sample(NAME_WORDS + NOTE_WORDS, 12)),
+            brand=rng.choice(brand_objs),
+            gender=rng.choice(GENDERS),
+            occasion=rng.choice(OCCASIONS),
+            vibe=rng.choice(VIBES),
+            is_featured=rng.random() < 0.1,
+            is_new=rng.random() < 0.2,
+            view_count=rng.randint(0, 5000),
+            sales_count=rng.randint(0, 500),
+        )
+        for i in range(n_products)
+    ], batch_size=batch_size)
+    product_ids = [p.id for p in products]
+
+    variants, notes, category_links, family_links = [], [], [], []
+    for product in products:
+        for size in rng.sample([30, 50, 75, 100], rng.randint(1, 3)):
+            price = Decimal(rng.randint(50, 900))
+            variants.append(ProductVariant(
+                product=product,
+                size_ml=size,
+                price=price,
+                sale_price=price * Decimal('0.8') if rng.random() < 0.2 else None,
+                stock_quantity=rng.randint(0, 40),
+                sku=f'SYN-{seed}-{product.id}-{size}',
+            ))
+        for note_type in ('top', 'heart', 'base'):
+            notes.append(ProductNote(product=product, note_type=note_type, name_ar=rng.choice(NOTE_WORDS)))
+        for category in rng.sample(category_objs, rng.randint(1, 2)):
+            category_links.append(Product.categories.through(product_id=product.id, category_id=category.id))
+        for family in rng.sample(family_objs, rng.randint(1, 2)):
+            family_links.append(Product.fragrance_families.through(product_id=product.id, fragrancefamily_id=family.id))
+
+    ProductVariant.objects.bulk_create(variants, batch_size=batch_size)
+    ProductNote.objects.bulk_create(assign_terms(notes), batch_size=batch_size)
+    Product.categories.through.objects.bulk_create(category_links, batch_size=batch_size)
+    Product.fragrance_families.through.objects.bulk_create(family_links, batch_size=batch_size)
+    Product.objects.refresh_price_summary(product_ids)
+    return product_ids
+
+
+def timed(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times; return (last result, list of durations in ms)."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    return result, durations
+
+
+def summarize(durations):
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {'median_ms': round(statistics.median(ordered), 3), 'p95_ms': round(p95, 3)}
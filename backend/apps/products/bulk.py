@@ -0,0 +1,31 @@
+"""
+Bulk UPDATE by primary key.
+
+``QuerySet.bulk_update`` compiles a ``CASE WHEN`` per row and field,
+which costs around a millisecond per row in Python before the database
+sees anything. ``update_rows`` sends one parameterized
+``UPDATE ... WHERE pk = %s`` through ``executemany`` instead, as
+``similarity._write`` does for inserts. Like bulk_update it sends no
+signals and leaves ``auto_now`` fields alone.
+"""
+from django.db import connections, router
+
+
+def update_rows(objs, fields, batch_size=5000):
+    """Write ``fields`` of saved instances of one model by primary key; returns the number of objects."""
+    objs = list(objs)
+    if not objs:
+        return 0
+    meta = type(objs[0])._meta
+    connection = connections[router.db_for_write(type(objs[0]))]
+    quote = connection.ops.quote_name
+    model_fields = [meta.get_field(name) for name in fields]
+    assignments = ', '.join(f'{quote(field.column)} = %s' for field in model_fields)
+    sql = f'UPDATE {quote(meta.db_table)} SET {assignments} WHERE {quote(meta.pk.column)} = %s'
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in model_fields] + [obj.pk]
+                for obj in objs[start:start + batch_size]
+            ])
+    return len(objs)
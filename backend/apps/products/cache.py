@@ -0,0 +1,150 @@
+"""
+Catalogue generation counter and response cache.
+
+Cached catalogue data is keyed on a generation number that signals bump
+whenever products or variants change, so stale entries are never read
+again and simply expire from the cache backend.
+
+``cached_response`` wraps the public read-only catalogue actions: the
+serialized payload is stored under the generation, the action and its
+normalized query parameters, and served without touching the database
+until the next bump. Only the cache API (get/set/add/incr) is used, but
+the backend must be shared by every worker process (file-based or Redis,
+see ``CACHES``): a bump only reaches the processes that read the same
+cache, and with locmem the others keep serving their old generation.
+
+``conditional_response`` adds ETag/Last-Modified validators. The ETag is
+derived from the generation and the request scope, so a matching
+``If-None-Match`` is answered with a 304 before any row is loaded.
+Other apps (cms) keep their own generation under a separate namespace.
+"""
+import functools
+import hashlib
+import time
+from django.utils.http import http_date, quote_etag
+from django.utils.cache import get_conditional_response
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+GENERATION_KEY = '{namespace}:generation'
+STATS_KEYS = {'hits': 'catalogue:response-hits', 'misses': 'catalogue:response-misses'}
+
+
+def get_generation(namespace='catalogue'):
+    # Seed with a timestamp so an evicted counter never reuses old keys
+    key = GENERATION_KEY.format(namespace=namespace)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(namespace='catalogue'):
+    key = GENERATION_KEY.format(namespace=namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = time.time_ns()
+        cache.set(key, generation, timeout=None)
+        return generation
+
+
+def bump_generation_on_commit(namespace='catalogue'):
+    bump_generation(namespace)
+    # Again once committed, so a read that raced the transaction cannot pin stale data
+    transaction.on_commit(functools.partial(bump_generation, namespace))
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def response_stats():
+    hits, misses = (cache.get(key, 0) for key in STATS_KEYS.values())
+    return {
+        'generation': get_generation(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+    }
+
+
+def reset_response_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
+
+
+def _scope(view, request, kwargs):
+    # Keys are sorted; repeated values keep their order since filters read the last one
+    params = sorted(request.query_params.lists())
+    # Absolute image and pagination URLs depend on the host
+    return (request.get_host(), request.is_secure(), view.basename, view.action, sorted(kwargs.items()), params)
+
+
+def response_cache_key(view, request, kwargs):
+    digest = hashlib.md5(repr(_scope(view, request, kwargs)).encode()).hexdigest()
+    return f'catalogue-response:{get_generation()}:{digest}'
+
+
+def cached_response(method):
+    """Cache a successful read action's payload under the catalogue generation."""
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = response_cache_key(self, request, kwargs)
+        data = cache.get(key)
+        if data is not None:
+            _count(STATS_KEYS['hits'])
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _count(STATS_KEYS['misses'])
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 3600))
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+def conditional_response(last_modified, namespace='catalogue'):
+    """
+    Answer GETs with ETag/Last-Modified and return 304 when the client's copy
+    is current. ``last_modified(view, request, kwargs)`` returns a datetime
+    or None; it runs once per generation and scope, and its result is cached.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            generation = get_generation(namespace)
+            # The rendered bytes also depend on the negotiated format
+            scope = (namespace, generation, request.META.get('HTTP_ACCEPT', ''), _scope(self, request, kwargs))
+            digest = hashlib.md5(repr(scope).encode()).hexdigest()
+            key = f'{namespace}-validators:{generation}:{digest}'
+            etag = quote_etag(digest)
+
+            modified = cache.get(key)
+            if modified is None:
+                changed = last_modified(self, request, kwargs)
+                modified = int(changed.timestamp()) if changed else 0
+                cache.set(key, modified, getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 3600))
+            not_modified = get_conditional_response(request, etag=etag, last_modified=modified or None)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response['ETag'] = etag
+                if modified:
+                    response['Last-Modified'] = http_date(modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,605 @@
+"""
+Bulk catalogue import and export.
+
+CSV, XLSX and JSONL files share one flat layout with one row per
+variant: the product columns repeat on every variant row, and a blank
+product cell leaves the stored value alone. ``sku`` is the natural key
+for variants and ``product_slug`` for products. A row with a blank
+``sku`` and blank variant cells only creates or updates its product;
+exports write one for each product without variants. Brands, categories
+(slugs) and fragrance families (names) are created when missing;
+list cells are joined with ``|`` and ``notes`` holds ``type:name`` pairs
+(``top:برغموت|base:مسك``) that replace the product's notes. A
+``sale_price`` of 0 clears the offer, as in ``ProductVariant.save``.
+
+Every row is validated before anything is written. Nothing is imported
+while any row is invalid, unless ``skip_invalid`` is set. The rows are
+then loaded in one transaction with chunked ``bulk_create`` and
+``bulk.update_rows``, touching only rows whose values differ. Bulk writes
+send no signals, so price summaries, the search index, related flags and
+the catalogue generation are refreshed once at the end, for the changed
+products only. Exports walk the catalogue with ``.iterator()`` and yield rows,
+so a response can stream them without building the file in memory.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_unicode_slug
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.text import slugify
+from .bulk import update_rows
+from .cache import bump_generation_on_commit
+from . import detail, suggest
+from . import notes as scent_notes
+from .models import Brand, Category, FragranceFamily, Product, ProductNote, ProductVariant
+from .search import index_products
+
+PRODUCT_COLUMNS = [
+    'product_slug', 'name_ar', 'brand_slug', 'brand_name', 'gender', 'occasion', 'vibe',
+    'description', 'story', 'is_featured', 'is_bestseller', 'is_new', 'is_active',
+    'categories', 'fragrance_families', 'notes',
+]
+VARIANT_COLUMNS = [
+    'sku', 'variant_name', 'size_ml', 'price', 'sale_price', 'cost_price',
+    'stock_quantity', 'low_stock_threshold', 'barcode', 'variant_is_active',
+]
+COLUMNS = PRODUCT_COLUMNS + VARIANT_COLUMNS
+FORMATS = ('csv', 'xlsx', 'jsonl')
+SEPARATOR = '|'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'نعم'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'لا'}
+MAX_PRICE = Decimal('99999999.99')
+STAT_KEYS = [
+    'rows', 'rows_skipped', 'products_created', 'products_updated', 'variants_created', 'variants_updated',
+    'brands_created', 'categories_created', 'fragrance_families_created', 'notes_created', 'notes_deleted',
+]
+
+
+class CatalogueFileError(ValueError):
+    """The file as a whole cannot be read (format, encoding, missing dependency)."""
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # XLSX stores whole numbers as floats
+        value = int(value)
+    return str(value).strip()
+
+
+def _decimal(text):
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        raise ValueError('قيمة غير صالحة')
+    if not value.is_finite() or value < 0 or value > MAX_PRICE:
+        raise ValueError('قيمة غير صالحة')
+    return value.quantize(Decimal('0.01'))
+
+
+def _integer(text):
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        raise ValueError('يجب أن تكون عدداً صحيحاً')
+    if not value.is_finite() or value != value.to_integral_value() or value < 0:
+        raise ValueError('يجب أن تكون عدداً صحيحاً')
+    return int(value)
+
+
+def _boolean(text):
+    if text.lower() in TRUE_VALUES:
+        return True
+    if text.lower() in FALSE_VALUES:
+        return False
+    raise ValueError('قيمة منطقية غير صالحة')
+
+
+def _gender(text):
+    if text not in dict(Product.GENDER_CHOICES):
+        raise ValueError('القيم المسموحة: ' + ', '.join(dict(Product.GENDER_CHOICES)))
+    return text
+
+
+def _limited(length):
+    def parse(text):
+        if len(text) > length:
+            raise ValueError(f'الحد الأقصى {length} حرفاً')
+        return text
+    return parse
+
+
+# column -> (model field, parser); blank cells are skipped before parsing
+PRODUCT_FIELDS = {
+    'name_ar': ('name_ar', _limited(200)),
+    'gender': ('gender', _gender),
+    'occasion': ('occasion', str),
+    'vibe': ('vibe', str),
+    'description': ('description', str),
+    'story': ('story', str),
+    'is_featured': ('is_featured', _boolean),
+    'is_bestseller': ('is_bestseller', _boolean),
+    'is_new': ('is_new', _boolean),
+    'is_active': ('is_active', _boolean),
+}
+VARIANT_FIELDS = {
+    'variant_name': ('name', _limited(100)),
+    'size_ml': ('size_ml', _integer),
+    'price': ('price', _decimal),
+    'sale_price': ('sale_price', _decimal),
+    'cost_price': ('cost_price', _decimal),
+    'stock_quantity': ('stock_quantity', _integer),
+    'low_stock_threshold': ('low_stock_threshold', _integer),
+    'barcode': ('barcode', _limited(100)),
+    'variant_is_active': ('is_active', _boolean),
+}
+
+
+def _split(text):
+    return list(dict.fromkeys(part.strip() for part in text.split(SEPARATOR) if part.strip()))
+
+
+def _notes(text):
+    notes = []
+    for part in _split(text):
+        note_type, _, name = part.partition(':')
+        if note_type.strip() not in dict(ProductNote.NOTE_TYPES) or not name.strip():
+            raise ValueError('الصيغة المطلوبة: top:اسم|heart:اسم|base:اسم')
+        notes.append((note_type.strip(), name.strip()[:100]))
+    return notes
+
+
+def _slug(text):
+    try:
+        validate_unicode_slug(text)
+    except ValidationError:
+        raise ValueError('رابط غير صالح')
+    return text
+
+
+# -- reading -----------------------------------------------------------------
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'ndjson': 'jsonl', 'json': 'jsonl'}.get(extension, extension)
+
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise CatalogueFileError('XLSX support requires openpyxl')
+    return openpyxl
+
+
+def read_rows(fh, file_format):
+    """Yield ``(row_number, {column: value})`` from a binary file object."""
+    if file_format == 'csv':
+        text = io.TextIOWrapper(fh, encoding='utf-8-sig', newline='')
+        try:
+            # Row 1 is the header
+            for number, row in enumerate(csv.DictReader(text), start=2):
+                yield number, row
+        except UnicodeDecodeError:
+            raise CatalogueFileError('CSV files must be UTF-8 encoded')
+        finally:
+            text.detach()
+    elif file_format == 'jsonl':
+        for number, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                raise CatalogueFileError(f'Line {number} is not valid JSON')
+            if not isinstance(row, dict):
+                raise CatalogueFileError(f'Line {number} is not a JSON object')
+            yield number, row
+    elif file_format == 'xlsx':
+        try:
+            workbook = _openpyxl().load_workbook(fh, read_only=True, data_only=True)
+        except Exception as exc:
+            # openpyxl raises anything from BadZipFile to KeyError on a broken file
+            raise CatalogueFileError(f'Cannot read the workbook: {exc}')
+        try:
+            sheet_rows = workbook.active.iter_rows(values_only=True)
+            header = [_text(cell) for cell in next(sheet_rows, ())]
+            for number, values in enumerate(sheet_rows, start=2):
+                if any(value is not None for value in values):
+                    yield number, dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        raise CatalogueFileError(f'Unsupported format "{file_format}"; use one of {", ".join(FORMATS)}')
+
+
+# -- importing ---------------------------------------------------------------
+
+def parse_row(raw):
+    """Validate one row; returns ``(parsed, errors)`` with errors keyed by column."""
+    row = {column: _text(raw.get(column)) for column in COLUMNS}
+    errors = {}
+    product, variant, links = {}, {}, {}
+
+    if not row['product_slug']:
+        errors['product_slug'] = 'هذا الحقل مطلوب'
+    for column, parse in (('product_slug', _slug), ('sku', _limited(50))):
+        if row[column]:
+            try:
+                parse(row[column])
+            except ValueError as exc:
+                errors[column] = str(exc)
+
+    for fields, target in ((PRODUCT_FIELDS, product), (VARIANT_FIELDS, variant)):
+        for column, (field, parse) in fields.items():
+            if row[column]:
+                try:
+                    target[field] = parse(row[column])
+                except ValueError as exc:
+                    errors[column] = str(exc)
+    if variant.get('sale_price') == 0:
+        variant['sale_price'] = None
+    # Without a sku the row is product-only; variant cells would be dropped silently
+    if not row['sku'] and any(row[column] for column in VARIANT_FIELDS):
+        errors['sku'] = 'هذا الحقل مطلوب'
+
+    if row['brand_slug'] or row['brand_name']:
+        brand_slug = row['brand_slug'] or slugify(row['brand_name'], allow_unicode=True)
+        try:
+            links['brand'] = (_slug(brand_slug), row['brand_name'][:100] or brand_slug)
+        except ValueError as exc:
+            errors['brand_slug'] = str(exc)
+    if row['categories']:
+        try:
+            links['categories'] = [_slug(slug) for slug in _split(row['categories'])]
+        except ValueError as exc:
+            errors['categories'] = str(exc)
+    if row['fragrance_families']:
+        links['fragrance_families'] = [name[:100] for name in _split(row['fragrance_families'])]
+    if row['notes']:
+        try:
+            links['notes'] = _notes(row['notes'])
+        except ValueError as exc:
+            errors['notes'] = str(exc)
+
+    parsed = {'slug': row['product_slug'], 'sku': row['sku'], 'product': product, 'variant': variant, 'links': links}
+    return parsed, errors
+
+
+def _lookup(queryset, field, values, chunk_size):
+    """``{value: obj}`` for ``field__in=values``, queried in chunks."""
+    values = list(values)
+    found = {}
+    for start in range(0, len(values), chunk_size):
+        for obj in queryset.filter(**{f'{field}__in': values[start:start + chunk_size]}):
+            found.setdefault(getattr(obj, field), obj)
+    return found
+
+
+def _values(queryset, field, values, chunk_size, *columns):
+    """Rows of ``columns`` for ``field__in=values``, queried in chunks."""
+    values = list(values)
+    for start in range(0, len(values), chunk_size):
+        yield from queryset.filter(**{f'{field}__in': values[start:start + chunk_size]}).values_list(*columns)
+
+
+def _changes(obj, fields):
+    return {name for name, value in fields.items() if getattr(obj, name) != value}
+
+
+class CatalogueImport:
+    """Validate and load catalogue rows; see the module docstring for the layout."""
+
+    def __init__(self, rows, skip_invalid=False, chunk_size=1000):
+        self.rows = rows
+        self.skip_invalid = skip_invalid
+        self.chunk_size = chunk_size
+        self.errors = []
+        self.stats = dict.fromkeys(STAT_KEYS, 0)
+        # Products whose rows were written; only these are re-summarized and re-indexed
+        self.touched = set()
+
+    def error(self, number, sku, errors):
+        self.errors.append({'row': number, 'sku': sku, 'errors': errors})
+
+    def run(self, dry_run=False):
+        """Returns a summary; ``committed`` is False when nothing was written."""
+        products, variants, invalid = self.collect()
+        if self.errors and not self.skip_invalid:
+            return self.summary(False)
+        products = {slug: product for slug, product in products.items() if slug not in invalid}
+        kept = [variant for variant in variants if variant['slug'] not in invalid]
+        self.stats['rows_skipped'] = self.stats['rows'] - sum(product['rows'] for product in products.values())
+        if products:
+            with transaction.atomic():
+                self.load(products, kept)
+                if dry_run:
+                    transaction.set_rollback(True)
+        return self.summary(bool(products) and not dry_run)
+
+    def summary(self, committed):
+        return {'committed': committed, **self.stats, 'errors': sorted(self.errors, key=lambda e: e['row'])}
+
+    def collect(self):
+        products, variants, seen = {}, [], {}
+        invalid = set()
+        for number, raw in self.rows:
+            self.stats['rows'] += 1
+            parsed, errors = parse_row(raw)
+            if parsed['sku'] in seen:
+                errors['sku'] = f'مكرر (السطر {seen[parsed["sku"]]})'
+            if errors:
+                self.error(number, parsed['sku'] or None, errors)
+                invalid.add(parsed['slug'])
+                continue
+            product = products.setdefault(parsed['slug'], {'row': number, 'rows': 0, 'fields': {}, 'links': {}})
+            product['rows'] += 1
+            # The first non-blank cell wins across a product's rows
+            for name, value in parsed['product'].items():
+                product['fields'].setdefault(name, value)
+            for name, value in parsed['links'].items():
+                product['links'].setdefault(name, value)
+            if not parsed['sku']:
+                continue
+            seen[parsed['sku']] = number
+            variants.append({'row': number, 'slug': parsed['slug'], 'sku': parsed['sku'], 'fields': parsed['variant']})
+
+        # Rows that only become invalid against the database
+        existing_products = {slug for slug, in _values(Product.objects, 'slug', products, self.chunk_size, 'slug')}
+        existing_skus = {sku for sku, in _values(ProductVariant.objects, 'sku', seen, self.chunk_size, 'sku')}
+        for slug, product in products.items():
+            if slug in existing_products:
+                continue
+            missing = {column: 'مطلوب لمنتج جديد' for column, present in (
+                ('name_ar', 'name_ar' in product['fields']),
+                ('gender', 'gender' in product['fields']),
+                ('brand_slug', 'brand' in product['links']),
+            ) if not present}
+            if missing:
+                self.error(product['row'], None, missing)
+                invalid.add(slug)
+        for variant in variants:
+            if variant['sku'] not in existing_skus and 'price' not in variant['fields']:
+                self.error(variant['row'], variant['sku'], {'price': 'مطلوب لعبوة جديدة'})
+                invalid.add(variant['slug'])
+        return products, variants, invalid
+
+    def load(self, products, variants):
+        now = timezone.now()
+        brands = self.ensure_brands(products)
+        ids = self.load_products(products, brands, now)
+        self.replace_links(products, ids, 'categories', self.ensure_categories(products))
+        self.replace_links(products, ids, 'fragrance_families', self.ensure_families(products))
+        self.replace_notes(products, ids)
+        self.load_variants(variants, ids, now)
+
+        touched = sorted(self.touched)
+        for start in range(0, len(touched), self.chunk_size):
+            chunk = touched[start:start + self.chunk_size]
+            Product.objects.filter(id__in=chunk).update(related_dirty=True, updated_at=now)
+            Product.objects.refresh_price_summary(chunk, batch_size=self.chunk_size)
+            index_products(chunk)
+        if touched:
+            bump_generation_on_commit()
+            detail.invalidate(touched)
+            bump_generation_on_commit(scent_notes.NAMESPACE)
+            suggest.changed_all()
+
+    def load_products(self, products, brands, now):
+        """Create/update products; returns ``{slug: id}``."""
+        existing = _lookup(Product.objects.all(), 'slug', products, self.chunk_size)
+        to_create, to_update, update_fields = [], [], {'updated_at'}
+        for slug, product in products.items():
+            fields = dict(product['fields'])
+            if 'brand' in product['links']:
+                fields['brand_id'] = brands[product['links']['brand'][0]]
+            obj = existing.get(slug)
+            if obj is None:
+                to_create.append(Product(slug=slug, **fields))
+                continue
+            changed = _changes(obj, fields)
+            if changed:
+                for name in changed:
+                    setattr(obj, name, fields[name])
+                # Bulk updates skip auto_now, and Last-Modified reads it
+                obj.updated_at = now
+                update_fields |= changed
+                to_update.append(obj)
+        Product.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        update_rows(to_update, sorted(update_fields))
+        self.stats['products_created'] += len(to_create)
+        self.stats['products_updated'] += len(to_update)
+
+        ids = dict(_values(Product.objects, 'slug', products, self.chunk_size, 'slug', 'id'))
+        self.touched.update(ids[obj.slug] for obj in to_create + to_update)
+        return ids
+
+    def load_variants(self, variants, ids, now):
+        existing = _lookup(ProductVariant.objects.all(), 'sku', [v['sku'] for v in variants], self.chunk_size)
+        to_create, to_update, update_fields = [], [], {'updated_at'}
+        for variant in variants:
+            fields = dict(variant['fields'], product_id=ids[variant['slug']])
+            obj = existing.get(variant['sku'])
+            if obj is None:
+                to_create.append(ProductVariant(sku=variant['sku'], **fields))
+                self.touched.add(fields['product_id'])
+                continue
+            changed = _changes(obj, fields)
+            if changed:
+                # A variant moved to another product changes both summaries
+                self.touched.update((obj.product_id, fields['product_id']))
+                for name in changed:
+                    setattr(obj, name, fields[name])
+                obj.updated_at = now
+                update_fields |= changed
+                to_update.append(obj)
+        ProductVariant.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        update_rows(to_update, sorted(update_fields))
+        self.stats['variants_created'] += len(to_create)
+        self.stats['variants_updated'] += len(to_update)
+
+    def ensure(self, model, field, wanted, stat, **defaults):
+        """``{value: id}`` for ``wanted`` (value -> name_ar), creating the missing rows."""
+        queryset = model.objects.order_by('id')
+        found = {}
+        for value, pk in _values(queryset, field, wanted, self.chunk_size, field, 'id'):
+            found.setdefault(value, pk)
+        missing = [model(**{field: value, 'name_ar': name, **defaults}) for value, name in wanted.items() if value not in found]
+        if missing:
+            model.objects.bulk_create(missing, batch_size=self.chunk_size)
+            self.stats[stat] += len(missing)
+            for value, pk in _values(queryset, field, [getattr(obj, field) for obj in missing], self.chunk_size, field, 'id'):
+                found.setdefault(value, pk)
+        return found
+
+    def ensure_brands(self, products):
+        wanted = {}
+        for product in products.values():
+            if 'brand' in product['links']:
+                slug, name = product['links']['brand']
+                wanted.setdefault(slug, name)
+        return self.ensure(Brand, 'slug', wanted, 'brands_created')
+
+    def ensure_categories(self, products):
+        wanted = {slug: slug.replace('-', ' ')[:100] for product in products.values() for slug in product['links'].get('categories', [])}
+        return self.ensure(Category, 'slug', wanted, 'categories_created')
+
+    def ensure_families(self, products):
+        wanted = {name: name for product in products.values() for name in product['links'].get('fragrance_families', [])}
+        return self.ensure(FragranceFamily, 'name_ar', wanted, 'fragrance_families_created')
+
+    def replace_links(self, products, ids, name, targets):
+        """Swap the m2m links of products whose cell was filled in; blank cells keep theirs."""
+        through = getattr(Product, name).through
+        target_column = getattr(Product, name).field.m2m_reverse_field_name() + '_id'
+        wanted = {ids[slug]: {targets[value] for value in product['links'][name]}
+                  for slug, product in products.items() if name in product['links']}
+        current = defaultdict(set)
+        for product_id, target in _values(through.objects, 'product_id', wanted, self.chunk_size, 'product_id', target_column):
+            current[product_id].add(target)
+
+        changed = [product_id for product_id, target_ids in wanted.items() if target_ids != current[product_id]]
+        for start in range(0, len(changed), self.chunk_size):
+            # The through model has no signal receivers, so this stays a single DELETE
+            through.objects.filter(product_id__in=changed[start:start + self.chunk_size]).delete()
+        through.objects.bulk_create(
+            [through(product_id=product_id, **{target_column: target}) for product_id in changed for target in wanted[product_id]],
+            batch_size=self.chunk_size,
+        )
+        self.touched.update(changed)
+
+    def replace_notes(self, products, ids):
+        wanted = {ids[slug]: product['links']['notes'] for slug, product in products.items() if 'notes' in product['links']}
+        current = defaultdict(dict)
+        for note_id, product_id, note_type, name in _values(
+            ProductNote.objects.order_by('id'), 'product_id', wanted, self.chunk_size, 'id', 'product_id', 'note_type', 'name_ar',
+        ):
+            current[product_id].setdefault((note_type, name), note_id)
+
+        stale, fresh = [], []
+        for product_id, notes in wanted.items():
+            existing = current[product_id]
+            # Unchanged notes keep their rows (and icons)
+            removed = [note_id for key, note_id in existing.items() if key not in notes]
+            added = [ProductNote(product_id=product_id, note_type=t, name_ar=n) for t, n in notes if (t, n) not in existing]
+            if removed or added:
+                stale.extend(removed)
+                fresh.extend(added)
+                self.touched.add(product_id)
+        for start in range(0, len(stale), self.chunk_size):
+            ProductNote.objects.filter(id__in=stale[start:start + self.chunk_size]).delete()
+        ProductNote.objects.bulk_create(scent_notes.assign_terms(fresh), batch_size=self.chunk_size)
+        self.stats['notes_created'] += len(fresh)
+        self.stats['notes_deleted'] += len(stale)
+
+
+def import_catalogue(fh, file_format, dry_run=False, skip_invalid=False, chunk_size=1000):
+    return CatalogueImport(read_rows(fh, file_format), skip_invalid=skip_invalid, chunk_size=chunk_size).run(dry_run=dry_run)
+
+
+# -- exporting ---------------------------------------------------------------
+
+def export_rows(queryset=None, chunk_size=500):
+    """Yield one ``{column: value}`` per variant; products without variants get one blank-variant row."""
+    queryset = (queryset if queryset is not None else Product.objects.all()).select_related(None).prefetch_related(None)
+    queryset = queryset.select_related('brand').prefetch_related(
+        Prefetch('variants', queryset=ProductVariant.objects.order_by('id')),
+        Prefetch('notes', queryset=ProductNote.objects.order_by('id')),
+        'categories', 'fragrance_families',
+    ).order_by('id')
+    blank_variant = {column: '' for column in VARIANT_COLUMNS}
+    # With prefetches, iterator() fetches related rows one chunk at a time
+    for product in queryset.iterator(chunk_size=chunk_size):
+        base = {
+            'product_slug': product.slug,
+            'name_ar': product.name_ar,
+            'brand_slug': product.brand.slug,
+            'brand_name': product.brand.name_ar,
+            'gender': product.gender,
+            'occasion': product.occasion,
+            'vibe': product.vibe,
+            'description': product.description,
+            'story': product.story,
+            'is_featured': product.is_featured,
+            'is_bestseller': product.is_bestseller,
+            'is_new': product.is_new,
+            'is_active': product.is_active,
+            'categories': SEPARATOR.join(c.slug for c in product.categories.all()),
+            'fragrance_families': SEPARATOR.join(f.name_ar for f in product.fragrance_families.all()),
+            'notes': SEPARATOR.join(f'{n.note_type}:{n.name_ar}' for n in product.notes.all()),
+        }
+        variants = product.variants.all()
+        if not variants:
+            yield {**base, **blank_variant}
+        for variant in variants:
+            yield {
+                **base,
+                'sku': variant.sku,
+                'variant_name': variant.name,
+                'size_ml': variant.size_ml if variant.size_ml is not None else '',
+                'price': str(variant.price),
+                'sale_price': str(variant.sale_price) if variant.sale_price is not None else '',
+                'cost_price': str(variant.cost_price) if variant.cost_price is not None else '',
+                'stock_quantity': variant.stock_quantity,
+                'low_stock_threshold': variant.low_stock_threshold,
+                'barcode': variant.barcode,
+                'variant_is_active': variant.is_active,
+            }
+
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer produced."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    # The BOM makes Excel open Arabic text as UTF-8
+    yield '\ufeff' + writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[column] for column in COLUMNS])
+
+
+def stream_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def write_xlsx(rows, fh):
+    """XLSX cannot be produced incrementally; write-only mode at least keeps rows out of memory."""
+    workbook = _openpyxl().Workbook(write_only=True)
+    sheet = workbook.create_sheet('catalogue')
+    sheet.append(COLUMNS)
+    for row in rows:
+        sheet.append([row[column] for column in COLUMNS])
+    workbook.save(fh)
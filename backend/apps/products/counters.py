@@ -0,0 +1,143 @@
+"""
+Buffered product view counting.
+
+``record_view`` only bumps an in-process counter; nothing is written
+during the request. Once per ``PRODUCT_VIEW_FLUSH_INTERVAL`` seconds the
+worker flushes its buffer after a response has been sent
+(``request_finished``), so the client never waits on it. The first view
+after a flush also arms a timer for the same interval, so a worker that
+gets no more traffic still writes its views (``PRODUCT_VIEW_FLUSH_ASYNC =
+False`` leaves it out). The buffer is flushed once more when the process
+exits, as on a Passenger idle shutdown or a recycle. Every worker
+process flushes only its own deltas with ``F()`` increments, so several
+Passenger/gunicorn processes can flush concurrently and a crash loses at
+most one interval of views.
+
+A flush issues one UPDATE per distinct increment (products viewed the
+same number of times share a statement) for ``Product.view_count``, and
+the same for the ``ProductDailyViews`` rollup.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = Counter()  # (slug, date) -> views
+_last_flush = time.monotonic()
+_timer = None
+
+
+def flush_interval():
+    return getattr(settings, 'PRODUCT_VIEW_FLUSH_INTERVAL', 60)
+
+
+def record_view(slug):
+    with _lock:
+        if not _buffer:
+            _arm()
+        _buffer[(slug, timezone.localdate())] += 1
+
+
+def _arm():
+    # Called with _lock held
+    global _timer
+    if _timer is None and getattr(settings, 'PRODUCT_VIEW_FLUSH_ASYNC', True):
+        _timer = threading.Timer(flush_interval(), _flush_in_background)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_in_background():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush()
+    finally:
+        close_old_connections()
+    with _lock:
+        if _buffer:
+            # Views that came in meanwhile, or a failed flush
+            _arm()
+
+
+def pending():
+    with _lock:
+        return sum(_buffer.values())
+
+
+def _take():
+    global _buffer, _last_flush
+    with _lock:
+        taken, _buffer = _buffer, Counter()
+        _last_flush = time.monotonic()
+    return taken
+
+
+def _restore(counts):
+    with _lock:
+        _buffer.update(counts)
+
+
+def _by_increment(counts):
+    groups = defaultdict(list)
+    for key, views in counts.items():
+        groups[views].append(key)
+    return groups
+
+
+def flush():
+    """Write buffered views; returns how many were flushed."""
+    from .models import Product, ProductDailyViews
+
+    counts = _take()
+    if not counts:
+        return 0
+    try:
+        with transaction.atomic():
+            ids = dict(Product.objects.filter(slug__in={slug for slug, _ in counts}).values_list('slug', 'id'))
+            totals, daily = Counter(), Counter()
+            for (slug, day), views in counts.items():
+                if slug in ids:
+                    totals[ids[slug]] += views
+                    daily[(ids[slug], day)] += views
+
+            for views, product_ids in _by_increment(totals).items():
+                Product.objects.filter(id__in=product_ids).update(view_count=F('view_count') + views)
+
+            # Create missing rollup rows first so concurrent flushes only ever increment
+            ProductDailyViews.objects.bulk_create(
+                [ProductDailyViews(product_id=product_id, date=day) for product_id, day in daily],
+                ignore_conflicts=True,
+            )
+            for views, keys in _by_increment(daily).items():
+                by_day = defaultdict(list)
+                for product_id, day in keys:
+                    by_day[day].append(product_id)
+                for day, product_ids in by_day.items():
+                    ProductDailyViews.objects.filter(date=day, product_id__in=product_ids).update(views=F('views') + views)
+    except Exception:
+        # Keep the views for the next attempt rather than dropping them
+        _restore(counts)
+        logger.exception('Flushing product view counts failed')
+        return 0
+    return sum(counts.values())
+
+
+def flush_if_due(**kwargs):
+    if _buffer and time.monotonic() - _last_flush >= flush_interval():
+        flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    if _buffer:
+        flush()
@@ -0,0 +1,124 @@
+"""
+Product detail assembly and per-product payload cache.
+
+Product pages are the landing pages of ad campaigns, so the public detail
+endpoint does not go through the list machinery. ``load`` fetches one
+active product with its brand in a single query and prefetches the
+categories, fragrance families, variants, notes and images, which makes six
+queries whatever the product holds. The variants prefetch also caches each
+variant's ``product``, so ``product_name_ar`` and ``product_main_image``
+read no further rows. Last-Modified comes from the rows already loaded, so
+no separate aggregate is run.
+
+The serialized payload is cached per product. Its key combines the
+product's own version (``product:<id>``, bumped by the signals of the
+product and its variants, notes, images and links) with a shared
+``product-detail`` version for changes that reach every page: brands,
+categories, families and image derivatives. Editing one product therefore
+leaves the other cached pages alone, unlike the catalogue-wide generation
+the list endpoints use. Slugs are mapped to ids in the cache too, so a
+warm page is served, or answered with a 304, without a single query.
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from .cache import STATS_KEYS, _count, _scope, bump_generation_on_commit, get_generation
+from .models import Product
+
+SHARED = 'product-detail'
+SLUG_KEY = 'product-slug:{slug}'
+
+
+def timeout():
+    return getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 3600)
+
+
+def load(product_id, slug):
+    """The active product with every relation the detail page renders, or None."""
+    return Product.objects.filter(id=product_id, slug=slug, is_active=True).select_related('brand').prefetch_related(
+        'categories', 'fragrance_families', 'variants', 'notes', 'images',
+    ).first()
+
+
+def last_modified(product):
+    # Notes and deleted rows move product.updated_at (see products.signals)
+    changed = [product.updated_at]
+    changed += [variant.updated_at for variant in product.variants.all()]
+    changed += [image.updated_at for image in product.images.all()]
+    return max(filter(None, changed), default=None)
+
+
+def resolve(slug, fresh=False):
+    """Id of the active product with this slug, cached."""
+    key = SLUG_KEY.format(slug=slug)
+    product_id = None if fresh else cache.get(key)
+    if product_id is None:
+        product_id = Product.objects.filter(slug=slug, is_active=True).values_list('id', flat=True).first()
+        if product_id is None:
+            cache.delete(key)
+        else:
+            cache.set(key, product_id, timeout())
+    return product_id
+
+
+def payload_key(product_id, digest):
+    shared, own = get_generation(SHARED), get_generation(f'product:{product_id}')
+    return f'{SHARED}:{product_id}:{shared}:{own}:{digest}'
+
+
+def invalidate(product_ids):
+    for product_id in set(product_ids):
+        bump_generation_on_commit(f'product:{product_id}')
+
+
+def invalidate_all():
+    bump_generation_on_commit(SHARED)
+
+
+def respond(view, request, slug):
+    """
+    The detail response for ``slug``: from the cache when the product has
+    not changed, with ETag/Last-Modified and a 304 for a current client copy.
+    """
+    product_id = resolve(slug)
+    if product_id is None:
+        _count(STATS_KEYS['misses'])
+        raise Http404
+
+    # The rendered bytes depend on the negotiated format, the host and ?fields=
+    scope = repr((request.META.get('HTTP_ACCEPT', ''), _scope(view, request, {'slug': slug})))
+    digest = hashlib.md5(scope.encode()).hexdigest()
+    key = payload_key(product_id, digest)
+    entry = cache.get(key)
+    hit = entry is not None
+    if not hit:
+        product = load(product_id, slug)
+        if product is None:
+            # Renamed or deactivated since the slug was cached; the slug may belong to another product now
+            product_id = resolve(slug, fresh=True)
+            product = load(product_id, slug) if product_id is not None else None
+            if product is None:
+                _count(STATS_KEYS['misses'])
+                raise Http404
+            key = payload_key(product_id, digest)
+        changed = last_modified(product)
+        entry = {'data': view.get_serializer(product).data, 'modified': int(changed.timestamp()) if changed else 0}
+        cache.set(key, entry, timeout())
+
+    etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+    not_modified = get_conditional_response(request, etag=etag, last_modified=entry['modified'] or None)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    _count(STATS_KEYS['hits' if hit else 'misses'])
+    response = Response(entry['data'])
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    response['ETag'] = etag
+    if entry['modified']:
+        response['Last-Modified'] = http_date(entry['modified'])
+    return response
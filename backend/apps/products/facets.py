@@ -0,0 +1,121 @@
+"""
+Facet counts for the storefront filter sidebar.
+
+Each facet is counted against the list endpoint's queryset with every
+filter applied except the facet's own ("exclude own facet"), so selecting
+a brand still shows how many products the other brands would return.
+Facets whose own parameters are absent share one filtered queryset.
+"""
+import copy
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .cache import get_generation
+from .models import Product
+
+# Upper bound is exclusive; None means open-ended
+DEFAULT_PRICE_BUCKETS = [(0, 100), (100, 200), (200, 350), (350, 500), (500, None)]
+
+FACET_PARAMS = {
+    'categories': ['categories__slug'],
+    'brands': ['brand__slug'],
+    'gender': ['gender'],
+    'fragrance_families': ['fragrance_families'],
+    'price': ['min_price__gte', 'min_price__lte', 'min_price__lt'],
+}
+# Query parameters that never change the counts
+IGNORED_PARAMS = {'page', 'page_size', 'cursor', 'ordering', 'format', 'fields', 'expand', 'total'}
+
+
+def price_buckets():
+    return getattr(settings, 'PRODUCT_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+
+
+def _filtered_queryset(view, request, excluded):
+    params = request.query_params.copy()
+    for param in excluded:
+        params.pop(param, None)
+    django_request = copy.copy(request._request)
+    django_request.GET = params
+    scoped_request = Request(django_request)
+
+    queryset = view.get_queryset().prefetch_related(None)
+    for backend in view.filter_backends:
+        queryset = backend().filter_queryset(scoped_request, queryset, view)
+    return queryset.order_by()
+
+
+def _grouped(queryset, value_field, label_field):
+    rows = queryset.values(value_field, label_field).annotate(count=Count('id', distinct=True)).order_by('-count', value_field)
+    return [
+        {'value': row[value_field], 'label': row[label_field], 'count': row['count']}
+        for row in rows if row[value_field] is not None
+    ]
+
+
+def compute_facets(view, request):
+    active = {param for params in FACET_PARAMS.values() for param in params if request.query_params.get(param)}
+
+    def excluded_for(facet):
+        return tuple(sorted(active.intersection(FACET_PARAMS[facet])))
+
+    querysets = {}
+
+    def queryset_for(excluded):
+        if excluded not in querysets:
+            querysets[excluded] = _filtered_queryset(view, request, excluded)
+        return querysets[excluded]
+
+    buckets = price_buckets()
+    aggregates = {(): {'total': Count('id', distinct=True)}}
+    aggregates.setdefault(excluded_for('gender'), {}).update({
+        f'gender_{value}': Count('id', distinct=True, filter=Q(gender=value))
+        for value, _ in Product.GENDER_CHOICES
+    })
+    aggregates.setdefault(excluded_for('price'), {}).update({
+        f'price_{i}': Count('id', distinct=True, filter=Q(min_price__gte=low) & (Q(min_price__lt=high) if high is not None else Q()))
+        for i, (low, high) in enumerate(buckets)
+    })
+    # Scalar facets that share a queryset are counted in a single aggregate query
+    counts = {}
+    for excluded, group in aggregates.items():
+        counts.update(queryset_for(excluded).aggregate(**group))
+
+    return {
+        'total': counts['total'],
+        'categories': _grouped(queryset_for(excluded_for('categories')), 'categories__slug', 'categories__name_ar'),
+        'brands': _grouped(queryset_for(excluded_for('brands')), 'brand__slug', 'brand__name_ar'),
+        'fragrance_families': _grouped(
+            queryset_for(excluded_for('fragrance_families')), 'fragrance_families__id', 'fragrance_families__name_ar'
+        ),
+        'gender': [
+            {'value': value, 'label': label, 'count': counts[f'gender_{value}']}
+            for value, label in Product.GENDER_CHOICES
+        ],
+        'price': [
+            {'min': low, 'max': high, 'count': counts[f'price_{i}']}
+            for i, (low, high) in enumerate(buckets)
+        ],
+    }
+
+
+def get_facets(view, request):
+    """Facet counts, cached for the unfiltered and single-filter cases."""
+    params = sorted(
+        (key, value)
+        for key in request.query_params if key not in IGNORED_PARAMS
+        for value in request.query_params.getlist(key) if value
+    )
+    if len(params) > 1 or any(key == api_settings.SEARCH_PARAM for key, _ in params):
+        return compute_facets(view, request)
+
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    key = f'product-facets:{get_generation()}:{digest}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(view, request)
+        cache.set(key, facets, getattr(settings, 'PRODUCT_FACETS_CACHE_TIMEOUT', 600))
+    return facets
@@ -0,0 +1,163 @@
+"""
+Fast-path serialization for hot read endpoints.
+
+DRF's ``Serializer.to_representation`` resolves every field again for
+every row. ``get_attribute`` walks ``source_attrs`` with callable checks
+and exception handling, ``_readable_fields`` is regenerated, and nested
+serializers repeat all of it. ``FastPathMixin`` compiles a bound
+serializer, with its sparse fieldset and context already applied, into a
+list of ``(name, accessor)`` pairs once per serializer instance, so a
+``many=True`` page pays for it once. Plain columns are read with
+``attrgetter``, and primary-key relations read the ``*_id`` column
+directly. Char/integer/boolean/read-only fields skip
+``to_representation``, and method fields call the bound method. Nested
+serializers and lists are compiled recursively. Anything else (decimals,
+dates, files, srcsets, overridden ``to_representation``) still goes
+through the field's own code, so the rendered JSON is byte-for-byte
+DRF's. The contract tests next to each serializer check that.
+
+``FAST_SERIALIZERS = False`` switches back to plain DRF.
+"""
+import inspect
+from operator import attrgetter
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.manager import BaseManager
+from django.db.models.fields.related_descriptors import ReverseOneToOneDescriptor
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+_SKIP = object()
+
+
+def enabled():
+    return getattr(settings, 'FAST_SERIALIZERS', True)
+
+
+def _compilable(serializer):
+    # Serializers that customise to_representation keep their own
+    return type(serializer).to_representation in (serializers.Serializer.to_representation, FastPathMixin.to_representation)
+
+
+def _converter(field):
+    """Callable applied to a non-None attribute, or None when it is returned as is."""
+    method = type(field).to_representation
+    if method is serializers.CharField.to_representation:
+        return str
+    if method is serializers.IntegerField.to_representation:
+        return int
+    if method is serializers.ReadOnlyField.to_representation:
+        return None
+    if method is serializers.BooleanField.to_representation:
+        slow = field.to_representation
+        return lambda value: value if value is True or value is False else slow(value)
+    if isinstance(field, serializers.ListSerializer) and method is serializers.ListSerializer.to_representation and _compilable(field.child):
+        child = compiled(field.child)
+        return lambda value: [child(item) for item in (value.all() if isinstance(value, BaseManager) else value)]
+    if isinstance(field, serializers.Serializer) and _compilable(field):
+        return compiled(field)
+    return field.to_representation
+
+
+def _plain_getter(field, model):
+    """Plain getattr chain when DRF's get_attribute would do nothing more."""
+    if model is None or not field.source_attrs or field.default is not serializers.empty:
+        return None
+    *path, attr = field.source_attrs
+    for name in path:
+        try:
+            related = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not (related.many_to_one or related.one_to_one) or not related.concrete:
+            return None
+        model = related.related_model
+    descriptor = inspect.getattr_static(model, attr, None)
+    if descriptor is None or inspect.isfunction(descriptor) or isinstance(descriptor, ReverseOneToOneDescriptor):
+        # Methods are called by DRF; reverse one-to-ones raise DoesNotExist
+        return None
+    if not path:
+        return attrgetter(attr)
+
+    getters = [attrgetter(name) for name in field.source_attrs]
+
+    def get(instance):
+        for getter in getters:
+            if instance is None:
+                # DRF stops at a null foreign key too
+                return None
+            instance = getter(instance)
+        return instance
+    return get
+
+
+def _fk_getter(field, model):
+    if model is None or len(field.source_attrs) != 1 or not field.use_pk_only_optimization() or field.pk_field is not None:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+        return None
+    return attrgetter(model_field.attname)
+
+
+def _generic(field):
+    """DRF's own per-field steps, for anything the fast accessors do not cover."""
+    def represent(instance):
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            return _SKIP
+        check = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if check is None else field.to_representation(attribute)
+    return represent
+
+
+def _accessor(field, model):
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(field.parent, field.method_name)
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        getter = _fk_getter(field, model)
+        return getter or _generic(field)
+    getter = _plain_getter(field, model)
+    if getter is None:
+        return _generic(field)
+    convert = _converter(field)
+    if convert is None:
+        return getter
+
+    def represent(instance):
+        value = getter(instance)
+        return None if value is None else convert(value)
+    return represent
+
+
+def compiled(serializer):
+    """``fn(instance) -> dict`` equal to ``serializer.to_representation(instance)``; cached on the serializer."""
+    plan = serializer.__dict__.get('_fast_plan')
+    if plan is not None:
+        return plan
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    steps = [(name, _accessor(field, model)) for name, field in serializer.fields.items() if not field.write_only]
+
+    def plan(instance):
+        ret = {}
+        for name, accessor in steps:
+            value = accessor(instance)
+            if value is not _SKIP:
+                ret[name] = value
+        return ret
+    serializer._fast_plan = plan
+    return plan
+
+
+class FastPathMixin:
+    """Serialize through a compiled accessor plan (see module docstring)."""
+
+    def to_representation(self, instance):
+        if not enabled():
+            return super().to_representation(instance)
+        return compiled(self)(instance)
@@ -0,0 +1,140 @@
+"""
+Sparse fieldsets (``?fields=``) and expansion (``?expand=``) for API serializers.
+
+``fields`` is a comma-separated list of top-level field names; a dotted
+name (``brand.name_ar``) trims a nested serializer the same way.
+``expand`` swaps a relation that is normally rendered as a primary key for
+its nested representation (``?expand=product`` on variants).
+
+Serializers declare which ORM path each field reads through in
+``related_paths``; ``shape_queryset`` turns the requested shape into the
+matching ``select_related``/``prefetch_related`` calls, so relations that
+are not rendered are not joined or prefetched either.
+"""
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_shape(fields=None, expand=None):
+    """
+    Turn ``'id,brand.name_ar'`` style strings into nested dicts.
+    Returns ``(fields, expand)``; ``fields`` is None when every field is wanted.
+    """
+    def nested(value):
+        tree = {}
+        for path in filter(None, (part.strip() for part in value.split(','))):
+            node = tree
+            for name in path.split('.'):
+                node = node.setdefault(name, {})
+        return tree
+
+    return (nested(fields) if fields is not None else None), nested(expand or '')
+
+
+def request_shape(request):
+    if request is None:
+        return None, {}
+    params = request.query_params
+    return parse_shape(params.get(FIELDS_PARAM), params.get(EXPAND_PARAM))
+
+
+def _sub_shape(shape, name):
+    fields, expand = shape
+    sub_fields = fields.get(name) if fields is not None else None
+    # 'brand' alone keeps every nested field, 'brand.slug' only that one
+    return (sub_fields or None), expand.get(name, {})
+
+
+def _sparse(field):
+    serializer = field.child if isinstance(field, serializers.ListSerializer) else field
+    return serializer if isinstance(serializer, SparseFieldsetMixin) else None
+
+
+class SparseFieldsetMixin:
+    # field name -> ORM lookup the field reads through
+    related_paths = {}
+    # field name -> callable returning the nested serializer used when expanded
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        self.shape = kwargs.pop('shape', None)
+        super().__init__(*args, **kwargs)
+
+    def get_shape(self):
+        if self.shape is None:
+            root = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+            # Only the outermost serializer reads the query string
+            self.shape = request_shape(self.context.get('request')) if root is None else (None, {})
+        return self.shape
+
+    def get_fields(self):
+        fields = super().get_fields()
+        shape = self.get_shape()
+        wanted, expand = shape
+        if wanted is not None:
+            for name in list(fields):
+                if name not in wanted:
+                    del fields[name]
+        for name in expand:
+            if name in self.expandable_fields and name in fields:
+                fields[name] = self.expandable_fields[name]()
+        for name, field in fields.items():
+            nested = _sparse(field)
+            if nested is not None and nested.shape is None:
+                nested.shape = _sub_shape(shape, name)
+        return fields
+
+    def nested_shape(self, name):
+        return _sub_shape(self.get_shape(), name)
+
+    @classmethod
+    def related_lookups(cls, shape, prefix=''):
+        wanted, expand = shape
+        lookups = []
+        for name, path in cls.related_paths.items():
+            if wanted is not None and name not in wanted:
+                continue
+            if name in cls.expandable_fields and name not in expand:
+                continue
+            lookups.append(prefix + path)
+            if name in cls.expandable_fields:
+                nested = _sparse(cls.expandable_fields[name]())
+            else:
+                nested = _sparse(cls._declared_fields[name]) if name in cls._declared_fields else None
+            if nested is not None:
+                lookups.extend(type(nested).related_lookups(_sub_shape(shape, name), f'{prefix}{path}__'))
+        return list(dict.fromkeys(lookups))
+
+
+def _kind(model, lookup):
+    """'select' or 'prefetch' for a lookup, None when it walks straight back to its parent."""
+    kind, previous = 'select', None
+    for name in lookup.split('__'):
+        field = model._meta.get_field(name)
+        if previous is not None and field.remote_field is previous:
+            # e.g. variants__product: prefetching variants already caches their product
+            return None
+        if field.many_to_many or field.one_to_many:
+            kind = 'prefetch'
+        model, previous = field.related_model, field
+    return kind
+
+
+def shape_queryset(queryset, serializer_class, request):
+    """Replace the queryset's joins and prefetches with those the requested shape renders."""
+    if not issubclass(serializer_class, SparseFieldsetMixin):
+        return queryset
+    kinds = {lookup: _kind(queryset.model, lookup) for lookup in serializer_class.related_lookups(request_shape(request))}
+    selects = [lookup for lookup, kind in kinds.items() if kind == 'select']
+    prefetches = [lookup for lookup, kind in kinds.items() if kind == 'prefetch']
+    queryset = queryset.select_related(None).prefetch_related(None)
+    # select_related() without arguments would follow every foreign key
+    return (queryset.select_related(*selects) if selects else queryset).prefetch_related(*prefetches)
+
+
+class SparseFieldsetViewMixin:
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return shape_queryset(queryset, self.get_serializer_class(), self.request)
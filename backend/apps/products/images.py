@@ -0,0 +1,274 @@
+"""
+Responsive image derivatives.
+
+Every registered image field gets fixed-width copies in WebP (AVIF too
+when Pillow has the codec) with a JPEG fallback, written next to a small
+manifest under ``derivatives/<original path without extension>/``.
+Generation happens off the request: saves schedule it on commit in a
+process pool, and ``generate_image_derivatives`` backfills existing
+media in parallel. Serializers read the manifest through ``SrcsetField``
+and expose ``{format: {width: url}}``, or None until it exists.
+
+``SrcsetField`` renders every image of every row, so it does not open the
+manifest file each time. ``cached_manifest`` keeps manifests in the cache
+for ``IMAGE_MANIFEST_CACHE_TIMEOUT`` seconds (default a day), and their
+absence for only ``IMAGE_MANIFEST_MISSING_TIMEOUT`` (default a minute), so
+a worker the clearing below does not reach shows new derivatives soon
+instead of a day later. Generation and removal clear the entry in the process
+that ran the job. The pool's jobs run in other processes, so the process
+that scheduled them clears it again, and so does the backfill command.
+"""
+import hashlib
+import io
+import json
+import logging
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+from rest_framework import serializers
+from .cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = [320, 640, 960, 1280]
+# app_label.Model -> image fields that get derivatives
+IMAGE_FIELDS = {
+    'products.Category': ['image'],
+    'products.Brand': ['logo'],
+    'products.Product': ['main_image'],
+    'products.ProductVariant': ['image'],
+    'products.ProductImage': ['image'],
+    'cms.HeroSlide': ['image', 'image_mobile'],
+}
+MANIFEST = 'manifest.json'
+MANIFEST_KEY = 'image-manifest:{digest}'
+# Cached briefly for images without derivatives too
+MISSING = 'missing'
+
+_pool = None
+
+
+def widths():
+    return getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', DEFAULT_WIDTHS)
+
+
+def formats():
+    # Preferred first; JPEG stays last as the universal fallback
+    available = [('avif', 'AVIF')] if features.check('avif') else []
+    if features.check('webp'):
+        available.append(('webp', 'WEBP'))
+    return available + [('jpeg', 'JPEG')]
+
+
+def derivative_dir(name):
+    return posixpath.join('derivatives', posixpath.splitext(name)[0])
+
+
+def derivative_name(name, width, extension):
+    return posixpath.join(derivative_dir(name), f'{width}.{extension}')
+
+
+def _encode(image, pil_format):
+    buffer = io.BytesIO()
+    if pil_format == 'JPEG':
+        if image.mode == 'RGBA':
+            # JPEG has no alpha; flatten onto white rather than black
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        image.save(buffer, 'JPEG', quality=82, optimize=True, progressive=True)
+    else:
+        image.save(buffer, pil_format, quality=75)
+    return buffer.getvalue()
+
+
+def is_current(name, storage=None):
+    storage = storage or default_storage
+    manifest_name = posixpath.join(derivative_dir(name), MANIFEST)
+    try:
+        return storage.exists(manifest_name) and storage.get_modified_time(manifest_name) >= storage.get_modified_time(name)
+    except (OSError, NotImplementedError):
+        return False
+
+
+def generate(name, force=False, storage=None):
+    """Write every preset for one stored image; returns the manifest, or None if the source is unusable."""
+    storage = storage or default_storage
+    manifest_name = posixpath.join(derivative_dir(name), MANIFEST)
+    if not force and is_current(name, storage):
+        return read_manifest(name, storage)
+
+    try:
+        with storage.open(name) as fh:
+            source = ImageOps.exif_transpose(Image.open(fh))
+            source.load()
+    except (OSError, ValueError) as exc:
+        logger.warning('Skipping derivatives for %s: %s', name, exc)
+        return None
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'A' in source.getbands() or 'transparency' in source.info else 'RGB')
+
+    manifest = {'source': name, 'formats': {}}
+    for width in widths():
+        # Never upscale; small originals are re-encoded at their own size
+        target = source if source.width <= width else source.resize(
+            (width, max(1, round(source.height * width / source.width))), Image.LANCZOS
+        )
+        for extension, pil_format in formats():
+            path = derivative_name(name, width, extension)
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(_encode(target, pil_format)))
+            manifest['formats'].setdefault(extension, {})[str(width)] = path
+
+    # The manifest goes last, so readers never see a half-written set
+    if storage.exists(manifest_name):
+        storage.delete(manifest_name)
+    storage.save(manifest_name, ContentFile(json.dumps(manifest).encode()))
+    forget([name])
+    return manifest
+
+
+def remove(name, storage=None):
+    storage = storage or default_storage
+    directory = derivative_dir(name)
+    try:
+        _, files = storage.listdir(directory)
+    except (OSError, NotImplementedError):
+        return False
+    for filename in files:
+        storage.delete(posixpath.join(directory, filename))
+    forget([name])
+    return bool(files)
+
+
+def refresh(name):
+    """Worker job: rebuild stale derivatives; True when anything was written."""
+    return not is_current(name) and generate(name, force=True) is not None
+
+
+def read_manifest(name, storage=None):
+    storage = storage or default_storage
+    try:
+        with storage.open(posixpath.join(derivative_dir(name), MANIFEST)) as fh:
+            return json.loads(fh.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _manifest_key(name):
+    # Storage names may hold characters some cache backends reject in keys
+    return MANIFEST_KEY.format(digest=hashlib.md5(name.encode()).hexdigest())
+
+
+def cached_manifest(name):
+    """``read_manifest`` through the cache."""
+    key = _manifest_key(name)
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest = read_manifest(name)
+        if not manifest:
+            manifest = MISSING
+            timeout = getattr(settings, 'IMAGE_MANIFEST_MISSING_TIMEOUT', 60)
+        else:
+            timeout = getattr(settings, 'IMAGE_MANIFEST_CACHE_TIMEOUT', 86400)
+        cache.set(key, manifest, timeout)
+    return None if manifest == MISSING else manifest
+
+
+def forget(names):
+    cache.delete_many([_manifest_key(name) for name in names])
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2))
+    return _pool
+
+
+def _changed():
+    # Cached responses were rendered with the previous srcsets
+    bump_generation()
+    bump_generation('cms')
+    bump_generation('product-detail')
+
+
+def _run(fn, name):
+    if not getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+        if fn(name):
+            _changed()
+        return
+
+    def report(future):
+        # Runs back in this process, so the bump reaches its cache
+        forget([name])
+        if future.exception() is not None:
+            logger.error('Image derivative job for %s failed: %s', name, future.exception())
+        elif future.result():
+            _changed()
+
+    _executor().submit(fn, name).add_done_callback(report)
+
+
+def schedule(name):
+    """Generate derivatives once the surrounding transaction commits."""
+    if name:
+        transaction.on_commit(lambda: _run(refresh, name))
+
+
+def schedule_removal(name):
+    if name:
+        transaction.on_commit(lambda: _run(remove, name))
+
+
+def stored_image_names():
+    from django.apps import apps
+
+    names = set()
+    for label, fields in IMAGE_FIELDS.items():
+        model = apps.get_model(label)
+        for field in fields:
+            names.update(model.objects.exclude(**{field: ''}).values_list(field, flat=True))
+    return sorted(name for name in names if name)
+
+
+def image_fields_changed(sender, instance, raw=False, **kwargs):
+    """post_save receiver for the models in IMAGE_FIELDS."""
+    if raw:
+        return
+    for field in IMAGE_FIELDS[sender._meta.label]:
+        schedule(getattr(instance, field).name)
+
+
+def image_fields_deleted(sender, instance, **kwargs):
+    for field in IMAGE_FIELDS[sender._meta.label]:
+        schedule_removal(getattr(instance, field).name)
+
+
+class SrcsetField(serializers.Field):
+    """Read-only ``{format: {width: url}}`` for an image field's derivatives."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        manifest = cached_manifest(value.name) if value else None
+        if not manifest:
+            return None
+        request = self.context.get('request')
+
+        def url(path):
+            url = default_storage.url(path)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return {
+            extension: {width: url(path) for width, path in presets.items()}
+            for extension, presets in manifest['formats'].items()
+        }
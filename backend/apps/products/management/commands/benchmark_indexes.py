@@ -0,0 +1,105 @@
+import json
+import random
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from cart.models import Cart, CartItem
+from crm.models import CustomerProfile
+from orders.models import Order
+from products.benchmarking import build_synthetic_catalogue, rolled_back, summarize, timed
+from products.models import ProductVariant
+from products.query_plans import designed_indexes, explain, full_scans, hot_queries, is_limited
+
+CITIES = ['طرابلس', 'بنغازي', 'مصراتة', 'الزاوية', 'سبها', 'البيضاء', 'زليتن', 'غريان']
+# The foreign-key indexes that variant_product_active_idx and cart_item_lookup_idx replaced
+FK_INDEXES = [('bench_variant_product_fk', 'products_productvariant', 'product_id'), ('bench_cartitem_cart_fk', 'cart_cartitem', 'cart_id')]
+
+
+def build_synthetic_sales(orders, customers, carts, seed=42, batch_size=2000):
+    rng = random.Random(seed)
+    now = timezone.now()
+    phones = [f'09{rng.randint(10000000, 99999999)}' for _ in range(customers)]
+    CustomerProfile.objects.bulk_create([
+        CustomerProfile(
+            name=f'عميل {i}', phone=phone, city=rng.choice(CITIES),
+            segment=rng.choice(['new', 'new', 'regular', 'vip', 'inactive']),
+        )
+        for i, phone in enumerate(phones)
+    ], batch_size=batch_size)
+    Order.objects.bulk_create([
+        Order(
+            order_number=f'BENCH-{seed}-{i}', customer_name=f'عميل {i}', customer_phone=rng.choice(phones),
+            city=rng.choice(CITIES), area='المركز', address='شارع 1',
+            subtotal=200, shipping_cost=10, total=rng.randint(50, 2000),
+            status=rng.choice([choice for choice, _ in Order.STATUS_CHOICES]),
+        )
+        for i in range(orders)
+    ], batch_size=batch_size)
+    # created_at is auto_now_add; spread it over a year afterwards
+    order_ids = list(Order.objects.filter(order_number__startswith=f'BENCH-{seed}-').values_list('id', flat=True))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {connection.ops.quote_name(Order._meta.db_table)} SET created_at = %s WHERE id = %s',
+            [(now - timedelta(minutes=rng.randint(0, 525600)), order_id) for order_id in order_ids],
+        )
+
+    variant_ids = list(ProductVariant.objects.values_list('id', flat=True))
+    cart_objs = Cart.objects.bulk_create([Cart(session_key=f'bench{seed}{i:027d}') for i in range(carts)], batch_size=batch_size)
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, variant_id=variant_id, quantity=1)
+        for cart in cart_objs for variant_id in rng.sample(variant_ids, 3)
+    ], batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = 'Times the hot queries (products.query_plans) with and without their indexes on a synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--customers', type=int, default=20000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+
+    def measure(self, repeat):
+        results = {}
+        for name, (queryset, table, index) in hot_queries().items():
+            _, durations = timed(lambda: list(queryset.all()), repeat=repeat)
+            plan = explain(queryset)
+            results[name] = {**summarize(durations), 'full_scan': bool(full_scans(plan, limited=is_limited(queryset))), 'plan': plan}
+        return results
+
+    def handle(self, *args, **options):
+        quote = connection.ops.quote_name
+        report = {key: options[key] for key in ('products', 'orders', 'customers', 'carts')}
+
+        with rolled_back():
+            self.stdout.write(f"Building {options['products']} products, {options['orders']} orders, {options['customers']} customers...")
+            build_synthetic_catalogue(options['products'])
+            build_synthetic_sales(options['orders'], options['customers'], options['carts'])
+            after = self.measure(options['repeat'])
+
+            # DDL is transactional on SQLite and PostgreSQL, so the rollback restores the indexes
+            with connection.cursor() as cursor:
+                for model, index in designed_indexes():
+                    cursor.execute(f'DROP INDEX {quote(index.name)}')
+                for name, table, column in FK_INDEXES:
+                    cursor.execute(f'CREATE INDEX {quote(name)} ON {quote(table)} ({quote(column)})')
+            before = self.measure(options['repeat'])
+
+        report['queries'] = [
+            {'query': name, 'before': before[name], 'after': after[name], 'speedup': round(before[name]['median_ms'] / max(after[name]['median_ms'], 0.001), 1)}
+            for name in after
+        ]
+        self.stdout.write(f"{'query':<22}{'before ms':>11}{'after ms':>10}{'speedup':>9}  full scan before/after")
+        for row in report['queries']:
+            self.stdout.write(
+                f"{row['query']:<22}{row['before']['median_ms']:>11}{row['after']['median_ms']:>10}{row['speedup']:>8}x"
+                f"  {'yes' if row['before']['full_scan'] else 'no'}/{'yes' if row['after']['full_scan'] else 'no'}"
+            )
+        if options['json_path']:
+            report['generated_at'] = timezone.now().isoformat()
+            with open(options['json_path'], 'w') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
@@ -0,0 +1,28 @@
+import json
+from django.core.management.base import BaseCommand
+from products import similarity
+from products.benchmarking import build_synthetic_catalogue, rolled_back
+
+
+class Command(BaseCommand):
+    help = 'Times a full related-products rebuild on synthetic catalogues of the given sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        report = []
+        for size in options['sizes']:
+            with rolled_back():
+                self.stdout.write(f"Building {size} synthetic products...")
+                build_synthetic_catalogue(size, seed=size)
+                stats = similarity.rebuild()
+            report.append(stats)
+            self.stdout.write(
+                f"{stats['products']:>8} products: load {stats['load']:.2f}s, score {stats['score']:.2f}s, "
+                f"write {stats['write']:.2f}s ({stats['links']} links)"
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump(report, fh, indent=2)
@@ -0,0 +1,56 @@
+import json
+from django.core.management.base import BaseCommand
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from products.benchmarking import build_synthetic_catalogue, rolled_back, summarize, timed
+from products.models import Product
+from products.search import ProductSearchFilter, rebuild_index
+
+QUERIES = ['عود', 'أسطورة', 'اسطوره', 'العود الملكي', 'مسك ابيض', 'زعفران', 'ليلى', 'إمارات', 'كهرمان', 'نجمه']
+
+
+class LegacySearchView:
+    search_fields = ['name_ar', 'description']
+
+
+class Command(BaseCommand):
+    help = 'Compares the Arabic search index against the legacy SearchFilter on a synthetic catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        report = {'products': options['products'], 'queries': []}
+
+        with rolled_back():
+            self.stdout.write(f"Building {options['products']} synthetic products...")
+            build_synthetic_catalogue(options['products'])
+            _, build_ms = timed(rebuild_index, repeat=1)
+            report['index_build_ms'] = round(build_ms[0], 1)
+
+            base = Product.objects.filter(is_active=True)
+            for query in QUERIES:
+                request = Request(factory.get('/', {'search': query}))
+                row = {'query': query}
+                for label, backend in (('legacy', filters.SearchFilter()), ('index', ProductSearchFilter())):
+                    def run():
+                        qs = backend.filter_queryset(request, base, LegacySearchView())
+                        return qs.count(), list(qs.values_list('id', flat=True)[:12])
+                    (hits, _), durations = timed(run, repeat=options['repeat'])
+                    row[label] = {'hits': hits, **summarize(durations)}
+                report['queries'].append(row)
+
+        self.stdout.write(f"Index build: {report['index_build_ms']} ms")
+        self.stdout.write(f"{'query':<16}{'legacy hits':>12}{'legacy ms':>11}{'index hits':>12}{'index ms':>10}")
+        for row in report['queries']:
+            self.stdout.write(
+                f"{row['query']:<16}{row['legacy']['hits']:>12}{row['legacy']['median_ms']:>11}"
+                f"{row['index']['hits']:>12}{row['index']['median_ms']:>10}"
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
@@ -0,0 +1,99 @@
+import json
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from cart.models import Cart, CartItem
+from cart.serializers import CartSerializer
+from orders.models import Order, OrderItem, OrderStatusHistory
+from orders.serializers import OrderSerializer
+from products.benchmarking import build_synthetic_catalogue, rolled_back, summarize, timed
+from products.models import Product, ProductVariant
+from products.serializers import ProductListSerializer
+
+
+def build_orders(variants, count):
+    orders = Order.objects.bulk_create([
+        Order(
+            order_number=f'BENCH-{i}', customer_name='عميل تجريبي', customer_phone='0910000000',
+            city='طرابلس', area='المركز', address='شارع 1', subtotal=200, shipping_cost=10, total=210,
+        )
+        for i in range(count)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order, variant=variant, product_name=variant.product.name_ar, variant_size=variant.size_ml,
+            quantity=1, unit_price=variant.price, total_price=variant.price,
+        )
+        for i, order in enumerate(orders) for variant in variants[2 * i % len(variants):][:2]
+    ])
+    OrderStatusHistory.objects.bulk_create([OrderStatusHistory(order=order, status='pending') for order in orders])
+
+
+class Command(BaseCommand):
+    help = 'Compares the fast-path serializers with plain DRF on product list, cart and order pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='12,100,1000', help='Comma-separated items per page')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        request = Request(APIRequestFactory().get('/'))
+        report = {'sizes': sizes, 'rows': []}
+
+        with rolled_back():
+            self.stdout.write(f"Building {max(sizes)} synthetic products...")
+            build_synthetic_catalogue(max(sizes))
+            variants = list(ProductVariant.objects.select_related('product').order_by('id')[:max(sizes)])
+            build_orders(variants, max(sizes))
+            for size in sizes:
+                cart = Cart.objects.create(session_key=f'benchmark-{size}')
+                CartItem.objects.bulk_create([CartItem(cart=cart, variant=variant, quantity=2) for variant in variants[:size]])
+
+            for size in sizes:
+                # Rows are loaded once up front; only serialization and rendering are timed
+                targets = {
+                    'product_list': (ProductListSerializer, True, list(
+                        Product.objects.select_related('brand').prefetch_related('categories').order_by('id')[:size]
+                    )),
+                    'cart': (CartSerializer, False, Cart.objects.prefetch_related('items__variant__product').get(session_key=f'benchmark-{size}')),
+                    'order_list': (OrderSerializer, True, list(
+                        Order.objects.prefetch_related('items', 'status_history').order_by('id')[:size]
+                    )),
+                }
+                for target, (serializer_class, many, data) in targets.items():
+                    row = {'target': target, 'size': size}
+                    payloads = {}
+                    for path, fast in (('drf', False), ('fast', True)):
+                        def run():
+                            serializer = serializer_class(data, many=many, context={'request': request})
+                            return JSONRenderer().render(serializer.data)
+
+                        with override_settings(FAST_SERIALIZERS=fast):
+                            payloads[path], durations = timed(run, repeat=options['repeat'])
+                            tracemalloc.start()
+                            run()
+                            _, peak = tracemalloc.get_traced_memory()
+                            tracemalloc.stop()
+                        stats = summarize(durations)
+                        row[path] = {**stats, 'ops_per_sec': round(1000 / stats['median_ms'], 1), 'peak_kib': round(peak / 1024, 1)}
+                    if payloads['drf'] != payloads['fast']:
+                        raise CommandError(f'{target} at {size} items: fast path output differs from DRF')
+                    row['speedup'] = round(row['fast']['ops_per_sec'] / row['drf']['ops_per_sec'], 2)
+                    report['rows'].append(row)
+
+        self.stdout.write(f"{'target':<14}{'items':>6}{'drf ops/s':>11}{'fast ops/s':>12}{'speedup':>9}{'drf KiB':>10}{'fast KiB':>10}")
+        for row in report['rows']:
+            self.stdout.write(
+                f"{row['target']:<14}{row['size']:>6}{row['drf']['ops_per_sec']:>11}{row['fast']['ops_per_sec']:>12}"
+                f"{row['speedup']:>8}x{row['drf']['peak_kib']:>10}{row['fast']['peak_kib']:>10}"
+            )
+        if options['json_path']:
+            report['generated_at'] = timezone.now().isoformat()
+            with open(options['json_path'], 'w') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
@@ -0,0 +1,86 @@
+import gc
+import json
+import random
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from products.benchmarking import NAME_WORDS, NOTE_WORDS
+from products.suggest import KINDS, Entry, Suggester, index_keys
+
+LETTERS = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+
+
+def synthetic_entries(count, seed=42):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        # Catalogue words plus a made-up one, so most names are distinct
+        word = ''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 7)))
+        words = rng.sample(NAME_WORDS + NOTE_WORDS, rng.randint(1, 3)) + [word]
+        rng.shuffle(words)
+        kind = KINDS[0] if rng.random() < 0.9 else rng.choice(KINDS[1:])
+        weight = rng.randint(0, 500) * 10 + rng.randint(0, 5000)
+        entries.append(Entry(kind, i, ' '.join(words), f'synthetic-{i}', None, weight))
+    return entries
+
+
+class Command(BaseCommand):
+    help = 'Builds the typeahead index (products.suggest) over synthetic names and reports memory and lookup latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=5000)
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        started = time.perf_counter()
+        Suggester(synthetic_entries(options['entries']))
+        build_s = time.perf_counter() - started
+
+        # Traced separately; tracing slows the build down. Entries count: the index keeps them.
+        gc.collect()
+        tracemalloc.start()
+        suggester = Suggester(synthetic_entries(options['entries']))
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        queries = []
+        for _ in range(options['queries']):
+            key = rng.choice(index_keys(rng.choice(suggester.entries).label))
+            queries.append(key[:rng.randint(1, min(len(key), 8))])
+        durations = []
+        for query in queries:
+            started = time.perf_counter()
+            suggester.search(query, 8)
+            durations.append((time.perf_counter() - started) * 1e6)
+        durations.sort()
+
+        def percentile(p):
+            return round(durations[min(len(durations) - 1, int(p * len(durations)))], 1)
+
+        report = {
+            'entries': options['entries'],
+            'keys': len(suggester.keys),
+            'heavy_prefixes': len(suggester.top),
+            'build_s': round(build_s, 2),
+            'memory_mib': round(current / 2 ** 20, 1),
+            'peak_build_mib': round(peak / 2 ** 20, 1),
+            'bytes_per_entry': round(current / max(options['entries'], 1)),
+            'lookup_us': {'median': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99), 'max': round(durations[-1], 1)},
+        }
+        self.stdout.write(
+            f"{report['entries']} entries, {report['keys']} keys, {report['heavy_prefixes']} precomputed prefixes, "
+            f"generated and built in {report['build_s']}s"
+        )
+        self.stdout.write(f"memory {report['memory_mib']} MiB ({report['bytes_per_entry']} B/entry), peak while building {report['peak_build_mib']} MiB")
+        self.stdout.write(
+            f"lookup median {report['lookup_us']['median']}us, p95 {report['lookup_us']['p95']}us, "
+            f"p99 {report['lookup_us']['p99']}us, max {report['lookup_us']['max']}us"
+        )
+        if options['json_path']:
+            report['generated_at'] = timezone.now().isoformat()
+            with open(options['json_path'], 'w') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
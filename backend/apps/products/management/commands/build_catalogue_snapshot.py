@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from products import snapshot
+
+
+class Command(BaseCommand):
+    help = 'Writes the precompressed static catalogue snapshot and points /api/products/snapshot/ at it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--if-due', action='store_true',
+            help='Only rebuild an existing snapshot whose debounce period has passed, for cron without the background thread',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        manifest = snapshot.rebuild_if_due() if options['if_due'] else snapshot.build()
+        if manifest is None:
+            self.stdout.write('Snapshot is current or not due yet')
+            return
+        elapsed = time.monotonic() - started
+        sizes = ', '.join(f'{encoding} {size / 1024:.1f} KiB' for encoding, size in manifest['sizes'].items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {manifest['version']}: {manifest['products']} products ({sizes}) in {elapsed:.2f}s"
+        ))
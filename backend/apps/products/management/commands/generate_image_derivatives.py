@@ -0,0 +1,33 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from django.core.management.base import BaseCommand
+from products.cache import bump_generation
+from products.images import forget, generate, stored_image_names
+
+
+class Command(BaseCommand):
+    help = 'Builds responsive WebP/AVIF/JPEG derivatives for every stored product, brand, category and slide image'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+        parser.add_argument('--force', action='store_true', help='Rebuild even when the derivatives are up to date')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        names = stored_image_names()
+        built = skipped = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for name, manifest in zip(names, pool.map(partial(generate, force=options['force']), names, chunksize=4)):
+                if manifest is None:
+                    skipped += 1
+                    self.stderr.write(f"Could not read {name}")
+                else:
+                    built += 1
+        # Cached manifests and responses still carry the old (empty) srcsets
+        forget(names)
+        bump_generation()
+        bump_generation('cms')
+        bump_generation('product-detail')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Processed {built} images ({skipped} unreadable) in {elapsed:.2f}s"))
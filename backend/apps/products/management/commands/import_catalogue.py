@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from products.catalogue_io import CatalogueFileError, FORMATS, detect_format, import_catalogue
+
+
+class Command(BaseCommand):
+    help = 'Bulk-imports products, variants (by SKU), notes, categories and fragrance families from CSV, XLSX or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and load, then roll back')
+        parser.add_argument('--skip-invalid', action='store_true', help='Import the valid rows even if some rows fail')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as fh:
+                summary = import_catalogue(
+                    fh, options['format'] or detect_format(options['path']),
+                    dry_run=options['dry_run'], skip_invalid=options['skip_invalid'], chunk_size=options['chunk_size'],
+                )
+        except (OSError, CatalogueFileError) as exc:
+            raise CommandError(exc)
+
+        for error in summary['errors']:
+            details = '; '.join(f'{column}: {message}' for column, message in error['errors'].items())
+            self.stderr.write(f"Row {error['row']}: {details}")
+        counts = ', '.join(f'{key}={value}' for key, value in summary.items() if key not in ('committed', 'errors'))
+        elapsed = time.monotonic() - started
+        if summary['errors'] and not summary['committed']:
+            raise CommandError(f"{len(summary['errors'])} invalid rows, nothing imported ({counts})")
+        label = 'Dry run' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f"{label}: {counts} in {elapsed:.2f}s"))
@@ -0,0 +1,37 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+from products import query_budget
+
+
+class Command(BaseCommand):
+    help = 'Records query counts and durations of every router GET endpoint at two seeded sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(str(size) for size in query_budget.SIZES), help='Comma-separated seed sizes')
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+        parser.add_argument('--fail', action='store_true', help='Exit non-zero when a query count grows with the size')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        # The test client only reaches hosts Django accepts
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            report = query_budget.run(sizes)
+        growing = query_budget.growing(report)
+
+        self.stdout.write(f"{'endpoint':<40}" + ''.join(f"{f'q@{size}':>7}{f'ms@{size}':>9}" for size in sizes) + '  status')
+        for name, entry in sorted(report.items()):
+            line = f"{name:<40}"
+            for size in sizes:
+                result = entry['sizes'].get(size, {})
+                line += f"{result.get('queries', '-'):>7}{result.get('ms', '-'):>9}"
+            statuses = sorted({result['status'] for result in entry['sizes'].values()})
+            line += f"  {','.join(map(str, statuses))}{'  GROWS' if name in growing else ''}"
+            self.stdout.write(line)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump({'generated_at': timezone.now().isoformat(), 'sizes': sizes, 'growing': growing, 'endpoints': report}, fh, ensure_ascii=False, indent=2)
+        if growing and options['fail']:
+            raise CommandError(f"Query count grows with result size: {', '.join(growing)}")
@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from products.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the Arabic product search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        indexed = rebuild_index(chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products in {elapsed:.2f}s"))
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from products.cache import bump_generation
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Backfills the denormalized price/stock columns on Product from active variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        updated = Product.objects.refresh_price_summary(batch_size=options['batch_size'])
+        # bulk_update sends no signals
+        bump_generation()
+        bump_generation('product-detail')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} products in {elapsed:.2f}s"))
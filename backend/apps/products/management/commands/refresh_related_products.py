@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from products import similarity
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the precomputed related-products table (incremental by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every product instead of only changed ones')
+        parser.add_argument('--top-k', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['full']:
+            stats = similarity.rebuild(k=options['top_k'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {stats['products']} products ({stats['links']} links): "
+                f"load {stats['load']:.2f}s, score {stats['score']:.2f}s, write {stats['write']:.2f}s"
+            ))
+            return
+
+        started = time.monotonic()
+        refreshed = similarity.refresh(k=options['top_k'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Refreshed related products for {refreshed} products in {elapsed:.2f}s"))
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:33
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Max, Min, Q, When
+
+
+def fill_price_summary(apps, schema_editor):
+    # Same grouped aggregate as ProductManager.refresh_price_summary
+    Product = apps.get_model("products", "Product")
+    ProductVariant = apps.get_model("products", "ProductVariant")
+    current_price = Case(
+        When(sale_price__gt=0, then=F("sale_price")), default=F("price")
+    )
+    rows = (
+        ProductVariant.objects.filter(is_active=True)
+        .values("product_id")
+        .annotate(
+            min_price=Min(current_price),
+            max_price=Max(current_price),
+            discounted=Count("id", filter=Q(sale_price__gt=0)),
+            stocked=Count("id", filter=Q(stock_quantity__gt=0)),
+        )
+        .order_by()
+    )
+    products = [
+        Product(
+            id=row["product_id"],
+            min_price=row["min_price"],
+            max_price=row["max_price"],
+            has_discount=bool(row["discounted"]),
+            in_stock=bool(row["stocked"]),
+        )
+        for row in rows
+    ]
+    Product.objects.bulk_update(
+        products,
+        ["min_price", "max_price", "has_discount", "in_stock"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_product_occasion_product_vibe"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="has_discount",
+            field=models.BooleanField(
+                default=False, editable=False, verbose_name="عليه خصم"
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="in_stock",
+            field=models.BooleanField(
+                db_index=True, default=False, editable=False, verbose_name="متوفر"
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="max_price",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                editable=False,
+                max_digits=10,
+                null=True,
+                verbose_name="أعلى سعر",
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="min_price",
+            field=models.DecimalField(
+                blank=True,
+                db_index=True,
+                decimal_places=2,
+                editable=False,
+                max_digits=10,
+                null=True,
+                verbose_name="أقل سعر",
+            ),
+        ),
+        migrations.RunPython(fill_price_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from products.search import to_document_text
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE products_search_fts USING fts5(
+        name, brand, notes, families, attributes,
+        content='products_productsearchdocument', content_rowid='product_id'
+    )
+    """,
+    """
+    CREATE TRIGGER products_search_fts_ai AFTER INSERT ON products_productsearchdocument BEGIN
+        INSERT INTO products_search_fts(rowid, name, brand, notes, families, attributes)
+        VALUES (new.product_id, new.name, new.brand, new.notes, new.families, new.attributes);
+    END
+    """,
+    """
+    CREATE TRIGGER products_search_fts_ad AFTER DELETE ON products_productsearchdocument BEGIN
+        INSERT INTO products_search_fts(products_search_fts, rowid, name, brand, notes, families, attributes)
+        VALUES ('delete', old.product_id, old.name, old.brand, old.notes, old.families, old.attributes);
+    END
+    """,
+    """
+    CREATE TRIGGER products_search_fts_au AFTER UPDATE ON products_productsearchdocument BEGIN
+        INSERT INTO products_search_fts(products_search_fts, rowid, name, brand, notes, families, attributes)
+        VALUES ('delete', old.product_id, old.name, old.brand, old.notes, old.families, old.attributes);
+        INSERT INTO products_search_fts(rowid, name, brand, notes, families, attributes)
+        VALUES (new.product_id, new.name, new.brand, new.notes, new.families, new.attributes);
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS products_search_fts_au",
+    "DROP TRIGGER IF EXISTS products_search_fts_ad",
+    "DROP TRIGGER IF EXISTS products_search_fts_ai",
+    "DROP TABLE IF EXISTS products_search_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE products_productsearchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', name), 'A') ||
+        setweight(to_tsvector('simple', brand), 'B') ||
+        setweight(to_tsvector('simple', notes), 'C') ||
+        setweight(to_tsvector('simple', families), 'C') ||
+        setweight(to_tsvector('simple', attributes), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX products_search_vector_gin ON products_productsearchdocument USING gin (search_vector)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS products_search_vector_gin",
+    "ALTER TABLE products_productsearchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+def fill_search_documents(apps, schema_editor):
+    # Same fields as products.search.build_documents; the triggers above copy
+    # each row into the FTS table as it is inserted.
+    Product = apps.get_model("products", "Product")
+    ProductNote = apps.get_model("products", "ProductNote")
+    ProductSearchDocument = apps.get_model("products", "ProductSearchDocument")
+    notes = defaultdict(list)
+    for product_id, name in ProductNote.objects.values_list("product_id", "name_ar"):
+        notes[product_id].append(name)
+    families = defaultdict(list)
+    through = Product.fragrance_families.through
+    for product_id, name in through.objects.values_list(
+        "product_id", "fragrancefamily__name_ar"
+    ):
+        families[product_id].append(name)
+    rows = Product.objects.values_list(
+        "id", "name_ar", "brand__name_ar", "occasion", "vibe"
+    )
+    ProductSearchDocument.objects.bulk_create(
+        [
+            ProductSearchDocument(
+                product_id=product_id,
+                name=to_document_text(name),
+                brand=to_document_text(brand),
+                notes=to_document_text(*notes[product_id]),
+                families=to_document_text(*families[product_id]),
+                attributes=to_document_text(occasion, vibe),
+            )
+            for product_id, name, brand, occasion, vibe in rows.iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0008_product_price_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSearchDocument",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="products.product",
+                    ),
+                ),
+                ("name", models.TextField(blank=True)),
+                ("brand", models.TextField(blank=True)),
+                ("notes", models.TextField(blank=True)),
+                ("families", models.TextField(blank=True)),
+                ("attributes", models.TextField(blank=True)),
+            ],
+            options={
+                "verbose_name": "فهرس البحث",
+                "verbose_name_plural": "فهرس البحث",
+            },
+        ),
+        migrations.RunPython(
+            run_vendor_sql({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            run_vendor_sql({"sqlite": SQLITE_REVERSE, "postgresql": POSTGRES_REVERSE}),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
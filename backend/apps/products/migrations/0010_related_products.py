@@ -0,0 +1,68 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_product_search_document"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="related_dirty",
+            field=models.BooleanField(
+                db_index=True,
+                default=True,
+                editable=False,
+                verbose_name="بحاجة لتحديث المنتجات المشابهة",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RelatedProduct",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="درجة التشابه")),
+                ("rank", models.PositiveSmallIntegerField(verbose_name="الترتيب")),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="related_links",
+                        to="products.product",
+                    ),
+                ),
+                (
+                    "related",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommended_in",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "منتج مشابه",
+                "verbose_name_plural": "منتجات مشابهة",
+                "ordering": ["product", "rank"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "rank"],
+                        name="products_re_product_5f5c5b_idx",
+                    )
+                ],
+                "unique_together": {("product", "related")},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0010_related_products"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["created_at", "id"], name="products_pr_created_3be21c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["sales_count", "id"], name="products_pr_sales_c_290103_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["min_price", "id"], name="products_pr_min_pri_f29498_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0011_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="productvariant",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
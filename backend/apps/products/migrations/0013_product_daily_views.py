@@ -0,0 +1,62 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0012_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductDailyViews",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="التاريخ")),
+                (
+                    "views",
+                    models.PositiveIntegerField(default=0, verbose_name="المشاهدات"),
+                ),
+            ],
+            options={
+                "verbose_name": "مشاهدات يومية",
+                "verbose_name_plural": "المشاهدات اليومية",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["view_count", "id"], name="products_pr_view_co_20258a_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productdailyviews",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="daily_views",
+                to="products.product",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productdailyviews",
+            index=models.Index(
+                fields=["date", "views"], name="products_pr_date_929fb1_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="productdailyviews",
+            unique_together={("product", "date")},
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0013_product_daily_views"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productvariant",
+            name="product",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="variants",
+                to="products.product",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["created_at", "id"],
+                name="product_active_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["gender", "created_at"],
+                name="product_active_gender_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productvariant",
+            index=models.Index(
+                fields=["product", "is_active"], name="variant_product_active_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productvariant",
+            index=models.Index(fields=["stock_quantity"], name="variant_stock_idx"),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 4.2.27 on 2026-10-18 08:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.text import slugify
+from products.search import tokenize
+
+
+def populate_scent_notes(apps, schema_editor):
+    # Same folding as products.notes.note_key
+    ScentNote = apps.get_model("products", "ScentNote")
+    ScentNoteAlias = apps.get_model("products", "ScentNoteAlias")
+    ProductNote = apps.get_model("products", "ProductNote")
+    terms = {}
+    for note in ProductNote.objects.order_by("id"):
+        key = " ".join(tokenize(note.name_ar))[:100]
+        if not key:
+            continue
+        if key not in terms:
+            base_slug = slugify(key, allow_unicode=True)[:90] or "note"
+            slug, counter = base_slug, 1
+            while ScentNote.objects.filter(slug=slug).exists():
+                counter += 1
+                slug = f"{base_slug}-{counter}"
+            term = ScentNote.objects.create(
+                name_ar=note.name_ar.strip(), slug=slug, icon=note.icon
+            )
+            ScentNoteAlias.objects.create(note=term, key=key)
+            terms[key] = term.id
+        note.term_id = terms[key]
+        note.save(update_fields=["term"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0014_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScentNote",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name_ar",
+                    models.CharField(max_length=100, verbose_name="الاسم بالعربية"),
+                ),
+                (
+                    "slug",
+                    models.SlugField(allow_unicode=True, max_length=100, unique=True),
+                ),
+                (
+                    "icon",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="الأيقونة"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "مكون عطري",
+                "verbose_name_plural": "المكونات العطرية",
+                "ordering": ["name_ar"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ScentNoteAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=100, unique=True)),
+                (
+                    "note",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="aliases",
+                        to="products.scentnote",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="productnote",
+            name="term",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="product_notes",
+                to="products.scentnote",
+                verbose_name="المكون",
+            ),
+        ),
+        migrations.RunPython(populate_scent_notes, migrations.RunPython.noop),
+    ]
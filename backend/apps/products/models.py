@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models import Case, Count, F, Max, Min, Q, When
 from django.utils.text import slugify
+from .bulk import update_rows
 
 class Category(models.Model):
     name_ar = models.CharField(max_length=100, verbose_name="الاسم بالعربية")
@@ -49,6 +51,53 @@ class FragranceFamily(models.Model):
     def __str__(self):
         return self.name_ar
 
+class ProductManager(models.Manager):
+    def refresh_price_summary(self, product_ids=None, batch_size=500):
+        """Recompute the denormalized price/stock columns from active variants.
+
+        Pass ``product_ids`` to refresh only those products; ``None`` refreshes
+        the whole catalogue. Runs one grouped query plus batched UPDATEs.
+        """
+        variants = ProductVariant.objects.filter(is_active=True)
+        if product_ids is not None:
+            product_ids = set(product_ids)
+            if not product_ids:
+                return 0
+            variants = variants.filter(product_id__in=product_ids)
+
+        # Same rule as ProductVariant.current_price: a sale price of 0 is no sale
+        current_price = Case(When(sale_price__gt=0, then=F('sale_price')), default=F('price'))
+        summary = {
+            row['product_id']: row
+            for row in variants.values('product_id').annotate(
+                min_price=Min(current_price),
+                max_price=Max(current_price),
+                discounted=Count('id', filter=Q(sale_price__gt=0)),
+                stocked=Count('id', filter=Q(stock_quantity__gt=0)),
+            ).order_by()
+        }
+
+        if product_ids is None:
+            product_ids = self.values_list('id', flat=True).iterator(chunk_size=batch_size)
+
+        updated = 0
+        batch = []
+        for product_id in product_ids:
+            row = summary.get(product_id)
+            batch.append(self.model(
+                id=product_id,
+                min_price=row['min_price'] if row else None,
+                max_price=row['max_price'] if row else None,
+                has_discount=bool(row and row['discounted']),
+                in_stock=bool(row and row['stocked']),
+            ))
+            if len(batch) >= batch_size:
+                updated += update_rows(batch, self.model.PRICE_SUMMARY_FIELDS)
+                batch = []
+        if batch:
+            updated += update_rows(batch, self.model.PRICE_SUMMARY_FIELDS)
+        return updated
+
 class Product(models.Model):
     GENDER_CHOICES = [('men', 'رجالي'), ('women', 'نسائي'), ('unisex', 'للجنسين')]
     CONCENTRATION = [
@@ -79,20 +128,42 @@ class Product(models.Model):
     
     view_count = models.PositiveIntegerField(default=0, verbose_name="عدد المشاهدات")
     sales_count = models.PositiveIntegerField(default=0, verbose_name="عدد المبيعات")
+
+    # ملخص الأسعار والمخزون (يُحدّث تلقائياً من العبوات النشطة)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, db_index=True, editable=False, verbose_name="أقل سعر")
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False, verbose_name="أعلى سعر")
+    has_discount = models.BooleanField(default=False, editable=False, verbose_name="عليه خصم")
+    in_stock = models.BooleanField(default=False, db_index=True, editable=False, verbose_name="متوفر")
+    related_dirty = models.BooleanField(default=True, db_index=True, editable=False, verbose_name="بحاجة لتحديث المنتجات المشابهة")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    PRICE_SUMMARY_FIELDS = ['min_price', 'max_price', 'has_discount', 'in_stock']
+
+    objects = ProductManager()
+
     class Meta:
         verbose_name = "المنتج"
         verbose_name_plural = "المنتجات"
         ordering = ['-created_at']
+        # Keyset pagination seeks on (sort field, id)
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['sales_count', 'id']),
+            models.Index(fields=['min_price', 'id']),
+            models.Index(fields=['view_count', 'id']),
+            # Storefront grids only ever read active products
+            models.Index(fields=['created_at', 'id'], name='product_active_created_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['gender', 'created_at'], name='product_active_gender_idx', condition=models.Q(is_active=True)),
+        ]
 
     def __str__(self):
         return self.name_ar
 
 class ProductVariant(models.Model):
-    product = models.ForeignKey(Product, related_name='variants', on_delete=models.CASCADE)
+    # Indexed by variant_product_active_idx below
+    product = models.ForeignKey(Product, related_name='variants', on_delete=models.CASCADE, db_index=False)
     name = models.CharField(max_length=100, blank=True, verbose_name="اسم العبوة")
     size_ml = models.PositiveIntegerField(verbose_name="الحجم (مل)", null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="السعر الأصلي")
@@ -107,10 +178,16 @@ class ProductVariant(models.Model):
     image = models.ImageField(upload_to='variants/', blank=True, verbose_name="صورة خاصة للعبوة")
     
     is_active = models.BooleanField(default=True, verbose_name="نشط")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "عبوة المنتج"
         verbose_name_plural = "عبوات المنتجات"
+        indexes = [
+            models.Index(fields=['product', 'is_active'], name='variant_product_active_idx'),
+            # Low-stock report
+            models.Index(fields=['stock_quantity'], name='variant_stock_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Ensure sale_price is None if 0
@@ -135,12 +212,36 @@ class ProductVariant(models.Model):
             return int(discount)
         return 0
 
+class ScentNote(models.Model):
+    """Canonical note vocabulary; spellings map to it through ScentNoteAlias (products.notes)."""
+    name_ar = models.CharField(max_length=100, verbose_name="الاسم بالعربية")
+    slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+    icon = models.CharField(max_length=50, blank=True, verbose_name="الأيقونة")
+
+    class Meta:
+        verbose_name = "مكون عطري"
+        verbose_name_plural = "المكونات العطرية"
+        ordering = ['name_ar']
+
+    def __str__(self):
+        return self.name_ar
+
+class ScentNoteAlias(models.Model):
+    note = models.ForeignKey(ScentNote, related_name='aliases', on_delete=models.CASCADE)
+    # Normalized spelling (products.notes.note_key)
+    key = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.key
+
 class ProductNote(models.Model):
     NOTE_TYPES = [('top', 'افتتاحية'), ('heart', 'قلب'), ('base', 'قاعدية')]
     product = models.ForeignKey(Product, related_name='notes', on_delete=models.CASCADE)
     note_type = models.CharField(max_length=10, choices=NOTE_TYPES, verbose_name="نوع النوتة")
     name_ar = models.CharField(max_length=100, verbose_name="اسم المكون بالعربية")
     icon = models.CharField(max_length=50, blank=True, verbose_name="الأيقونة")
+    # Set from name_ar on save (products.signals)
+    term = models.ForeignKey(ScentNote, related_name='product_notes', null=True, blank=True, on_delete=models.SET_NULL, verbose_name="المكون")
 
     class Meta:
         verbose_name = "نوتة العطر"
@@ -151,8 +252,48 @@ class ProductImage(models.Model):
     image = models.ImageField(upload_to='products/gallery/', verbose_name="الصورة")
     alt_text = models.CharField(max_length=200, blank=True, verbose_name="نص بديل")
     order = models.PositiveIntegerField(default=0, verbose_name="الترتيب")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "صورة إضافية"
         verbose_name_plural = "صور إضافية"
         ordering = ['order']
+
+class ProductSearchDocument(models.Model):
+    """Normalized search text per product (see products.search)."""
+    product = models.OneToOneField(Product, primary_key=True, related_name='search_document', on_delete=models.CASCADE)
+    name = models.TextField(blank=True)
+    brand = models.TextField(blank=True)
+    notes = models.TextField(blank=True)
+    families = models.TextField(blank=True)
+    attributes = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "فهرس البحث"
+        verbose_name_plural = "فهرس البحث"
+
+class RelatedProduct(models.Model):
+    """Precomputed nearest neighbours per product (see products.similarity)."""
+    product = models.ForeignKey(Product, related_name='related_links', on_delete=models.CASCADE)
+    related = models.ForeignKey(Product, related_name='recommended_in', on_delete=models.CASCADE)
+    score = models.FloatField(verbose_name="درجة التشابه")
+    rank = models.PositiveSmallIntegerField(verbose_name="الترتيب")
+
+    class Meta:
+        verbose_name = "منتج مشابه"
+        verbose_name_plural = "منتجات مشابهة"
+        ordering = ['product', 'rank']
+        unique_together = ('product', 'related')
+        indexes = [models.Index(fields=['product', 'rank'])]
+
+class ProductDailyViews(models.Model):
+    """Detail-page views per product and day, flushed from products.counters."""
+    product = models.ForeignKey(Product, related_name='daily_views', on_delete=models.CASCADE)
+    date = models.DateField(verbose_name="التاريخ")
+    views = models.PositiveIntegerField(default=0, verbose_name="المشاهدات")
+
+    class Meta:
+        verbose_name = "مشاهدات يومية"
+        verbose_name_plural = "المشاهدات اليومية"
+        unique_together = ('product', 'date')
+        indexes = [models.Index(fields=['date', 'views'])]
@@ -0,0 +1,207 @@
+"""
+Scent-note vocabulary and inverted index.
+
+``ProductNote.name_ar`` is free text, so the same note arrives as
+"العود", "عود" or "عـود". Every spelling is folded with the search
+normalizer (products.search) into a key. ``ScentNoteAlias`` maps each key
+to a canonical ``ScentNote``, and every ProductNote points at its note
+through ``term``. ``merge`` folds duplicate notes into one, keeping their
+spellings as aliases so later imports land on the survivor.
+
+``NoteIndex`` holds one posting list per (note, note type), plus one per
+note for any type. Each list is the sorted numpy array of active product
+ids with that note. ``?notes=`` filters intersect the lists (AND, the
+default) or merge them (``notes_match=any``) in memory, smallest list
+first, and hand the product table a single id-list parameter instead of
+one join per note. The vocabulary's slugs and keys are loaded with the
+lists, so resolving a filter costs no query.
+
+Each worker builds its index on first use and rebuilds it when the
+``note-index`` generation moves; note, product and vocabulary changes
+bump it through products.signals.
+"""
+import json
+import threading
+import numpy as np
+from collections import defaultdict
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils.text import slugify
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from . import detail, suggest
+from .cache import bump_generation_on_commit, get_generation
+from .models import ProductNote, ScentNote, ScentNoteAlias
+from .search import tokenize
+
+NAMESPACE = 'note-index'
+NOTE_TYPES = [choice for choice, _ in ProductNote.NOTE_TYPES]
+MATCH_MODES = ('all', 'any')
+EMPTY = np.zeros(0, dtype=np.int64)
+# Stay under SQLite's bound-parameter limit for key__in lookups
+KEY_CHUNK = 900
+
+_lock = threading.Lock()
+_index = None
+
+
+def note_key(name):
+    return ' '.join(tokenize(name))[:100]
+
+
+def _unique_slug(name):
+    base = slugify(name, allow_unicode=True)[:90] or 'note'
+    slug, n = base, 1
+    while ScentNote.objects.filter(slug=slug).exists():
+        n += 1
+        slug = f'{base}-{n}'
+    return slug
+
+
+def term_ids(names):
+    """``{name: ScentNote id}`` for note names, creating notes for unseen spellings."""
+    keys = {name: note_key(name) for name in set(names)}
+    wanted = sorted(set(filter(None, keys.values())))
+    found = {}
+    for start in range(0, len(wanted), KEY_CHUNK):
+        found.update(ScentNoteAlias.objects.filter(key__in=wanted[start:start + KEY_CHUNK]).values_list('key', 'note_id'))
+    for name, key in sorted(keys.items()):
+        if key and key not in found:
+            note = ScentNote.objects.create(name_ar=name.strip(), slug=_unique_slug(key))
+            ScentNoteAlias.objects.create(note=note, key=key)
+            found[key] = note.id
+    return {name: found.get(key) for name, key in keys.items()}
+
+
+def assign_terms(product_notes):
+    """Set ``term_id`` on unsaved ProductNote rows, e.g. before ``bulk_create``."""
+    ids = term_ids(note.name_ar for note in product_notes)
+    for note in product_notes:
+        note.term_id = ids[note.name_ar]
+    return product_notes
+
+
+def changed(product_ids=()):
+    bump_generation_on_commit(NAMESPACE)
+    # Filtered lists and the note ids in product pages
+    bump_generation_on_commit()
+    detail.invalidate(product_ids)
+
+
+@transaction.atomic
+def merge(target, sources):
+    """Fold ``sources`` (ScentNote rows) into ``target``; their spellings become its aliases."""
+    source_ids = [note.id for note in sources if note.id != target.id]
+    rows = ProductNote.objects.filter(term_id__in=source_ids)
+    product_ids = set(rows.values_list('product_id', flat=True))
+    moved = rows.update(term=target)
+    ScentNoteAlias.objects.filter(note_id__in=source_ids).update(note=target)
+    ScentNote.objects.filter(id__in=source_ids).delete()
+    changed(product_ids)
+    suggest.changed('note', [target.id])
+    return {'merged': len(source_ids), 'product_notes': moved, 'products': len(product_ids)}
+
+
+class NoteIndex:
+    def __init__(self, postings, lookup):
+        # (note id, note type or None) -> sorted unique product ids
+        self.postings = postings
+        # slug, normalized key or str(id) -> note id
+        self.lookup = lookup
+
+    @classmethod
+    def load(cls):
+        lists = defaultdict(list)
+        rows = ProductNote.objects.filter(product__is_active=True, term__isnull=False).values_list('term_id', 'note_type', 'product_id')
+        for term_id, note_type, product_id in rows.iterator(chunk_size=5000):
+            lists[(term_id, note_type)].append(product_id)
+            lists[(term_id, None)].append(product_id)
+        postings = {key: np.unique(np.asarray(ids, dtype=np.int64)) for key, ids in lists.items()}
+
+        lookup = {}
+        for note_id, slug in ScentNote.objects.values_list('id', 'slug'):
+            lookup[str(note_id)] = lookup[slug] = note_id
+        for key, note_id in ScentNoteAlias.objects.values_list('key', 'note_id'):
+            lookup.setdefault(key, note_id)
+        return cls(postings, lookup)
+
+    def resolve(self, value):
+        value = value.strip()
+        return self.lookup.get(value) or self.lookup.get(value.lower()) or self.lookup.get(note_key(value))
+
+    def posting(self, note_id, note_type=None):
+        return self.postings.get((note_id, note_type), EMPTY)
+
+    def match(self, clauses, mode='all'):
+        """Product ids for ``[(note id or None, note type or None)]``; unknown notes match nothing."""
+        lists = [self.posting(note_id, note_type) if note_id is not None else EMPTY for note_id, note_type in clauses]
+        if not lists:
+            return EMPTY
+        if mode == 'any':
+            return np.unique(np.concatenate(lists))
+        lists.sort(key=len)
+        result = lists[0]
+        for posting in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, posting, assume_unique=True)
+        return result
+
+
+def get_index():
+    global _index
+    generation = get_generation(NAMESPACE)
+    index = _index
+    if index is None or index[0] != generation:
+        with _lock:
+            if _index is None or _index[0] != generation:
+                _index = (generation, NoteIndex.load())
+            index = _index
+    return index[1]
+
+
+def filter_ids(queryset, ids):
+    """``id IN (...)`` with the ids bound as one parameter, however many there are."""
+    ids = [int(product_id) for product_id in ids]
+    if connection.vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL('SELECT value FROM json_each(%s)', [json.dumps(ids)]))
+    if connection.vendor == 'postgresql':
+        return queryset.filter(id__in=RawSQL('SELECT unnest(%s::bigint[])', [ids]))
+    return queryset.filter(id__in=ids)
+
+
+def parse_clauses(value, default_type=None):
+    """``'oud,base:saffron'`` -> ``[('oud', None), ('saffron', 'base')]`` with ``default_type`` filled in."""
+    clauses = []
+    for part in filter(None, (part.strip() for part in value.split(','))):
+        note_type, _, name = part.rpartition(':')
+        note_type = note_type.strip() or default_type
+        if note_type is not None and note_type not in NOTE_TYPES:
+            raise ValidationError({'note_type': [f'نوع النوتة غير معروف: {note_type}']})
+        clauses.append((name.strip(), note_type))
+    return clauses
+
+
+class NoteFilter(filters.BaseFilterBackend):
+    """``?notes=oud,saffron`` (all of them), ``&notes_match=any``, ``&note_type=base`` or ``base:oud`` per note."""
+    notes_param = 'notes'
+    type_param = 'note_type'
+    match_param = 'notes_match'
+
+    def filter_queryset(self, request, queryset, view):
+        value = request.query_params.get(self.notes_param, '')
+        default_type = request.query_params.get(self.type_param) or None
+        if default_type is not None and default_type not in NOTE_TYPES:
+            raise ValidationError({self.type_param: [f'نوع النوتة غير معروف: {default_type}']})
+        mode = request.query_params.get(self.match_param) or 'all'
+        if mode not in MATCH_MODES:
+            raise ValidationError({self.match_param: ['القيمة يجب أن تكون all أو any']})
+        clauses = parse_clauses(value, default_type)
+        if not clauses:
+            return queryset
+
+        index = get_index()
+        ids = index.match([(index.resolve(name), note_type) for name, note_type in clauses], mode)
+        if not len(ids):
+            return queryset.none()
+        return filter_ids(queryset, ids.tolist())
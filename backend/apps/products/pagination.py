@@ -0,0 +1,147 @@
+"""
+Opt-in keyset (cursor) pagination.
+
+Listings keep the default page-number behaviour. Passing ``?cursor=``
+(empty for the first page) switches to keyset mode: rows are ordered by
+one of the view's ``cursor_ordering_fields`` plus ``id`` as a tiebreaker,
+and each page seeks past the previous one with ``(field, id)``
+comparisons instead of an ``OFFSET``, so deep pages cost the same as the
+first. No ``COUNT(*)`` runs unless ``?total=1`` is passed, and that total
+is cached briefly, so it may be slightly stale.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(request, view)
+        self.nullable = queryset.model._meta.get_field(self.field).null
+        self.total = self.get_total(queryset) if request.query_params.get(self.total_query_param) in ('1', 'true') else None
+
+        position = self.decode_cursor(queryset.model, request.query_params[self.cursor_query_param])
+        reverse = bool(position and position['reverse'])
+        # A previous-page cursor walks the ordering backwards from its row
+        descending = self.descending != reverse
+        nulls_last = not reverse
+        queryset = queryset.order_by(*self.order_by(descending, nulls_last))
+        if position:
+            queryset = queryset.filter(self.seek(position['value'], position['id'], descending, nulls_last))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = bool(rows), has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page_rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.total is not None:
+            payload['count'] = self.total
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return self.cursor_link(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page_rows:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.cursor_link(self.page_rows[0], reverse=True)
+
+    def get_ordering(self, request, view):
+        allowed = getattr(view, 'cursor_ordering_fields', ['created_at'])
+        requested = request.query_params.get('ordering', '').split(',')[0].strip()
+        if requested.lstrip('-') in allowed:
+            return requested.lstrip('-'), requested.startswith('-')
+        default = getattr(view, 'cursor_ordering', '-created_at')
+        return default.lstrip('-'), default.startswith('-')
+
+    def order_by(self, descending, nulls_last):
+        direction = 'desc' if descending else 'asc'
+        field = F(self.field)
+        if self.nullable:
+            field = getattr(field, direction)(**{'nulls_last' if nulls_last else 'nulls_first': True})
+        else:
+            field = getattr(field, direction)()
+        return [field, getattr(F('id'), direction)()]
+
+    def seek(self, value, pk, descending, nulls_last):
+        """Rows strictly after (value, pk) in the given ordering."""
+        op = 'lt' if descending else 'gt'
+        after_pk = Q(**{f'id__{op}': pk})
+        if value is None:
+            null_rows = Q(**{f'{self.field}__isnull': True}) & after_pk
+            return null_rows if nulls_last else null_rows | Q(**{f'{self.field}__isnull': False})
+        condition = Q(**{f'{self.field}__{op}': value}) | (Q(**{self.field: value}) & after_pk)
+        if self.nullable and nulls_last:
+            return condition | Q(**{f'{self.field}__isnull': True})
+        # The redundant bound lets the (field, id) index seek instead of scanning from the top
+        return Q(**{f'{self.field}__{op}e': value}) & condition
+
+    def cursor_link(self, row, reverse):
+        value = getattr(row, self.field)
+        position = {
+            'o': self.field,
+            'v': None if value is None else (value.isoformat() if hasattr(value, 'isoformat') else str(value)),
+            'id': row.pk,
+            'r': int(reverse),
+        }
+        token = base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def decode_cursor(self, model, token):
+        if not token:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if position['o'] != self.field:
+                raise ValueError
+            raw = position['v']
+            value = None if raw is None else model._meta.get_field(self.field).to_python(raw)
+            return {'value': value, 'id': int(position['id']), 'reverse': bool(position['r'])}
+        except (TypeError, ValueError, KeyError, ValidationError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_total(self, queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        key = 'pagination-total:' + hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        total = cache.get(key)
+        if total is None:
+            total = queryset.order_by().count()
+            cache.set(key, total, getattr(settings, 'PAGINATION_TOTAL_CACHE_TIMEOUT', 60))
+        return total
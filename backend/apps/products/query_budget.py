@@ -0,0 +1,184 @@
+"""
+Per-endpoint SQL query budget.
+
+``router_endpoints`` walks the URLconf for every GET route that a DRF
+router registered (list, detail and extra actions). ``measure`` seeds the
+whole store at a given size (products, orders, customers, carts, coupons,
+CMS content), requests every endpoint as an admin and records its status,
+query count, duration and number of items. The sizes stay below the page
+size, so a list endpoint returns every seeded row and any per-row query
+shows up as a higher count at the larger size. Detail endpoints get
+nested collections of the same size.
+
+``run`` measures each size inside ``rolled_back()`` and returns a report
+keyed by route name. ``growing`` lists the endpoints whose query count
+rises with the size. QueryBudgetTests fails on any of them, and
+``query_budget --json`` writes the report so it can be diffed between
+releases. Query counts are the budget; durations are only informative.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from .benchmarking import rolled_back
+
+SIZES = (2, 6)
+
+
+def _walk(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def router_endpoints():
+    """``[(route name, viewset class, action, url kwarg names)]`` for every router GET route."""
+    endpoints = {}
+    for pattern in _walk(get_resolver().url_patterns):
+        actions = getattr(pattern.callback, 'actions', None)
+        if not actions or 'get' not in actions or not pattern.name:
+            continue
+        kwargs = [name for name in pattern.pattern.regex.groupindex if name != 'format']
+        if 'format' in pattern.pattern.regex.groupindex:
+            # The router's .json/.api suffix twin of a route already listed
+            continue
+        endpoints.setdefault(pattern.name, (pattern.name, pattern.callback.cls, actions['get'], kwargs))
+    return sorted(endpoints.values())
+
+
+def seed(size):
+    """Create ``size`` of everything the endpoints list; the last row of each model carries the nested rows."""
+    from cart.models import Cart, CartItem
+    from cms.models import Banner, HeroSlide
+    from crm.models import CustomerInteraction, CustomerProfile, CustomerTag
+    from marketing.models import Coupon
+    from orders.models import Order, OrderItem, OrderStatusHistory
+    from .models import Brand, Category, FragranceFamily, Product, ProductNote, ProductVariant, RelatedProduct
+
+    admin = User.objects.create_superuser(username=f'budget-admin-{size}', password='password', email='budget@example.com')
+    brand = Brand.objects.create(name_ar='براند', slug=f'budget-brand-{size}')
+    families = [FragranceFamily.objects.create(name_ar=f'عائلة {i}', icon='', color='#000000') for i in range(size)]
+    categories = [Category.objects.create(name_ar=f'فئة {i}', slug=f'budget-category-{size}-{i}') for i in range(size)]
+    products = []
+    for i in range(size):
+        product = Product.objects.create(name_ar=f'عطر {i}', slug=f'budget-{size}-{i}', brand=Brand.objects.create(
+            name_ar=f'براند {i}', slug=f'budget-brand-{size}-{i}') if i else brand, gender='men')
+        product.categories.set(categories)
+        product.fragrance_families.set(families)
+        for j in range(size):
+            ProductVariant.objects.create(product=product, size_ml=10 * (j + 1), price=100, stock_quantity=j, sku=f'BUDGET-{size}-{i}-{j}')
+            ProductNote.objects.create(product=product, note_type='top', name_ar=f'نوتة {j}')
+        products.append(product)
+    RelatedProduct.objects.bulk_create([
+        RelatedProduct(product=products[-1], related=product, score=0.5, rank=rank) for rank, product in enumerate(products[:-1])
+    ])
+    Product.objects.filter(id__in=[product.id for product in products]).update(related_dirty=False)
+    variants = list(ProductVariant.objects.filter(product__in=products))
+
+    tags = [CustomerTag.objects.create(name=f'تاج {i}') for i in range(size)]
+    customers = []
+    for i in range(size):
+        customer = CustomerProfile.objects.create(name=f'عميل {i}', phone=f'09100000{size}{i}')
+        customer.tags.set(tags)
+        for j in range(size):
+            CustomerInteraction.objects.create(customer=customer, interaction_type='call', subject='متابعة', content='-', created_by=admin)
+        customers.append(customer)
+    for i in range(size):
+        order = Order.objects.create(
+            order_number=f'BUDGET-{size}-{i}', customer=customers[-1], customer_name='عميل', customer_phone=customers[-1].phone,
+            city='طرابلس', area='المركز', address='شارع 1', subtotal=100, shipping_cost=10, total=110,
+        )
+        for variant in variants[:size]:
+            OrderItem.objects.create(order=order, variant=variant, product_name=variant.product.name_ar, variant_size=variant.size_ml,
+                                     quantity=1, unit_price=variant.price, total_price=variant.price)
+            OrderStatusHistory.objects.create(order=order, status='pending', changed_by=admin)
+
+    cart = Cart.objects.create(user=admin)
+    CartItem.objects.bulk_create([CartItem(cart=cart, variant=variant, quantity=1) for variant in variants[:size]])
+    now = timezone.now()
+    for i in range(size):
+        Coupon.objects.create(code=f'BUDGET{size}{i}', discount_type='percentage', discount_value=Decimal('10'),
+                              valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1))
+        HeroSlide.objects.create(title=f'شريحة {i}', image='cms/slides/budget.jpg')
+        Banner.objects.create(title=f'بانر {i}', image='cms/banners/budget.jpg', link='/', position='home_top')
+    return {'admin': admin, 'products': products, 'orders': Order.objects.filter(order_number__startswith=f'BUDGET-{size}-')}
+
+
+# Query strings for routes that reject a bare GET
+PARAMS = {
+    'product-public-batch': lambda seeded: {'slugs': ','.join(product.slug for product in seeded['products'])},
+    'order-track': lambda seeded: {'order_number': seeded['orders'][0].order_number},
+}
+
+
+def _lookup_value(viewset, action, kwarg, admin):
+    view = viewset(action=action, request=Request(APIRequestFactory().get('/')), kwargs={}, format_kwarg=None)
+    view.request.user = admin
+    # The newest row is the one just seeded, with nested collections of the seeded size
+    obj = view.get_queryset().order_by('-pk').first()
+    return None if obj is None else getattr(obj, view.lookup_field)
+
+
+def _items(response):
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return len(data['results'])
+    return len(data) if isinstance(data, list) else None
+
+
+def measure(size):
+    """``{route name: {path, status, queries, ms, items}}`` with the store seeded at ``size``."""
+    seeded = seed(size)
+    client = APIClient()
+    client.force_authenticate(user=seeded['admin'])
+    results = {}
+    for name, viewset, action, kwarg_names in router_endpoints():
+        kwargs = {kwarg: _lookup_value(viewset, action, kwarg, seeded['admin']) for kwarg in kwarg_names}
+        if None in kwargs.values():
+            continue
+        path = reverse(name, kwargs=kwargs)
+        params = PARAMS[name](seeded) if name in PARAMS else None
+        # Catalogue responses are cached; every request has to reach the database
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(path, params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - started) * 1000
+        results[name] = {
+            'path': path, 'status': response.status_code, 'queries': len(queries),
+            'ms': round(elapsed, 2), 'items': _items(response),
+        }
+    return results
+
+
+def run(sizes=SIZES):
+    """``{route name: {'path', 'sizes': {size: measurement}}}``."""
+    report = {}
+    for size in sizes:
+        with rolled_back():
+            for name, result in measure(size).items():
+                entry = report.setdefault(name, {'path': result.pop('path'), 'sizes': {}})
+                result.pop('path', None)
+                entry['sizes'][size] = result
+    return report
+
+
+def growing(report):
+    """Route names whose query count rises with the seeded size."""
+    names = []
+    for name, entry in report.items():
+        counts = [entry['sizes'][size]['queries'] for size in sorted(entry['sizes'])]
+        if any(later > earlier for earlier, later in zip(counts, counts[1:])):
+            names.append(name)
+    return names
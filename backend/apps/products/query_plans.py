@@ -0,0 +1,87 @@
+"""
+Hot queries and their expected plans.
+
+``HOT_QUERIES`` lists the filters the storefront, the admin and the
+dashboard run all the time, each with the index designed for it (see the
+``Meta.indexes`` of the models involved). ``explain`` returns the
+database's plan for a queryset (``EXPLAIN QUERY PLAN`` on SQLite,
+``EXPLAIN`` on PostgreSQL), and ``full_scans`` picks out the tables it
+reads row by row. A plain ``SCAN table`` (``Seq Scan`` on PostgreSQL)
+reads the whole table. ``SCAN table USING INDEX`` walks an index in
+order, which is only acceptable when a LIMIT stops it early; a
+``COVERING INDEX`` scan never touches the table, which is as cheap as a
+grouping over every row gets.
+
+The regression tests in products.tests run every query against an empty
+schema, and ``benchmark_indexes`` times them with and without the
+indexes on a synthetic dataset.
+"""
+import re
+from datetime import timedelta
+from django.db import connection
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\b(?! USING)')
+SQLITE_INDEX_WALK = re.compile(r'\bSCAN (?:TABLE )?(\w+) USING INDEX\b')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def hot_queries():
+    """``name -> (queryset, table, index)``; built lazily because the models span several apps."""
+    from cart.models import Cart, CartItem
+    from crm.models import CustomerProfile
+    from orders.models import Order
+    from .models import Product, ProductVariant
+
+    month_ago = timezone.now() - timedelta(days=30)
+    return {
+        'product_list': (Product.objects.filter(is_active=True).order_by('-created_at', '-id')[:24], 'products_product', 'product_active_created_idx'),
+        'product_gender': (
+            Product.objects.filter(is_active=True, gender='men').order_by('-created_at')[:24], 'products_product', 'product_active_gender_idx',
+        ),
+        'product_variants': (ProductVariant.objects.filter(product_id=1, is_active=True), 'products_productvariant', 'variant_product_active_idx'),
+        'low_stock': (ProductVariant.objects.filter(stock_quantity__lte=5), 'products_productvariant', 'variant_stock_idx'),
+        'orders_by_status': (Order.objects.filter(status='pending').order_by('-created_at')[:25], 'orders_order', 'order_status_created_idx'),
+        'delivered_revenue': (
+            Order.objects.filter(status='delivered', created_at__gte=month_ago).values('total'), 'orders_order', 'order_status_created_idx',
+        ),
+        'orders_by_phone': (Order.objects.filter(customer_phone='0910000000'), 'orders_order', 'order_phone_idx'),
+        'orders_by_date': (Order.objects.filter(created_at__gte=month_ago, created_at__lte=timezone.now()), 'orders_order', None),
+        'orders_by_total': (Order.objects.filter(total__gte=100, total__lte=500), 'orders_order', 'order_total_idx'),
+        'city_sales': (
+            Order.objects.values('city').annotate(revenue=Sum('total'), count=Count('id')).order_by('-revenue'),
+            'orders_order', 'order_city_total_idx',
+        ),
+        'customer_by_phone': (CustomerProfile.objects.filter(phone='0910000000'), 'crm_customerprofile', 'customer_phone_idx'),
+        'customers_by_segment': (
+            CustomerProfile.objects.filter(segment='vip').order_by('-created_at')[:25], 'crm_customerprofile', 'customer_segment_created_idx',
+        ),
+        'cart_by_session': (Cart.objects.filter(session_key='x' * 32), 'cart_cart', None),
+        'cart_item': (CartItem.objects.filter(cart_id=1, variant_id=1), 'cart_cartitem', 'cart_item_lookup_idx'),
+    }
+
+
+def designed_indexes():
+    """``(model, index)`` for every index named in ``hot_queries``."""
+    from django.apps import apps
+
+    names = {index for _, _, index in hot_queries().values() if index}
+    return [(model, index) for model in apps.get_models() for index in model._meta.indexes if index.name in names]
+
+
+def explain(queryset):
+    return queryset.explain().splitlines()
+
+
+def full_scans(plan, limited=False, vendor=None):
+    """Tables read in full according to ``plan`` (lines from ``explain``) of a query with or without a LIMIT."""
+    if (vendor or connection.vendor) == 'postgresql':
+        patterns = [POSTGRES_FULL_SCAN]
+    else:
+        patterns = [SQLITE_FULL_SCAN] if limited else [SQLITE_FULL_SCAN, SQLITE_INDEX_WALK]
+    return {match.group(1) for pattern in patterns for line in plan for match in pattern.finditer(line)}
+
+
+def is_limited(queryset):
+    return queryset.query.high_mark is not None
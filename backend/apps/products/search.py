@@ -0,0 +1,237 @@
+"""
+Arabic-aware product search.
+
+Every product is flattened into a ``ProductSearchDocument`` row holding the
+normalized tokens of its name, brand, notes, fragrance families and
+occasion/vibe. On SQLite the rows are mirrored into an FTS5 table by
+triggers and ranked with ``bm25()``; on PostgreSQL a generated, GIN-indexed
+``tsvector`` column is ranked with ``ts_rank_cd()``. Any other database
+falls back to a LIKE scan over the normalized text.
+
+``ProductSearchFilter`` keeps two things apart. Which products match is a
+subquery over the index without a limit, so the other filters, the
+paginated count and the facet counts see every match. How they are
+ordered comes from the ``PRODUCT_SEARCH_MAX_RESULTS`` best-ranked ids
+(default 500). Matches ranked below that come last, unranked.
+"""
+import re
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+from .cache import bump_generation_on_commit
+
+FTS_TABLE = 'products_search_fts'
+DOCUMENT_FIELDS = ['name', 'brand', 'notes', 'families', 'attributes']
+# bm25() column weights, in DOCUMENT_FIELDS order
+FIELD_WEIGHTS = (10.0, 6.0, 3.0, 3.0, 1.0)
+
+# Tashkeel, Quranic marks and tatweel
+DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+CHAR_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و', 'ئ': 'ي',
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+})
+TOKEN_SPLIT = re.compile(r'[\W_]+')
+ARTICLE_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+
+def normalize(text):
+    """Fold the spelling variants customers mix up into one canonical form."""
+    text = DIACRITICS.sub('', text or '')
+    return text.translate(CHAR_MAP).lower()
+
+
+def strip_article(token):
+    for prefix in ARTICLE_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            return token[len(prefix):]
+    return token
+
+
+def tokenize(text):
+    return [strip_article(token) for token in TOKEN_SPLIT.split(normalize(text)) if token]
+
+
+def to_document_text(*values):
+    return ' '.join(token for value in values for token in tokenize(value))
+
+
+def build_documents(product_ids):
+    from .models import Product, ProductNote, ProductSearchDocument
+
+    notes = defaultdict(list)
+    for product_id, name in ProductNote.objects.filter(product_id__in=product_ids).values_list('product_id', 'name_ar'):
+        notes[product_id].append(name)
+
+    families = defaultdict(list)
+    through = Product.fragrance_families.through
+    for product_id, name in through.objects.filter(product_id__in=product_ids).values_list('product_id', 'fragrancefamily__name_ar'):
+        families[product_id].append(name)
+
+    rows = Product.objects.filter(id__in=product_ids).values_list('id', 'name_ar', 'brand__name_ar', 'occasion', 'vibe')
+    return [
+        ProductSearchDocument(
+            product_id=product_id,
+            name=to_document_text(name),
+            brand=to_document_text(brand),
+            notes=to_document_text(*notes[product_id]),
+            families=to_document_text(*families[product_id]),
+            attributes=to_document_text(occasion, vibe),
+        )
+        for product_id, name, brand, occasion, vibe in rows
+    ]
+
+
+def index_products(product_ids):
+    """(Re)index the given products; ids of deleted products are just dropped."""
+    from .models import ProductSearchDocument
+
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return 0
+    with transaction.atomic():
+        ProductSearchDocument.objects.filter(product_id__in=product_ids).delete()
+        documents = ProductSearchDocument.objects.bulk_create(build_documents(product_ids))
+    return len(documents)
+
+
+def rebuild_index(chunk_size=1000):
+    from .models import Product, ProductSearchDocument
+
+    indexed = 0
+    with transaction.atomic():
+        ProductSearchDocument.objects.all().delete()
+        ids = list(Product.objects.values_list('id', flat=True).order_by('id'))
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            indexed += len(ProductSearchDocument.objects.bulk_create(build_documents(chunk)))
+        bump_generation_on_commit()
+    return indexed
+
+
+class LikeBackend:
+    """Portable fallback: every token must prefix-match somewhere, unranked."""
+
+    def _documents(self, tokens):
+        from .models import ProductSearchDocument
+
+        qs = ProductSearchDocument.objects.all()
+        for token in tokens:
+            condition = Q()
+            for field in DOCUMENT_FIELDS:
+                condition |= Q(**{f'{field}__startswith': token}) | Q(**{f'{field}__contains': f' {token}'})
+            qs = qs.filter(condition)
+        return qs.values_list('product_id', flat=True)
+
+    def search(self, tokens, limit):
+        return list(self._documents(tokens)[:limit])
+
+    def matching(self, tokens):
+        return self._documents(tokens)
+
+    def order_by_rank(self, queryset, ids):
+        return queryset
+
+
+class SQLiteFTSBackend:
+    def _match(self, tokens):
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, tokens, limit):
+        match = self._match(tokens)
+        weights = ', '.join(str(weight) for weight in FIELD_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def matching(self, tokens):
+        return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self._match(tokens)])
+
+    def order_by_rank(self, queryset, ids):
+        # One instr() per row instead of a CASE with a branch per ranked id
+        positions = ',' + ','.join(str(product_id) for product_id in ids) + ','
+        table = queryset.model._meta.db_table
+        # 0 (not among the ranked ids) becomes NULL and sorts last
+        rank = RawSQL(f"""nullif(instr(%s, ',' || "{table}"."id" || ','), 0)""", [positions])
+        return queryset.order_by(rank.asc(nulls_last=True))
+
+
+class PostgresBackend:
+    # PostgreSQL has no built-in BM25; ts_rank_cd over A-D weighted fields is the closest.
+    def search(self, tokens, limit):
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT product_id FROM products_productsearchdocument "
+                "WHERE search_vector @@ to_tsquery('simple', %s) "
+                "ORDER BY ts_rank_cd(search_vector, to_tsquery('simple', %s)) DESC LIMIT %s",
+                [query, query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def matching(self, tokens):
+        return RawSQL(
+            "SELECT product_id FROM products_productsearchdocument WHERE search_vector @@ to_tsquery('simple', %s)",
+            [' & '.join(f'{token}:*' for token in tokens)],
+        )
+
+    def order_by_rank(self, queryset, ids):
+        table = queryset.model._meta.db_table
+        # NULL for ids outside the ranked ones, sorted last
+        rank = RawSQL(f'array_position(%s, "{table}"."id")', [list(ids)])
+        return queryset.order_by(rank.asc(nulls_last=True))
+
+
+_backends = {}
+
+
+def get_backend():
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backends[vendor] = SQLiteFTSBackend()
+        elif vendor == 'postgresql':
+            _backends[vendor] = PostgresBackend()
+        else:
+            _backends[vendor] = LikeBackend()
+    return _backends[vendor]
+
+
+def search_product_ids(query, limit=None):
+    """Return matching product ids, best match first (``None`` for an empty query)."""
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    limit = limit or getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', 500)
+    return get_backend().search(tokens, limit)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """Drop-in replacement for SearchFilter backed by the ranked search index."""
+
+    def filter_queryset(self, request, queryset, view):
+        tokens = tokenize(request.query_params.get(self.search_param, ''))
+        if not tokens:
+            return queryset
+        backend = get_backend()
+        ids = backend.search(tokens, getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', 500))
+        if not ids:
+            return queryset.none()
+
+        # Every match, not just the ranked ones: other filters may drop those
+        queryset = queryset.filter(id__in=backend.matching(tokens))
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return backend.order_by_rank(queryset, ids)
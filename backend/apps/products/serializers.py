@@ -1,12 +1,19 @@
 from rest_framework import serializers
-from .models import Category, Brand, FragranceFamily, Product, ProductVariant, ProductNote, ProductImage
+from .models import Category, Brand, FragranceFamily, Product, ProductVariant, ProductNote, ProductImage, ScentNote
+from .fieldsets import SparseFieldsetMixin
+from .fastpath import FastPathMixin
+from .images import SrcsetField
+
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    image_srcset = SrcsetField(source='image')
 
-class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
-class BrandSerializer(serializers.ModelSerializer):
+class BrandSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    logo_srcset = SrcsetField(source='logo')
+
     class Meta:
         model = Brand
         fields = '__all__'
@@ -19,21 +26,38 @@ class FragranceFamilySerializer(serializers.ModelSerializer):
 class ProductNoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductNote
-        fields = ['note_type', 'name_ar', 'icon']
+        fields = ['note_type', 'name_ar', 'icon', 'term']
+
+class ScentNoteSerializer(serializers.ModelSerializer):
+    aliases = serializers.SlugRelatedField(many=True, read_only=True, slug_field='key')
+
+    class Meta:
+        model = ScentNote
+        fields = ['id', 'name_ar', 'slug', 'icon', 'aliases']
+
+class ScentNoteMergeSerializer(serializers.Serializer):
+    """Notes folded into the one in the URL (products.notes.merge)."""
+    sources = serializers.PrimaryKeyRelatedField(many=True, queryset=ScentNote.objects.all(), allow_empty=False)
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField(source='image')
+
     class Meta:
         model = ProductImage
-        fields = ['image', 'alt_text', 'order']
+        fields = ['image', 'image_srcset', 'alt_text', 'order']
 
-class ProductVariantSerializer(serializers.ModelSerializer):
+class ProductVariantSerializer(FastPathMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     discount_percentage = serializers.ReadOnlyField()
     product_name_ar = serializers.ReadOnlyField(source='product.name_ar')
     product_main_image = serializers.SerializerMethodField()
+    image_srcset = SrcsetField(source='image')
+
+    related_paths = {'product': 'product', 'product_name_ar': 'product', 'product_main_image': 'product'}
+    expandable_fields = {'product': lambda: ProductListSerializer(read_only=True)}
     
     class Meta:
         model = ProductVariant
-        fields = ['id', 'product', 'name', 'size_ml', 'price', 'sale_price', 'current_price', 'discount_percentage', 'stock_quantity', 'sku', 'image', 'is_active', 'product_name_ar', 'product_main_image']
+        fields = ['id', 'product', 'name', 'size_ml', 'price', 'sale_price', 'current_price', 'discount_percentage', 'stock_quantity', 'sku', 'image', 'image_srcset', 'is_active', 'product_name_ar', 'product_main_image']
 
     def get_product_main_image(self, obj):
         if obj.image:
@@ -42,30 +66,33 @@ class ProductVariantSerializer(serializers.ModelSerializer):
             return obj.product.main_image.url
         return None
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(FastPathMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
     brand = BrandSerializer(read_only=True)
-    min_price = serializers.SerializerMethodField()
+    min_price = serializers.ReadOnlyField()
+    main_image_srcset = SrcsetField(source='main_image')
+
+    related_paths = {'brand': 'brand', 'categories': 'categories'}
     
     class Meta:
         model = Product
-        fields = ['id', 'name_ar', 'slug', 'categories', 'brand', 'main_image', 'min_price', 'gender', 'occasion', 'vibe', 'is_featured', 'is_new', 'is_active']
-
-    def get_min_price(self, obj):
-        variants = obj.variants.filter(is_active=True)
-        if variants.exists():
-            return min([v.current_price for v in variants])
-        return None
+        fields = ['id', 'name_ar', 'slug', 'categories', 'brand', 'main_image', 'main_image_srcset', 'min_price', 'gender', 'occasion', 'vibe', 'is_featured', 'is_new', 'is_active']
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     fragrance_families = FragranceFamilySerializer(many=True, read_only=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
     notes = ProductNoteSerializer(many=True, read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
+    main_image_srcset = SrcsetField(source='main_image')
+
+    related_paths = {
+        'brand': 'brand', 'categories': 'categories', 'fragrance_families': 'fragrance_families',
+        'variants': 'variants', 'notes': 'notes', 'images': 'images',
+    }
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['related_dirty']
         extra_kwargs = {
             'description': {'required': False, 'allow_blank': True},
             'story': {'required': False, 'allow_blank': True},
@@ -75,6 +102,56 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Return nested category/brand on read."""
         data = super().to_representation(instance)
-        data['categories'] = CategorySerializer(instance.categories.all(), many=True).data
-        data['brand'] = BrandSerializer(instance.brand).data if instance.brand else None
+        if 'categories' in self.fields:
+            data['categories'] = CategorySerializer(instance.categories.all(), many=True, shape=self.nested_shape('categories')).data
+        if 'brand' in self.fields:
+            data['brand'] = BrandSerializer(instance.brand, shape=self.nested_shape('brand')).data if instance.brand else None
         return data
+
+
+class VariantPatchSerializer(serializers.Serializer):
+    """One entry of the bulk variant update (products.variant_updates)."""
+    sku = serializers.CharField(max_length=50)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    sale_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+    cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+    stock_delta = serializers.IntegerField(required=False)
+    is_active = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if 'stock_quantity' in attrs and 'stock_delta' in attrs:
+            raise serializers.ValidationError('استخدم stock_quantity أو stock_delta وليس كليهما')
+        if len(attrs) == 1:
+            raise serializers.ValidationError('لا توجد حقول للتحديث')
+        return attrs
+
+class VariantRuleSerializer(serializers.Serializer):
+    """A filter plus exactly one action, e.g. ``{"brand": "x", "discount_percent": 10}``."""
+    FILTERS = ['brand', 'category', 'product', 'skus']
+    ACTIONS = ['discount_percent', 'price_percent', 'clear_sale', 'is_active']
+
+    brand = serializers.CharField(required=False)
+    category = serializers.CharField(required=False)
+    product = serializers.CharField(required=False)
+    skus = serializers.ListField(child=serializers.CharField(max_length=50), required=False, allow_empty=False)
+    # 0 would make the sale price the price, 100 would make it 0 (which current_price reads as no sale)
+    discount_percent = serializers.DecimalField(max_digits=5, decimal_places=2, required=False)
+    price_percent = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=-99, max_value=1000, required=False)
+    clear_sale = serializers.BooleanField(required=False)
+    is_active = serializers.BooleanField(required=False)
+
+    def validate_discount_percent(self, value):
+        if not 0 < value < 100:
+            raise serializers.ValidationError('نسبة الخصم يجب أن تكون أكبر من 0 وأقل من 100')
+        return value
+
+    def validate(self, attrs):
+        if not any(attrs.get(name) for name in self.FILTERS):
+            raise serializers.ValidationError('حدد ماركة أو فئة أو منتجاً أو قائمة SKU')
+        if attrs.get('clear_sale') is False:
+            del attrs['clear_sale']
+        actions = [name for name in self.ACTIONS if name in attrs]
+        if len(actions) != 1:
+            raise serializers.ValidationError('حدد إجراءً واحداً: ' + ', '.join(self.ACTIONS))
+        return attrs
@@ -0,0 +1,193 @@
+from django.core.signals import request_finished
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Brand, Category, FragranceFamily, Product, ProductVariant, ProductNote, ProductImage, ScentNote, ScentNoteAlias
+from .search import index_products
+from .cache import bump_generation_on_commit
+from .images import image_fields_changed, image_fields_deleted
+from .counters import flush_if_due
+from .snapshot import start_worker
+from . import detail, notes, suggest
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def variant_price_summary(sender, instance, **kwargs):
+    # Keep Product.min_price / max_price / has_discount / in_stock in sync
+    Product.objects.refresh_price_summary([instance.product_id])
+
+@receiver(post_save, sender=Product)
+def product_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_products([instance.id])
+
+@receiver(post_save, sender=ProductNote)
+@receiver(post_delete, sender=ProductNote)
+def note_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_products([instance.product_id])
+
+@receiver(m2m_changed, sender=Product.fragrance_families.through)
+def families_search_index(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Remember which products lose this family before the links disappear
+        instance._cleared_product_ids = list(instance.product_set.values_list('id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        index_products([instance.pk])
+    elif action == 'post_clear':
+        index_products(getattr(instance, '_cleared_product_ids', []))
+    else:
+        index_products(pk_set)
+
+@receiver(post_save, sender=Brand)
+def brand_search_index(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        index_products(instance.product_set.values_list('id', flat=True))
+
+@receiver(post_save, sender=FragranceFamily)
+def family_search_index(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        index_products(instance.product_set.values_list('id', flat=True))
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductNote)
+@receiver(post_delete, sender=ProductNote)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=FragranceFamily)
+@receiver(post_delete, sender=FragranceFamily)
+def catalogue_changed(sender, **kwargs):
+    # Invalidates cached facet counts and catalogue responses
+    bump_generation_on_commit()
+
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductNote)
+@receiver(post_delete, sender=ProductNote)
+def touch_product(sender, instance, raw=False, **kwargs):
+    # Rows without their own updated_at (or gone) move the product's Last-Modified
+    if not raw:
+        Product.objects.filter(id=instance.product_id).update(updated_at=timezone.now())
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=Product.fragrance_families.through)
+def catalogue_links_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_generation_on_commit()
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_detail_changed(sender, instance, **kwargs):
+    detail.invalidate([instance.id])
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductNote)
+@receiver(post_delete, sender=ProductNote)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def child_detail_changed(sender, instance, **kwargs):
+    detail.invalidate([instance.product_id])
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=Product.fragrance_families.through)
+def links_detail_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        detail.invalidate(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear':
+        detail.invalidate(instance.product_set.values_list('id', flat=True) if reverse else [instance.pk])
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=FragranceFamily)
+@receiver(post_delete, sender=FragranceFamily)
+def shared_detail_changed(sender, **kwargs):
+    # Nested in every product page
+    detail.invalidate_all()
+
+@receiver(pre_save, sender=ProductNote)
+def note_term(sender, instance, raw=False, **kwargs):
+    # The vocabulary entry follows the spelling (products.notes)
+    if not raw:
+        instance.term_id = notes.term_ids([instance.name_ar])[instance.name_ar]
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductNote)
+@receiver(post_delete, sender=ProductNote)
+def note_index_changed(sender, **kwargs):
+    bump_generation_on_commit(notes.NAMESPACE)
+
+@receiver(post_save, sender=ScentNote)
+@receiver(post_delete, sender=ScentNote)
+@receiver(post_save, sender=ScentNoteAlias)
+@receiver(post_delete, sender=ScentNoteAlias)
+def note_vocabulary_changed(sender, **kwargs):
+    notes.changed()
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ScentNote)
+@receiver(post_delete, sender=ScentNote)
+def suggestions_changed(sender, instance, raw=False, **kwargs):
+    # Replayed into every worker's typeahead index (products.suggest)
+    if not raw:
+        kind = {Product: 'product', Brand: 'brand', Category: 'category', ScentNote: 'note'}[sender]
+        suggest.changed(kind, [instance.pk])
+
+@receiver(post_save, sender=ProductNote)
+@receiver(post_delete, sender=ProductNote)
+def note_suggestions_changed(sender, instance, raw=False, **kwargs):
+    # A note is only suggested while an active product uses it
+    if not raw and instance.term_id:
+        suggest.changed('note', [instance.term_id])
+
+def mark_related_dirty(product_ids):
+    # update() rather than save() so no further signals fire
+    Product.objects.filter(id__in=product_ids).update(related_dirty=True)
+
+@receiver(post_save, sender=Product)
+def product_related_dirty(sender, instance, raw=False, **kwargs):
+    if not raw:
+        mark_related_dirty([instance.id])
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductNote)
+@receiver(post_delete, sender=ProductNote)
+def child_related_dirty(sender, instance, raw=False, **kwargs):
+    if not raw:
+        mark_related_dirty([instance.product_id])
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=Product.fragrance_families.through)
+def links_related_dirty(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        mark_related_dirty(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear':
+        mark_related_dirty(instance.product_set.values_list('id', flat=True) if reverse else [instance.pk])
+
+for model in (Category, Brand, Product, ProductVariant, ProductImage):
+    # Responsive derivatives are built off-request (products.images)
+    post_save.connect(image_fields_changed, sender=model, dispatch_uid=f'image-derivatives-{model.__name__}')
+    post_delete.connect(image_fields_deleted, sender=model, dispatch_uid=f'image-derivatives-delete-{model.__name__}')
+
+# Buffered view counts are written after a response has gone out
+request_finished.connect(flush_if_due, dispatch_uid='product-view-counts')
+# The static catalogue snapshot is rebuilt by a background thread
+request_finished.connect(start_worker, dispatch_uid='catalogue-snapshot')
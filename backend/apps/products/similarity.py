@@ -0,0 +1,239 @@
+"""
+Offline related-products engine.
+
+Every active product becomes a row of a feature matrix (gender, brand,
+categories, fragrance families and normalized note names), with each
+column scaled by the square root of its weight so that the dot product of
+two rows is the weighted count of what they share. Scores are computed in
+row blocks as ``X[block] @ X.T`` plus a co-purchase term from
+``OrderItem``, and the top-K neighbours per product are stored in
+``RelatedProduct``.
+"""
+import math
+import time
+from collections import Counter, defaultdict
+from itertools import combinations
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from .cache import bump_generation_on_commit
+from .models import Product, ProductNote, RelatedProduct
+from .search import normalize
+
+WEIGHTS = {
+    'gender': 3.0,
+    'brand': 2.0,
+    'category': 1.0,
+    'family': 1.5,
+    'note': 1.0,
+    'copurchase': 2.0,
+}
+BLOCK_SIZE = 256
+# Stay under SQLite's bound-parameter limit for id__in lookups
+ID_CHUNK = 900
+
+
+def top_k():
+    return getattr(settings, 'RELATED_PRODUCTS_TOP_K', 12)
+
+
+class CatalogueFeatures:
+    def __init__(self, product_ids, matrix, copurchase):
+        self.product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.position = {product_id: i for i, product_id in enumerate(product_ids)}
+        self.matrix = matrix
+        # Symmetric co-purchase entries as parallel (row, column, score) arrays
+        self.copurchase = copurchase
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    @classmethod
+    def load(cls):
+        # Newest first, so equal scores favour newer products like the old query did
+        rows = list(Product.objects.filter(is_active=True).order_by('-created_at', '-id').values_list('id', 'brand_id', 'gender'))
+        product_ids = [row[0] for row in rows]
+        position = {product_id: i for i, product_id in enumerate(product_ids)}
+
+        cells = set()
+        columns = {}
+
+        def add(product_id, kind, key):
+            i = position.get(product_id)
+            if i is not None:
+                cells.add((i, columns.setdefault((kind, key), len(columns))))
+
+        for product_id, brand_id, gender in rows:
+            add(product_id, 'gender', gender)
+            add(product_id, 'brand', brand_id)
+        for product_id, category_id in Product.categories.through.objects.values_list('product_id', 'category_id'):
+            add(product_id, 'category', category_id)
+        for product_id, family_id in Product.fragrance_families.through.objects.values_list('product_id', 'fragrancefamily_id'):
+            add(product_id, 'family', family_id)
+        for product_id, name in ProductNote.objects.values_list('product_id', 'name_ar'):
+            add(product_id, 'note', normalize(name).strip())
+
+        matrix = np.zeros((len(product_ids), max(len(columns), 1)), dtype=np.float32)
+        if cells:
+            cell_rows, cell_columns = np.array(sorted(cells), dtype=np.int64).T
+            column_weights = np.zeros(len(columns), dtype=np.float32)
+            for (kind, _), column in columns.items():
+                column_weights[column] = math.sqrt(WEIGHTS[kind])
+            matrix[cell_rows, cell_columns] = column_weights[cell_columns]
+
+        return cls(product_ids, matrix, cls._load_copurchase(position))
+
+    @staticmethod
+    def _load_copurchase(position):
+        from orders.models import OrderItem
+
+        baskets = defaultdict(set)
+        for order_id, product_id in OrderItem.objects.values_list('order_id', 'variant__product_id'):
+            if product_id in position:
+                baskets[order_id].add(position[product_id])
+        pairs = Counter()
+        for basket in baskets.values():
+            for a, b in combinations(sorted(basket), 2):
+                pairs[(a, b)] += 1
+
+        entries = [(a, b, count) for (a, b), count in pairs.items()] + [(b, a, count) for (a, b), count in pairs.items()]
+        if not entries:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32)
+        cp_rows, cp_columns, counts = (np.array(values) for values in zip(*entries))
+        return cp_rows.astype(np.int64), cp_columns.astype(np.int64), (WEIGHTS['copurchase'] * np.log1p(counts)).astype(np.float32)
+
+    def scores(self, positions):
+        """Score matrix of shape (len(positions), len(self)); self-matches are -inf."""
+        positions = np.asarray(positions, dtype=np.int64)
+        block = self.matrix[positions] @ self.matrix.T
+
+        cp_rows, cp_columns, cp_scores = self.copurchase
+        if len(cp_rows):
+            block_row = np.full(len(self), -1, dtype=np.int64)
+            block_row[positions] = np.arange(len(positions))
+            selected = block_row[cp_rows] >= 0
+            block[block_row[cp_rows[selected]], cp_columns[selected]] += cp_scores[selected]
+
+        block[np.arange(len(positions)), positions] = -np.inf
+        return block
+
+    def neighbours(self, positions, k):
+        """Yield (product_id, [(related_id, score), ...]) best first."""
+        for start in range(0, len(positions), BLOCK_SIZE):
+            chunk = positions[start:start + BLOCK_SIZE]
+            block = self.scores(chunk)
+            kk = min(k, len(self) - 1)
+            if kk <= 0:
+                for position in chunk:
+                    yield int(self.product_ids[position]), []
+                continue
+            candidates = np.argpartition(block, -kk, axis=1)[:, -kk:]
+            candidate_scores = np.take_along_axis(block, candidates, axis=1)
+            order = np.lexsort((candidates, -candidate_scores), axis=1)
+            candidates = np.take_along_axis(candidates, order, axis=1)
+            candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+            for row, position in enumerate(chunk):
+                yield int(self.product_ids[position]), [
+                    (int(self.product_ids[column]), float(score))
+                    for column, score in zip(candidates[row], candidate_scores[row])
+                    if score > 0
+                ]
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), ID_CHUNK):
+        yield ids[start:start + ID_CHUNK]
+
+
+def _write(neighbours, batch_size=5000):
+    # executemany sidesteps bulk_create's per-statement parameter cap on SQLite
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in ('product_id', 'related_id', 'score', 'rank'))
+    sql = f'INSERT INTO {quote(RelatedProduct._meta.db_table)} ({columns}) VALUES (%s, %s, %s, %s)'
+    rows = []
+    written = 0
+    with connection.cursor() as cursor:
+        for product_id, related in neighbours:
+            rows.extend((product_id, related_id, score, rank) for rank, (related_id, score) in enumerate(related))
+            if len(rows) >= batch_size:
+                cursor.executemany(sql, rows)
+                written += len(rows)
+                rows = []
+        if rows:
+            cursor.executemany(sql, rows)
+            written += len(rows)
+    return written
+
+
+def rebuild(k=None):
+    """Recompute the whole table; returns per-phase timings (seconds) and row counts."""
+    k = k or top_k()
+    timings = {}
+    # Only clear flags raised before loading; later changes wait for the next refresh
+    dirty = list(Product.objects.filter(related_dirty=True).values_list('id', flat=True))
+    started = time.perf_counter()
+    features = CatalogueFeatures.load()
+    timings['load'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    neighbours = list(features.neighbours(np.arange(len(features)), k))
+    timings['score'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        timings['links'] = _write(neighbours)
+        for chunk in _chunks(dirty):
+            Product.objects.filter(id__in=chunk).update(related_dirty=False)
+        bump_generation_on_commit()
+    timings['write'] = time.perf_counter() - started
+    timings['products'] = len(features)
+    return timings
+
+
+def refresh(product_ids=None, k=None):
+    """
+    Recompute neighbours for changed products (default: those flagged
+    ``related_dirty``) plus every product whose top-K list they now enter
+    or leave. Returns the number of products whose list was rewritten.
+    """
+    k = k or top_k()
+    if product_ids is None:
+        product_ids = list(Product.objects.filter(related_dirty=True).values_list('id', flat=True))
+    changed = set(product_ids)
+    if not changed:
+        return 0
+
+    features = CatalogueFeatures.load()
+    changed_positions = np.array(sorted(features.position[p] for p in changed if p in features.position), dtype=np.int64)
+
+    # Products that currently list a changed (possibly now inactive) product must be redone
+    affected = set()
+    for chunk in _chunks(changed):
+        affected.update(RelatedProduct.objects.filter(related_id__in=chunk).values_list('product_id', flat=True))
+    if len(changed_positions):
+        # ... and so must products a changed product now outscores the K-th neighbour of
+        threshold = np.zeros(len(features), dtype=np.float32)
+        for row in RelatedProduct.objects.values('product_id').annotate(n=Count('id'), lowest=Min('score')).filter(n__gte=k):
+            position = features.position.get(row['product_id'])
+            if position is not None:
+                threshold[position] = row['lowest']
+        best = np.full(len(features), -np.inf, dtype=np.float32)
+        for start in range(0, len(changed_positions), BLOCK_SIZE):
+            best = np.maximum(best, features.scores(changed_positions[start:start + BLOCK_SIZE]).max(axis=0))
+        affected.update(int(p) for p in features.product_ids[best > threshold])
+
+    targets = changed | affected
+    positions = np.array(sorted(features.position[p] for p in targets if p in features.position), dtype=np.int64)
+    with transaction.atomic():
+        for chunk in _chunks(targets):
+            RelatedProduct.objects.filter(product_id__in=chunk).delete()
+        for chunk in _chunks(changed - set(features.position)):
+            RelatedProduct.objects.filter(related_id__in=chunk).delete()
+        _write(features.neighbours(positions, k))
+        for chunk in _chunks(changed):
+            Product.objects.filter(id__in=chunk).update(related_dirty=False)
+        bump_generation_on_commit()
+    return len(targets)
@@ -0,0 +1,309 @@
+"""
+Precompressed static catalogue snapshot.
+
+The active catalogue is small enough to ship whole, so the storefront can
+load it once and browse, filter and sort in the browser. ``build`` writes
+every active product (card fields, category/brand/family ids, notes and
+active variants with ``current_price``) together with the categories,
+brands and families they reference as one compact JSON document. Long
+texts (description, story) stay on the detail endpoint.
+
+Files are content-addressed: ``catalogue/snapshot.<hash>.json`` plus
+``.json.gz`` and, when the ``brotli`` package is installed, ``.json.br``,
+compressed once at build time. ``current.json``
+names the live version and is replaced last, so readers never see a
+half-written set; the previous ``CATALOGUE_SNAPSHOT_KEEP`` versions stay
+for clients that are still downloading them. Identical content hashes to
+the same name, so rebuilding an unchanged catalogue writes nothing new.
+
+``/api/products/snapshot/`` redirects to the current version, which is
+served with an immutable cache lifetime in the best encoding the client
+accepts. The snapshot is derived data; the API stays the source of truth.
+
+Rebuilds are debounced on the catalogue generation (products.cache) and
+happen off-request. Each build records the generation it read under
+``CHECKED_KEY``. A daemon thread per process, started after the first
+response, checks every ``CATALOGUE_SNAPSHOT_POLL_INTERVAL`` seconds
+(default 10) whether the generation has moved past it. It rebuilds once
+the generation has been quiet for ``CATALOGUE_SNAPSHOT_DELAY`` seconds,
+or ``CATALOGUE_SNAPSHOT_MAX_DELAY`` after the first change at the latest.
+The debounce state lives in the cache, and a ``cache.add`` lock lets one
+process build each generation while the others skip it. Whether the
+snapshot is stale is decided by its content hash, not by comparing
+generations, so a process whose cache holds another generation (a
+per-process cache, an evicted counter) rebuilds once, gets the same
+version and stops. Hosts that would
+rather not run the thread set ``CATALOGUE_SNAPSHOT_ASYNC = False`` and
+call ``build_catalogue_snapshot --if-due`` from cron. Only an existing
+snapshot is kept fresh; ``build_catalogue_snapshot`` creates the first
+one (and rebuilds on demand).
+"""
+import gzip
+import hashlib
+import json
+import logging
+import posixpath
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from .cache import get_generation
+from .models import Category, Brand, FragranceFamily, Product, ProductVariant, ProductNote
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = 'catalogue'
+CURRENT = posixpath.join(DIRECTORY, 'current.json')
+# Preferred first; identity is always available
+SUFFIXES = {'br': '.br', 'gzip': '.gz', 'identity': ''}
+
+# Shared by every process through the cache
+PENDING_KEY = 'catalogue:snapshot-pending'
+LOCK_KEY = 'catalogue:snapshot-lock'
+CHECKED_KEY = 'catalogue:snapshot-checked'
+
+_lock = threading.Lock()
+_worker = None
+
+
+def delay():
+    return getattr(settings, 'CATALOGUE_SNAPSHOT_DELAY', 30)
+
+
+def max_delay():
+    return getattr(settings, 'CATALOGUE_SNAPSHOT_MAX_DELAY', 300)
+
+
+def enabled():
+    return getattr(settings, 'CATALOGUE_SNAPSHOT_ASYNC', True)
+
+
+def _url(name):
+    return default_storage.url(name) if name else None
+
+
+def payload():
+    """The snapshot document: active products plus the categories, brands and families they use."""
+    products = list(Product.objects.filter(is_active=True).order_by('id').values(
+        'id', 'slug', 'name_ar', 'brand_id', 'gender', 'occasion', 'vibe', 'main_image',
+        'is_featured', 'is_bestseller', 'is_new', 'min_price', 'max_price', 'has_discount', 'in_stock',
+        'view_count', 'sales_count', 'created_at',
+    ))
+    links = {'categories': defaultdict(list), 'fragrance_families': defaultdict(list)}
+    for product_id, category_id in Product.categories.through.objects.filter(
+        product__is_active=True
+    ).order_by('product_id', 'category_id').values_list('product_id', 'category_id'):
+        links['categories'][product_id].append(category_id)
+    for product_id, family_id in Product.fragrance_families.through.objects.filter(
+        product__is_active=True
+    ).order_by('product_id', 'fragrancefamily_id').values_list('product_id', 'fragrancefamily_id'):
+        links['fragrance_families'][product_id].append(family_id)
+
+    variants = defaultdict(list)
+    for variant in ProductVariant.objects.filter(is_active=True, product__is_active=True).order_by('product_id', 'id').values(
+        'id', 'product_id', 'name', 'size_ml', 'sku', 'price', 'sale_price', 'stock_quantity', 'image',
+    ):
+        product_id = variant.pop('product_id')
+        # Same rule as ProductVariant.current_price
+        variant['current_price'] = variant['sale_price'] or variant['price']
+        variant['image'] = _url(variant['image'])
+        variants[product_id].append(variant)
+
+    notes = defaultdict(list)
+    for note in ProductNote.objects.filter(product__is_active=True).order_by('product_id', 'id').values(
+        'product_id', 'note_type', 'name_ar', 'icon',
+    ):
+        notes[note.pop('product_id')].append(note)
+
+    for product in products:
+        product['brand'] = product.pop('brand_id')
+        product['main_image'] = _url(product['main_image'])
+        product['categories'] = links['categories'][product['id']]
+        product['fragrance_families'] = links['fragrance_families'][product['id']]
+        product['notes'] = notes[product['id']]
+        product['variants'] = variants[product['id']]
+
+    categories = Category.objects.filter(Q(is_active=True) | Q(product__is_active=True)).distinct().order_by('order', 'id')
+    brands = Brand.objects.filter(Q(is_active=True) | Q(product__is_active=True)).distinct().order_by('id')
+    return {
+        'categories': [
+            {**row, 'image': _url(row['image'])}
+            for row in categories.values('id', 'name_ar', 'slug', 'image', 'order')
+        ],
+        'brands': [
+            {**row, 'logo': _url(row['logo'])}
+            for row in brands.values('id', 'name_ar', 'slug', 'logo')
+        ],
+        'fragrance_families': list(FragranceFamily.objects.order_by('id').values('id', 'name_ar', 'icon', 'color')),
+        'products': products,
+    }
+
+
+def encode(document):
+    """``(version, {encoding: bytes})`` for a snapshot document."""
+    body = json.dumps(document, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    encoded = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        # 10-11 shave another ~15% but take a minute on a 20k-product catalogue
+        encoded['br'] = brotli.compress(body, quality=9)
+    return hashlib.sha256(body).hexdigest()[:16], encoded
+
+
+def version_name(version, encoding='identity'):
+    return posixpath.join(DIRECTORY, f'snapshot.{version}.json{SUFFIXES[encoding]}')
+
+
+def current(storage=None):
+    """The live manifest, or None before the first build."""
+    storage = storage or default_storage
+    try:
+        with storage.open(CURRENT) as fh:
+            return json.loads(fh.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _replace(storage, name, content):
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def _prune(storage, live, keep):
+    try:
+        _, files = storage.listdir(DIRECTORY)
+    except (OSError, NotImplementedError):
+        return
+    by_version = defaultdict(list)
+    for filename in files:
+        if filename.startswith('snapshot.'):
+            by_version[filename.split('.')[1]].append(filename)
+    older = sorted(
+        (version for version in by_version if version != live),
+        key=lambda version: storage.get_modified_time(posixpath.join(DIRECTORY, by_version[version][0])),
+        reverse=True,
+    )
+    for version in older[keep:]:
+        for filename in by_version[version]:
+            storage.delete(posixpath.join(DIRECTORY, filename))
+
+
+def build(storage=None):
+    """Write the snapshot and point ``current.json`` at it; returns the manifest."""
+    storage = storage or default_storage
+    # Read first: a change made while building leaves the snapshot stale
+    generation = get_generation()
+    document = payload()
+    version, encoded = encode(document)
+    for encoding, content in encoded.items():
+        name = version_name(version, encoding)
+        if not storage.exists(name):
+            storage.save(name, ContentFile(content))
+
+    manifest = {
+        'version': version,
+        'built_at': timezone.now().isoformat(),
+        'products': len(document['products']),
+        'sizes': {encoding: len(content) for encoding, content in encoded.items()},
+    }
+    _replace(storage, CURRENT, json.dumps(manifest).encode())
+    _prune(storage, version, getattr(settings, 'CATALOGUE_SNAPSHOT_KEEP', 2))
+    cache.set(CHECKED_KEY, generation, timeout=None)
+    return manifest
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def open_version(version, accept_encoding='', storage=None):
+    """``(file, encoding)`` of the best stored encoding for the client, or None for an unknown version."""
+    storage = storage or default_storage
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in SUFFIXES:
+        if encoding != 'identity' and encoding not in accepted and '*' not in accepted:
+            continue
+        try:
+            return storage.open(version_name(version, encoding), 'rb'), encoding
+        except OSError:
+            continue
+    return None
+
+
+def rebuild_if_due():
+    """Rebuild when the catalogue has moved on and settled; the new manifest, or None."""
+    if current() is None:
+        return None
+    generation = get_generation()
+    if cache.get(CHECKED_KEY) == generation:
+        return None
+
+    now = time.time()
+    pending = cache.get(PENDING_KEY) or {}
+    if pending.get('generation') != generation:
+        # Every further change restarts the quiet period
+        pending = {'generation': generation, 'quiet_since': now, 'stale_since': pending.get('stale_since', now)}
+        cache.set(PENDING_KEY, pending, timeout=None)
+    if now - pending['quiet_since'] < delay() and now - pending['stale_since'] < max_delay():
+        return None
+
+    if not cache.add(LOCK_KEY, generation, timeout=getattr(settings, 'CATALOGUE_SNAPSHOT_LOCK_TIMEOUT', 600)):
+        return None
+    try:
+        if cache.get(CHECKED_KEY) == generation:
+            # Another process built it between the first read and the lock
+            return None
+        live = (current() or {}).get('version')
+        manifest = build()
+        cache.delete(PENDING_KEY)
+        # Same content, e.g. a change the snapshot does not hold
+        return manifest if manifest['version'] != live else None
+    except Exception:
+        logger.exception('Catalogue snapshot rebuild failed')
+        # Retried after another quiet period
+        cache.set(PENDING_KEY, {**pending, 'quiet_since': time.time()}, timeout=None)
+        return None
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def _run():
+    while True:
+        time.sleep(getattr(settings, 'CATALOGUE_SNAPSHOT_POLL_INTERVAL', 10))
+        if not enabled():
+            continue
+        try:
+            rebuild_if_due()
+        except Exception:
+            logger.exception('Catalogue snapshot check failed')
+        finally:
+            close_old_connections()
+
+
+def start_worker(**kwargs):
+    """request_finished receiver: make sure this process runs the rebuild thread; no I/O."""
+    global _worker
+    if not enabled() or (_worker is not None and _worker.is_alive()):
+        return
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='catalogue-snapshot', daemon=True)
+            _worker.start()
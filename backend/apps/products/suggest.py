@@ -0,0 +1,284 @@
+"""
+In-process typeahead suggestions for the storefront search box.
+
+Product, brand, category and scent-note names are normalized with the
+search tokenizer (products.search), and every suffix that starts at a
+word boundary becomes a key, so "ملك" finds "عود ملكي". The keys sit in
+one sorted list. A prefix is a ``bisect`` range over it, and the entry
+behind each key is a position in ``owners``. Ranking uses ``weight``:
+``SUGGEST_SALES_WEIGHT`` (default 10) per sale plus one per view. Brands,
+categories and notes carry the total weight of their active products.
+
+Ranking a short range is a scan. A prefix shared by more than
+``SCAN_LIMIT`` keys ("ع") gets its best ``TOP_K`` entries computed at
+build time. Those heavy ranges are disjoint at every depth, so there are
+at most ``len(keys) / SCAN_LIMIT`` of them per character. A lookup is
+therefore two bisects plus at most ``SCAN_LIMIT`` comparisons, whatever
+the catalogue size. Memory is bounded by ``MAX_TOKENS`` keys per entry
+of at most ``KEY_LENGTH`` characters; ``benchmark_suggest`` reports it.
+
+Each worker builds its own ``Suggester``. Catalogue signals append
+``(kind, ids)`` to a change log in the cache after commit. Before
+answering, a worker replays the entries it has not seen into a small
+overlay, so a rename or deactivation shows up on the next keystroke
+without a rebuild. A full rebuild, in a background thread by default,
+happens when the overlay passes ``SUGGEST_MAX_OVERLAY``, when the log
+has a gap, or every ``SUGGEST_REBUILD_INTERVAL`` seconds, which picks
+up drifting sales and view counts.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q, Sum
+from .models import Brand, Category, Product, ScentNote
+from .search import ARTICLE_PREFIXES, tokenize
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('product', 'brand', 'category', 'note')
+SCAN_LIMIT = 256
+TOP_K = 32
+MAX_TOKENS = 6
+KEY_LENGTH = 48
+SEQ_KEY = 'suggest:seq'
+CHANGE_KEY = 'suggest:change:{seq}'
+# Rebuild everything rather than replaying (bulk imports)
+ALL = '*'
+
+Entry = namedtuple('Entry', 'kind id label slug image weight')
+
+_lock = threading.Lock()
+_current = None
+_rebuilding = False
+
+
+def index_keys(label):
+    tokens = tokenize(label)[:MAX_TOKENS]
+    return list(dict.fromkeys(' '.join(tokens[i:])[:KEY_LENGTH] for i in range(len(tokens))))
+
+
+def _successor(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def query_prefixes(query):
+    """Normalized prefixes to look up; a half-typed article ("الع") is tried without it too."""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    prefixes = [' '.join(tokens)]
+    last = query.split()[-1] if query.split() else ''
+    raw = tokenize(last)
+    if raw and raw[-1] == tokens[-1]:
+        for article in ARTICLE_PREFIXES:
+            if raw[-1].startswith(article) and len(raw[-1]) > len(article):
+                prefixes.append(' '.join(tokens[:-1] + [raw[-1][len(article):]]))
+                break
+    return list(dict.fromkeys(prefixes))
+
+
+class Suggester:
+    def __init__(self, entries, seq=0):
+        self.entries = list(entries)
+        self.seq = seq
+        self.built_at = time.monotonic()
+        pairs = sorted((key, position) for position, entry in enumerate(self.entries) for key in index_keys(entry.label))
+        self.keys = [key for key, _ in pairs]
+        self.owners = np.fromiter((position for _, position in pairs), dtype=np.int32, count=len(pairs))
+        self.weights = np.fromiter((entry.weight for entry in self.entries), dtype=np.float64, count=len(self.entries))
+        # (kind, id) -> (replacement Entry or None once removed, its keys); replaced, never mutated
+        self.overlay = {}
+        self.top = {}
+        self._precompute(0, len(self.keys), '')
+
+    def _best(self, lo, hi, k):
+        owners = np.unique(self.owners[lo:hi])
+        if len(owners) > k:
+            owners = owners[np.argpartition(-self.weights[owners], k - 1)[:k]]
+        # Stable on ties: heavier first, then catalogue order
+        return tuple(owners[np.lexsort((owners, -self.weights[owners]))].tolist())
+
+    def _precompute(self, lo, hi, prefix):
+        # Iterative; prefixes can run KEY_LENGTH deep
+        stack = [(lo, hi, prefix)]
+        while stack:
+            lo, hi, prefix = stack.pop()
+            if hi - lo <= SCAN_LIMIT:
+                continue
+            if prefix:
+                self.top[prefix] = self._best(lo, hi, TOP_K)
+            depth = len(prefix)
+            i = lo
+            while i < hi:
+                key = self.keys[i]
+                if len(key) <= depth:
+                    i += 1
+                    continue
+                child = key[:depth + 1]
+                j = bisect.bisect_left(self.keys, _successor(child), i, hi)
+                stack.append((i, j, child))
+                i = j
+
+    def _base(self, prefix, limit):
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, _successor(prefix), lo)
+        if hi - lo > SCAN_LIMIT:
+            return self.top.get(prefix, ())
+        return self._best(lo, hi, limit) if hi > lo else ()
+
+    def search(self, query, limit=8):
+        overlay = self.overlay
+        found = {}
+        for prefix in query_prefixes(query):
+            for position in self._base(prefix, limit + len(overlay)):
+                entry = self.entries[position]
+                if (entry.kind, entry.id) not in overlay:
+                    found.setdefault((entry.kind, entry.id), entry)
+            for key, (entry, keys) in overlay.items():
+                if entry is not None and any(k.startswith(prefix) for k in keys):
+                    found.setdefault(key, entry)
+        return sorted(found.values(), key=lambda entry: -entry.weight)[:limit]
+
+    def apply(self, kind, entries, ids):
+        """Overlay fresh rows for ``ids`` of ``kind``; ids missing from ``entries`` are removed."""
+        fresh = {entry.id: entry for entry in entries}
+        overlay = dict(self.overlay)
+        for entry_id in ids:
+            entry = fresh.get(entry_id)
+            overlay[(kind, entry_id)] = (entry, index_keys(entry.label) if entry else [])
+        # Swapped in whole for lock-free readers
+        self.overlay = overlay
+
+
+def sales_weight():
+    return getattr(settings, 'SUGGEST_SALES_WEIGHT', 10)
+
+
+def load_entries(kind, ids=None):
+    """Entries of one kind, all of them or only ``ids``; inactive rows are left out."""
+    if kind == 'product':
+        qs = Product.objects.filter(is_active=True)
+        rows = qs.filter(id__in=ids) if ids is not None else qs
+        return [
+            Entry('product', product_id, name, slug, default_storage.url(image) if image else None, sales * sales_weight() + views)
+            for product_id, name, slug, image, sales, views in rows.values_list('id', 'name_ar', 'slug', 'main_image', 'sales_count', 'view_count')
+        ]
+
+    if kind == 'brand':
+        qs, path = Brand.objects.filter(is_active=True), 'product__'
+    elif kind == 'category':
+        qs, path = Category.objects.filter(is_active=True), 'product__'
+    else:
+        qs, path = ScentNote.objects.filter(product_notes__product__is_active=True), 'product_notes__product__'
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    weight = Sum(F(f'{path}sales_count') * sales_weight() + F(f'{path}view_count'), filter=Q(**{f'{path}is_active': True}))
+    rows = qs.annotate(weight=weight).values_list('id', 'name_ar', 'slug', 'weight')
+    return [Entry(kind, row_id, name, slug, None, weight or 0) for row_id, name, slug, weight in rows]
+
+
+def build(seq=None):
+    seq = current_seq() if seq is None else seq
+    return Suggester([entry for kind in KINDS for entry in load_entries(kind)], seq)
+
+
+def current_seq():
+    return cache.get(SEQ_KEY, 0)
+
+
+def changed(kind, ids):
+    """Log a change for every worker's index once the transaction commits."""
+    ids = list(ids)
+
+    def write():
+        cache.add(SEQ_KEY, 0, timeout=None)
+        try:
+            seq = cache.incr(SEQ_KEY)
+        except ValueError:
+            seq = 1
+            cache.set(SEQ_KEY, seq, timeout=None)
+        cache.set(CHANGE_KEY.format(seq=seq), (kind, ids), getattr(settings, 'SUGGEST_LOG_TIMEOUT', 86400))
+
+    transaction.on_commit(write)
+
+
+def changed_all():
+    changed(ALL, [])
+
+
+def _replay(suggester, seq):
+    """Apply logged changes up to ``seq``; False when a full rebuild is needed instead."""
+    if seq < suggester.seq or seq - suggester.seq > getattr(settings, 'SUGGEST_MAX_OVERLAY', 500):
+        return False
+    logged = cache.get_many([CHANGE_KEY.format(seq=n) for n in range(suggester.seq + 1, seq + 1)])
+    if len(logged) != seq - suggester.seq:
+        return False
+    pending = {}
+    for n in range(suggester.seq + 1, seq + 1):
+        kind, ids = logged[CHANGE_KEY.format(seq=n)]
+        if kind == ALL:
+            return False
+        pending.setdefault(kind, set()).update(ids)
+    for kind, ids in pending.items():
+        suggester.apply(kind, load_entries(kind, ids), ids)
+    suggester.seq = seq
+    return len(suggester.overlay) <= getattr(settings, 'SUGGEST_MAX_OVERLAY', 500)
+
+
+def _rebuild():
+    global _current, _rebuilding
+    try:
+        fresh = build()
+        with _lock:
+            _current = fresh
+    except Exception:
+        logger.exception('Suggestion index rebuild failed')
+    finally:
+        _rebuilding = False
+
+
+def _schedule_rebuild():
+    global _rebuilding
+    if not getattr(settings, 'SUGGEST_REBUILD_ASYNC', True):
+        _rebuild()
+        return
+    if _rebuilding:
+        return
+    _rebuilding = True
+
+    def run():
+        try:
+            _rebuild()
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=run, name='suggest-rebuild', daemon=True).start()
+
+
+def get_suggester():
+    global _current
+    seq = current_seq()
+    with _lock:
+        suggester = _current
+        if suggester is None:
+            suggester = _current = build(seq)
+            return suggester
+        if seq != suggester.seq and not _replay(suggester, seq):
+            stale = True
+        else:
+            stale = time.monotonic() - suggester.built_at > getattr(settings, 'SUGGEST_REBUILD_INTERVAL', 3600)
+    if stale:
+        # The current index keeps answering meanwhile
+        _schedule_rebuild()
+    return _current
+
+
+def serialize(entry):
+    return {'type': entry.kind, 'id': entry.id, 'label': entry.label, 'slug': entry.slug, 'image': entry.image}
@@ -1,8 +1,41 @@
 from django.urls import reverse
+import gzip
+import io
+import json
+from decimal import Decimal
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
-from .models import Category, Brand, Product, ProductVariant
+from .models import Category, Brand, FragranceFamily, Product, ProductVariant, ProductNote, ProductImage, ProductSearchDocument, ScentNote, ScentNoteAlias, RelatedProduct, ProductDailyViews
+from .search import tokenize
+from . import catalogue_io, counters, images, notes, query_budget, query_plans, similarity, snapshot, suggest
+
+
+def stop_view_counting():
+    # Buffered views and their timer outlive the test database; the exit
+    # flush would otherwise write them to the real one
+    counters._take()
+    with counters._lock:
+        if counters._timer is not None:
+            counters._timer.cancel()
+            counters._timer = None
+
+
+def tearDownModule():
+    stop_view_counting()
 
 class ProductTests(APITestCase):
     def setUp(self):
@@ -117,3 +150,1197 @@ class ProductTests(APITestCase):
         # Check if product is NOT in results
         results = [p['id'] for p in response.data['results']]
         self.assertNotIn(self.product.id, results)
+
+
+class ProductPriceSummaryTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name_ar='عطور', slug='perfumes')
+        self.brand = Brand.objects.create(name_ar='براند', slug='brand')
+        self.product = Product.objects.create(name_ar='عود', slug='oud', brand=self.brand, gender='men')
+        self.product.categories.add(self.category)
+        self.small = ProductVariant.objects.create(product=self.product, size_ml=50, price=80, sale_price=60, stock_quantity=0, sku='OUD-50')
+        self.large = ProductVariant.objects.create(product=self.product, size_ml=100, price=150, stock_quantity=3, sku='OUD-100')
+
+    def test_summary_follows_variant_changes(self):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.min_price, 60)
+        self.assertEqual(self.product.max_price, 150)
+        self.assertTrue(self.product.has_discount)
+        self.assertTrue(self.product.in_stock)
+
+        self.large.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.max_price, 60)
+        self.assertFalse(self.product.in_stock)
+
+        self.small.sale_price = 0
+        self.small.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.min_price, 80)
+        self.assertFalse(self.product.has_discount)
+
+        # Written without signals, as a bulk update would; 0 is still no sale
+        ProductVariant.objects.filter(id=self.small.id).update(sale_price=0)
+        Product.objects.refresh_price_summary([self.product.id])
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.min_price, self.product.has_discount), (80, False))
+
+    def test_inactive_variants_are_ignored(self):
+        self.small.is_active = False
+        self.small.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.min_price, 150)
+        self.assertFalse(self.product.has_discount)
+
+    def test_list_filters_on_price_columns(self):
+        cheap = Product.objects.create(name_ar='مسك', slug='musk', brand=self.brand, gender='women')
+        ProductVariant.objects.create(product=cheap, size_ml=30, price=20, stock_quantity=0, sku='MUSK-30')
+
+        url = reverse('product-public-list')
+        response = self.client.get(url, {'min_price__gte': 50})
+        self.assertEqual([p['slug'] for p in response.data['results']], ['oud'])
+
+        response = self.client.get(url, {'in_stock': 'true'})
+        self.assertEqual([p['slug'] for p in response.data['results']], ['oud'])
+
+        response = self.client.get(url, {'ordering': 'min_price'})
+        self.assertEqual([p['slug'] for p in response.data['results']], ['musk', 'oud'])
+        self.assertEqual(response.data['results'][0]['min_price'], 20)
+
+    def test_backfill_command(self):
+        Product.objects.update(min_price=None, max_price=None, has_discount=False, in_stock=False)
+        call_command('refresh_product_prices', stdout=open('/dev/null', 'w'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.min_price, 60)
+        self.assertTrue(self.product.in_stock)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        self.brand = Brand.objects.create(name_ar='العربية للعود', slug='arabian-oud')
+        self.legend = Product.objects.create(name_ar='أسطورة الشرق', slug='legend', brand=self.brand, gender='men', vibe='دافئ')
+        self.night = Product.objects.create(name_ar='ليلى', slug='layla', brand=Brand.objects.create(name_ar='مسك', slug='musk'), gender='women')
+        ProductNote.objects.create(product=self.night, note_type='base', name_ar='زعفران')
+        self.url = reverse('product-public-list')
+
+    def search(self, term):
+        response = self.client.get(self.url, {'search': term})
+        return [p['slug'] for p in response.data['results']]
+
+    def test_normalizer_folds_spelling_variants(self):
+        self.assertEqual(tokenize('أسطورةُ الإمارات'), tokenize('اسطوره امارات'))
+        self.assertEqual(tokenize('ليلى'), tokenize('ليلي'))
+        self.assertEqual(tokenize('العُود'), ['عود'])
+
+    def test_search_matches_variants_and_related_fields(self):
+        self.assertEqual(self.search('اسطوره'), ['legend'])
+        self.assertEqual(self.search('ليلي'), ['layla'])
+        self.assertEqual(self.search('العود'), ['legend'])
+        self.assertEqual(self.search('زعفران'), ['layla'])
+        self.assertEqual(self.search('غير موجود'), [])
+
+    def test_index_follows_catalogue_changes(self):
+        family = FragranceFamily.objects.create(name_ar='عنبر', icon='amber', color='#ffd700')
+        self.legend.fragrance_families.add(family)
+        self.assertEqual(self.search('عنبر'), ['legend'])
+
+        self.brand.name_ar = 'دار الكهرمان'
+        self.brand.save()
+        self.assertEqual(self.search('كهرمان'), ['legend'])
+
+        self.night.notes.all().delete()
+        self.assertEqual(self.search('زعفران'), [])
+
+    @override_settings(PRODUCT_SEARCH_MAX_RESULTS=1)
+    def test_filters_see_matches_below_the_rank_cap(self):
+        Product.objects.create(name_ar='عود الليل', slug='oud-night', brand=Brand.objects.get(slug='musk'), gender='men')
+        response = self.client.get(self.url, {'search': 'عود'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([p['slug'] for p in response.data['results']], ['oud-night', 'legend'])
+
+        response = self.client.get(self.url, {'search': 'عود', 'brand__slug': 'arabian-oud'})
+        self.assertEqual([p['slug'] for p in response.data['results']], ['legend'])
+        facets = self.client.get(reverse('product-public-facets'), {'search': 'عود'}).data
+        self.assertEqual(facets['total'], 2)
+
+    def test_rebuild_command(self):
+        ProductSearchDocument.objects.all().delete()
+        self.assertEqual(self.search('ليلى'), [])
+        call_command('rebuild_search_index', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.search('ليلى'), ['layla'])
+
+
+class ProductFacetTests(APITestCase):
+    def setUp(self):
+        self.oriental = Category.objects.create(name_ar='شرقي', slug='oriental')
+        self.floral = Category.objects.create(name_ar='زهري', slug='floral')
+        self.oud_brand = Brand.objects.create(name_ar='العود', slug='oud')
+        self.musk_brand = Brand.objects.create(name_ar='المسك', slug='musk')
+        self.amber = FragranceFamily.objects.create(name_ar='عنبر', icon='amber', color='#ffd700')
+        for slug, brand, category, gender, price in [
+            ('royal', self.oud_brand, self.oriental, 'men', 90),
+            ('night', self.oud_brand, self.oriental, 'unisex', 250),
+            ('rose', self.musk_brand, self.floral, 'women', 120),
+        ]:
+            product = Product.objects.create(name_ar=slug, slug=slug, brand=brand, gender=gender)
+            product.categories.add(category)
+            ProductVariant.objects.create(product=product, size_ml=50, price=price, stock_quantity=1, sku=f'{slug}-50')
+        Product.objects.get(slug='royal').fragrance_families.add(self.amber)
+        self.url = reverse('product-public-facets')
+
+    def counts(self, facet_list):
+        return {row['value']: row['count'] for row in facet_list}
+
+    def test_unfiltered_counts(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(self.counts(response.data['categories']), {'oriental': 2, 'floral': 1})
+        self.assertEqual(self.counts(response.data['gender']), {'men': 1, 'women': 1, 'unisex': 1})
+        self.assertEqual(self.counts(response.data['fragrance_families']), {self.amber.id: 1})
+        self.assertEqual([row['count'] for row in response.data['price']], [1, 1, 1, 0, 0])
+
+    def test_own_facet_is_excluded(self):
+        response = self.client.get(self.url, {'brand__slug': 'oud', 'gender': 'men'})
+        self.assertEqual(response.data['total'], 1)
+        # Brand counts ignore the brand filter but respect the gender filter
+        self.assertEqual(self.counts(response.data['brands']), {'oud': 1})
+        # Gender counts ignore the gender filter but respect the brand filter
+        self.assertEqual(self.counts(response.data['gender']), {'men': 1, 'women': 0, 'unisex': 1})
+        self.assertEqual(self.counts(response.data['categories']), {'oriental': 1})
+
+    def test_cached_counts_follow_catalogue_changes(self):
+        self.assertEqual(self.client.get(self.url, {'gender': 'women'}).data['total'], 1)
+        product = Product.objects.create(name_ar='ياسمين', slug='jasmine', brand=self.musk_brand, gender='women')
+        self.assertEqual(self.client.get(self.url, {'gender': 'women'}).data['total'], 2)
+        ProductVariant.objects.create(product=product, size_ml=30, price=600, stock_quantity=1, sku='jasmine-30')
+        self.assertEqual(self.client.get(self.url).data['price'][-1]['count'], 1)
+
+    def test_listing_params_share_the_cached_counts(self):
+        self.client.get(self.url, {'gender': 'women'})
+        params = {'gender': 'women', 'cursor': 'abc', 'fields': 'id,slug', 'expand': 'variants', 'total': '1'}
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.data['total'], 1)
+
+
+class RelatedProductTests(APITestCase):
+    def setUp(self):
+        self.brand = Brand.objects.create(name_ar='العود', slug='oud')
+        self.other_brand = Brand.objects.create(name_ar='المسك', slug='musk')
+        self.base = Product.objects.create(name_ar='أساسي', slug='base', brand=self.brand, gender='men')
+        self.same_brand = Product.objects.create(name_ar='نفس الماركة', slug='same-brand', brand=self.brand, gender='men')
+        self.same_notes = Product.objects.create(name_ar='نفس النوتات', slug='same-notes', brand=self.other_brand, gender='men')
+        self.unrelated = Product.objects.create(name_ar='مختلف', slug='unrelated', brand=Brand.objects.create(name_ar='أخرى', slug='other'), gender='women')
+        for product in (self.base, self.same_notes):
+            ProductNote.objects.create(product=product, note_type='base', name_ar='عود')
+            ProductNote.objects.create(product=product, note_type='top', name_ar='زعفران')
+            ProductNote.objects.create(product=product, note_type='heart', name_ar='ورد')
+
+    def related_slugs(self, product):
+        response = self.client.get(reverse('product-public-related', args=[product.slug]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p['slug'] for p in response.data]
+
+    def test_rebuild_ranks_by_shared_features(self):
+        stats = similarity.rebuild()
+        self.assertEqual(stats['products'], 4)
+        self.assertFalse(Product.objects.filter(related_dirty=True).exists())
+        # gender 3 + three shared notes 3 beats gender 3 + brand 2
+        self.assertEqual(self.related_slugs(self.base), ['same-notes', 'same-brand'])
+        # Nothing in common with the other products scores zero and is not stored
+        self.assertFalse(RelatedProduct.objects.filter(product=self.unrelated).exists())
+
+    def test_incremental_refresh_picks_up_changes(self):
+        similarity.rebuild()
+        self.same_brand.categories.add(Category.objects.create(name_ar='شرقي', slug='oriental'))
+        self.base.categories.add(Category.objects.get(slug='oriental'))
+        FragranceFamily.objects.create(name_ar='خشبي', icon='wood', color='#000000')
+        for family in FragranceFamily.objects.all():
+            self.base.fragrance_families.add(family)
+            self.same_brand.fragrance_families.add(family)
+        self.assertTrue(Product.objects.get(id=self.base.id).related_dirty)
+
+        similarity.refresh()
+        self.assertEqual(self.related_slugs(self.base), ['same-brand', 'same-notes'])
+        self.assertFalse(Product.objects.filter(related_dirty=True).exists())
+
+    def test_deactivated_product_leaves_neighbour_lists(self):
+        similarity.rebuild()
+        self.same_notes.is_active = False
+        self.same_notes.save()
+        similarity.refresh()
+        self.assertEqual(self.related_slugs(self.base), ['same-brand'])
+
+    def test_falls_back_to_live_scoring_before_first_build(self):
+        self.assertEqual(self.related_slugs(self.base)[0], 'same-brand')
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        brand = Brand.objects.create(name_ar='العود', slug='oud')
+        # 15 products, sales counts tied in threes, every fifth one without a price
+        for i in range(15):
+            product = Product.objects.create(name_ar=f'عطر {i}', slug=f'p{i}', brand=brand, gender='men', sales_count=i // 3)
+            if i % 5:
+                ProductVariant.objects.create(product=product, size_ml=50, price=100 + i % 4, stock_quantity=1, sku=f'p{i}-50')
+        self.url = reverse('product-public-list')
+
+    def walk(self, params):
+        slugs, pages = [], []
+        response = self.client.get(self.url, {**params, 'cursor': ''})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append(response.data)
+            slugs.extend(row['slug'] for row in response.data['results'])
+            if not response.data['next']:
+                return slugs, pages
+            response = self.client.get(response.data['next'])
+
+    def test_walks_every_ordering_without_gaps_or_duplicates(self):
+        for ordering, key in [
+            ('-created_at', lambda p: (-p.created_at.timestamp(), -p.id)),
+            ('sales_count', lambda p: (p.sales_count, p.id)),
+            ('-sales_count', lambda p: (-p.sales_count, -p.id)),
+            ('min_price', lambda p: (p.min_price is None, p.min_price or 0, p.id)),
+            ('-min_price', lambda p: (p.min_price is None, -(p.min_price or 0), -p.id)),
+        ]:
+            expected = [p.slug for p in sorted(Product.objects.all(), key=key)]
+            slugs, pages = self.walk({'ordering': ordering})
+            self.assertEqual(slugs, expected, ordering)
+            self.assertEqual(len(pages), 2)
+            self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_returns_the_earlier_page(self):
+        _, pages = self.walk({'ordering': 'min_price'})
+        response = self.client.get(pages[1]['previous'])
+        self.assertEqual(response.data['results'], pages[0]['results'])
+        self.assertIsNone(response.data['previous'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_total_only_when_requested(self):
+        response = self.client.get(self.url, {'cursor': '', 'total': '1', 'gender': 'men'})
+        self.assertEqual(response.data['count'], 15)
+
+    def test_page_numbers_remain_the_default(self):
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_or_mismatched_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        _, pages = self.walk({'ordering': 'sales_count'})
+        response = self.client.get(pages[0]['next'].replace('ordering=sales_count', 'ordering=min_price'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class CatalogueResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name_ar='شرقي', slug='oriental')
+        self.brand = Brand.objects.create(name_ar='العود', slug='oud')
+        self.product = Product.objects.create(name_ar='عود ملكي', slug='royal-oud', brand=self.brand, gender='men')
+        self.variant = ProductVariant.objects.create(product=self.product, size_ml=50, price=100, stock_quantity=3, sku='royal-50')
+        self.list_url = reverse('product-public-list')
+        self.detail_url = reverse('product-public-detail', args=['royal-oud'])
+
+    def test_second_read_skips_the_database(self):
+        for url in (self.list_url, self.detail_url, reverse('category-list'), reverse('brand-list')):
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_query_parameters_are_normalized(self):
+        self.client.get(self.list_url, {'gender': 'men', 'ordering': 'min_price'})
+        response = self.client.get(f'{self.list_url}?ordering=min_price&gender=men')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(self.list_url, {'gender': 'women'})['X-Cache'], 'MISS')
+
+    def test_catalogue_changes_invalidate(self):
+        self.client.get(self.detail_url)
+        self.variant.price = 80
+        self.variant.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['min_price'], '80.00')
+
+        self.client.get(self.list_url, {'categories__slug': 'oriental'})
+        self.product.categories.add(self.category)
+        response = self.client.get(self.list_url, {'categories__slug': 'oriental'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 1)
+
+        self.client.get(self.detail_url)
+        ProductNote.objects.create(product=self.product, note_type='top', name_ar='زعفران')
+        self.assertEqual(self.client.get(self.detail_url)['X-Cache'], 'MISS')
+
+    def test_not_found_is_not_cached_and_stats_are_exposed(self):
+        missing = reverse('product-public-detail', args=['missing'])
+        self.client.get(missing)
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.get(self.list_url)
+        self.client.get(self.list_url)
+
+        admin = User.objects.create_superuser(username='admin', password='password', email='admin@example.com')
+        self.client.force_authenticate(user=admin)
+        stats = self.client.get(reverse('product-admin-cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+    def test_conditional_get(self):
+        response = self.client.get(self.detail_url)
+        etag, modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=modified).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        list_etag = self.client.get(self.list_url)['ETag']
+        self.assertNotEqual(list_etag, etag)
+        self.variant.delete()
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_200_OK)
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_superuser(username='admin', password='password', email='admin@example.com')
+        category = Category.objects.create(name_ar='شرقي', slug='oriental', description='وصف طويل')
+        brand = Brand.objects.create(name_ar='العود', slug='oud')
+        for i in range(3):
+            product = Product.objects.create(name_ar=f'عطر {i}', slug=f'p{i}', brand=brand, gender='men')
+            product.categories.add(category)
+            ProductVariant.objects.create(product=product, size_ml=50, price=100, stock_quantity=1, sku=f'p{i}-50')
+        self.list_url = reverse('product-public-list')
+
+    def test_default_shape_is_unchanged(self):
+        row = self.client.get(self.list_url).data['results'][0]
+        self.assertEqual(set(row), {'id', 'name_ar', 'slug', 'categories', 'brand', 'main_image', 'main_image_srcset', 'min_price', 'gender', 'occasion', 'vibe', 'is_featured', 'is_new', 'is_active'})
+        self.assertIn('description', row['categories'][0])
+
+    def test_fields_trim_output_and_queries(self):
+        # Last-Modified, count and page: no brand join and no categories prefetch
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url, {'fields': 'id,slug,min_price'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'slug', 'min_price'})
+
+        response = self.client.get(self.list_url, {'fields': 'slug,brand.name_ar,categories.slug'})
+        row = response.data['results'][0]
+        self.assertEqual(row['brand'], {'name_ar': 'العود'})
+        self.assertEqual(row['categories'], [{'slug': 'oriental'}])
+
+    def test_detail_fields(self):
+        response = self.client.get(reverse('product-public-detail', args=['p0']), {'fields': 'name_ar,brand,variants.sku'})
+        self.assertEqual(set(response.data), {'name_ar', 'brand', 'variants'})
+        self.assertEqual(response.data['variants'], [{'sku': 'p0-50'}])
+        self.assertEqual(response.data['brand']['slug'], 'oud')
+
+    def test_expand(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('variant-admin-list')
+        row = self.client.get(url).data['results'][0]
+        self.assertIsInstance(row['product'], int)
+
+        with self.assertNumQueries(3):
+            # count, variants joined to product and brand, product categories
+            response = self.client.get(url, {'fields': 'sku,product', 'expand': 'product'})
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'sku', 'product'})
+        self.assertEqual(row['product']['brand']['slug'], 'oud')
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False, IMAGE_DERIVATIVE_WIDTHS=[320, 640])
+class ImageDerivativeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.brand = Brand.objects.create(name_ar='العود', slug='oud')
+
+    def upload(self, size=(1000, 500), mode='RGBA'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 120, 40, 128) if mode == 'RGBA' else (200, 120, 40)).save(buffer, 'PNG')
+        return SimpleUploadedFile('bottle.png', buffer.getvalue(), content_type='image/png')
+
+    def create_product(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(name_ar='عود', slug='oud-1', brand=self.brand, gender='men', main_image=self.upload(**kwargs))
+
+    def test_presets_are_built_after_commit(self):
+        product = self.create_product()
+        manifest = images.read_manifest(product.main_image.name)
+        self.assertIn('jpeg', manifest['formats'])
+        self.assertEqual(list(manifest['formats']['jpeg']), ['320', '640'])
+        with default_storage.open(manifest['formats']['webp']['320']) as fh:
+            self.assertEqual(Image.open(fh).size, (320, 160))
+
+        row = self.client.get(reverse('product-public-list')).data['results'][0]
+        self.assertTrue(row['main_image_srcset']['webp']['640'].startswith('http://testserver/media/derivatives/'))
+
+    def test_manifests_are_read_through_the_cache(self):
+        product = self.create_product()
+        name = product.main_image.name
+        self.assertEqual(images.cached_manifest(name), images.read_manifest(name))
+        with patch.object(images, 'read_manifest', side_effect=AssertionError('manifest read from storage')):
+            self.client.get(reverse('product-public-list'))
+            self.assertIsNotNone(images.cached_manifest(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertIsNone(images.cached_manifest(name))
+
+    @override_settings(IMAGE_MANIFEST_MISSING_TIMEOUT=60)
+    def test_missing_manifests_are_cached_briefly(self):
+        product = Product.objects.create(name_ar='عود', slug='oud-1', brand=self.brand, gender='men', main_image=self.upload())
+        with patch.object(images.cache, 'set') as cache_set:
+            self.assertIsNone(images.cached_manifest(product.main_image.name))
+        self.assertEqual(cache_set.call_args.args[1:], (images.MISSING, 60))
+
+    def test_small_images_are_not_upscaled(self):
+        product = self.create_product(size=(400, 300), mode='RGB')
+        with default_storage.open(images.derivative_name(product.main_image.name, 640, 'jpeg')) as fh:
+            self.assertEqual(Image.open(fh).size, (400, 300))
+
+    def test_backfill_command_and_cleanup(self):
+        product = Product.objects.create(name_ar='عود', slug='oud-1', brand=self.brand, gender='men', main_image=self.upload())
+        self.assertIsNone(self.client.get(reverse('product-public-detail', args=['oud-1'])).data['main_image_srcset'])
+
+        call_command('generate_image_derivatives', workers=1, stdout=io.StringIO())
+        self.assertIsNotNone(self.client.get(reverse('product-public-detail', args=['oud-1'])).data['main_image_srcset'])
+
+        name = product.main_image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertIsNone(images.read_manifest(name))
+
+
+@override_settings(PRODUCT_VIEW_FLUSH_ASYNC=False)
+class ProductViewCountTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        stop_view_counting()
+        brand = Brand.objects.create(name_ar='العود', slug='oud')
+        for slug in ('royal', 'night', 'rose'):
+            Product.objects.create(name_ar=slug, slug=slug, brand=brand, gender='men')
+
+    def tearDown(self):
+        stop_view_counting()
+
+    def view(self, slug, times=1):
+        for _ in range(times):
+            self.client.get(reverse('product-public-detail', args=[slug]))
+
+    def test_views_are_buffered_then_flushed_in_bulk(self):
+        self.view('royal', 3)
+        self.view('night', 3)
+        self.view('rose')
+        self.view('missing')
+        self.assertEqual(Product.objects.get(slug='royal').view_count, 0)
+        self.assertEqual(counters.pending(), 7)
+
+        # slug lookup, one UPDATE per increment, rollup insert, one rollup UPDATE per increment (+ savepoint)
+        with self.assertNumQueries(8):
+            self.assertEqual(counters.flush(), 7)
+        counts = dict(Product.objects.values_list('slug', 'view_count'))
+        self.assertEqual(counts, {'royal': 3, 'night': 3, 'rose': 1})
+
+        self.view('royal', 2)
+        counters.flush()
+        self.assertEqual(Product.objects.get(slug='royal').view_count, 5)
+        daily = ProductDailyViews.objects.get(product__slug='royal')
+        self.assertEqual((daily.date, daily.views), (timezone.localdate(), 5))
+
+    def test_cached_and_not_modified_hits_still_count(self):
+        url = reverse('product-public-detail', args=['royal'])
+        etag = self.client.get(url)['ETag']
+        self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        counters.flush()
+        self.assertEqual(Product.objects.get(slug='royal').view_count, 3)
+
+    def test_flush_runs_after_the_response_once_due(self):
+        self.view('royal')
+        with override_settings(PRODUCT_VIEW_FLUSH_INTERVAL=0):
+            self.view('rose')
+        self.assertEqual(counters.pending(), 0)
+        self.assertEqual(Product.objects.get(slug='royal').view_count, 1)
+
+    def test_flush_at_exit(self):
+        self.view('royal', 2)
+        counters._flush_at_exit()
+        self.assertEqual(counters.pending(), 0)
+        self.assertEqual(Product.objects.get(slug='royal').view_count, 2)
+
+    def test_most_viewed_ordering(self):
+        self.view('rose', 2)
+        self.view('night')
+        counters.flush()
+        response = self.client.get(reverse('product-public-list'), {'ordering': '-view_count'})
+        self.assertEqual([row['slug'] for row in response.data['results']], ['rose', 'night', 'royal'])
+
+@override_settings(PRODUCT_VIEW_FLUSH_INTERVAL=0.05)
+class ProductViewFlushTimerTests(TransactionTestCase):
+    def setUp(self):
+        # A timer armed by earlier tests would still wait out the default interval
+        stop_view_counting()
+
+    def tearDown(self):
+        stop_view_counting()
+
+    def test_idle_worker_flushes_on_the_interval(self):
+        Product.objects.create(name_ar='royal', slug='royal', brand=Brand.objects.create(name_ar='العود', slug='oud'), gender='men')
+        counters.record_view('royal')
+        deadline = time.monotonic() + 5
+        while counters.pending() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        # The timer flushes, then clears itself; wait for the write to land
+        while Product.objects.get(slug='royal').view_count == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(Product.objects.get(slug='royal').view_count, 1)
+
+
+class ProductBatchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name_ar='شرقي', slug='oriental')
+        brand = Brand.objects.create(name_ar='العود', slug='oud')
+        self.products = []
+        for i in range(15):
+            product = Product.objects.create(name_ar=f'عطر {i}', slug=f'p{i}', brand=brand, gender='men', is_active=i != 7)
+            product.categories.add(category)
+            ProductVariant.objects.create(product=product, size_ml=50, price=100, stock_quantity=1, sku=f'SKU-{i}')
+            self.products.append(product)
+        self.url = reverse('product-public-batch')
+
+    def test_slugs_in_request_order_with_missing(self):
+        slugs = [f'p{i}' for i in (14, 3, 7, 0)] + ['nope']
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'slugs': ','.join(slugs)})
+        self.assertEqual([row['slug'] for row in response.data['results']], ['p14', 'p3', 'p0'])
+        self.assertEqual(response.data['missing'], ['p7', 'nope'])
+
+    def test_fifteen_ids_cost_constant_queries(self):
+        ids = ','.join(str(p.id) for p in reversed(self.products))
+        # products with brand joined, categories prefetch
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'ids': ids, 'fields': 'id,slug,brand.name_ar,categories.slug'})
+        self.assertEqual(len(response.data['results']), 14)
+        self.assertEqual(response.data['results'][0], {'id': self.products[14].id, 'slug': 'p14', 'brand': {'name_ar': 'العود'}, 'categories': [{'slug': 'oriental'}]})
+        self.assertEqual(response.data['missing'], [self.products[7].id])
+
+    def test_skus_return_variants(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'skus': 'SKU-2,SKU-7,SKU-1', 'fields': 'sku,price,product_name_ar'})
+        self.assertEqual(response.data['results'], [
+            {'sku': 'SKU-2', 'price': '100.00', 'product_name_ar': 'عطر 2'},
+            {'sku': 'SKU-1', 'price': '100.00', 'product_name_ar': 'عطر 1'},
+        ])
+        self.assertEqual(response.data['missing'], ['SKU-7'])
+
+    def test_validation(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': '1', 'slugs': 'p1'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(PRODUCT_BATCH_MAX_SIZE=3):
+            response = self.client.get(self.url, {'slugs': 'p1,p2,p3,p4'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CatalogueImportExportTests(APITestCase):
+    HEADER = 'product_slug,name_ar,brand_slug,brand_name,gender,categories,fragrance_families,notes,sku,size_ml,price,sale_price,stock_quantity\n'
+
+    def setUp(self):
+        self.brand = Brand.objects.create(name_ar='العود', slug='oud')
+        self.family = FragranceFamily.objects.create(name_ar='خشبي', icon='tree', color='#000000')
+        product = Product.objects.create(name_ar='قديم', slug='old', brand=self.brand, gender='men')
+        ProductVariant.objects.create(product=product, size_ml=50, price=100, stock_quantity=0, sku='OLD-50')
+
+    def load(self, body, **kwargs):
+        return catalogue_io.import_catalogue(io.BytesIO((self.HEADER + body).encode()), 'csv', **kwargs)
+
+    def test_import_creates_catalogue(self):
+        summary = self.load(
+            'amber,عنبر,oud,,unisex,oriental|new,خشبي|حار,top:برغموت|base:مسك,AMB-50,50,150,0,3\n'
+            'amber,,,,,,,,AMB-100,100,250,200,0\n'
+            'old,,,,,,,,OLD-50,,90,,5\n'
+        )
+        self.assertTrue(summary['committed'])
+        self.assertEqual(summary['errors'], [])
+        self.assertEqual((summary['products_created'], summary['variants_created'], summary['variants_updated']), (1, 2, 1))
+        self.assertEqual((summary['categories_created'], summary['fragrance_families_created'], summary['notes_created']), (2, 1, 2))
+
+        amber = Product.objects.get(slug='amber')
+        self.assertEqual(amber.brand, self.brand)
+        self.assertEqual(sorted(amber.categories.values_list('slug', flat=True)), ['new', 'oriental'])
+        self.assertIn(self.family, amber.fragrance_families.all())
+        self.assertEqual(sorted(amber.notes.values_list('note_type', 'name_ar')), [('base', 'مسك'), ('top', 'برغموت')])
+        # sale_price 0 means no offer, as in ProductVariant.save
+        self.assertIsNone(ProductVariant.objects.get(sku='AMB-50').sale_price)
+        # Bulk writes send no signals; summaries and the search index are refreshed once
+        self.assertEqual((amber.min_price, amber.max_price, amber.has_discount, amber.in_stock), (150, 200, True, True))
+        self.assertTrue(ProductSearchDocument.objects.filter(product=amber, notes__contains='مسك').exists())
+        old = Product.objects.get(slug='old')
+        self.assertEqual((old.name_ar, old.min_price, old.in_stock), ('قديم', 90, True))
+
+    def test_unchanged_rows_write_nothing(self):
+        self.load('old,قديم,oud,,men,,,,OLD-50,50,100,,0\n')
+        before = Product.objects.get(slug='old').updated_at
+        summary = self.load('old,قديم,oud,,men,,,,OLD-50,50,100,,0\n')
+        self.assertEqual((summary['products_updated'], summary['variants_updated']), (0, 0))
+        self.assertEqual(Product.objects.get(slug='old').updated_at, before)
+
+    def test_invalid_rows_are_reported_per_row(self):
+        body = (
+            'amber,عنبر,oud,,unisex,,,,AMB-50,50,abc,,1\n'
+            'musk,مسك,oud,,men,,,,MSK-50,50,120,,1\n'
+            'rose,,oud,,women,,,,RS-50,50,80,,1\n'
+            'amber,,,,,,,,MSK-50,,130,,\n'
+        )
+        summary = self.load(body)
+        self.assertFalse(summary['committed'])
+        self.assertEqual([(e['row'], list(e['errors'])) for e in summary['errors']], [(2, ['price']), (4, ['name_ar']), (5, ['sku'])])
+        self.assertFalse(Product.objects.filter(slug__in=['amber', 'musk', 'rose']).exists())
+
+        summary = self.load(body, skip_invalid=True)
+        self.assertTrue(summary['committed'])
+        self.assertEqual(summary['rows_skipped'], 3)
+        self.assertEqual(list(Product.objects.filter(slug__in=['amber', 'musk', 'rose']).values_list('slug', flat=True)), ['musk'])
+
+    def test_export_round_trips_through_every_format(self):
+        self.load('amber,عنبر,oud,,unisex,oriental,خشبي,heart:ورد,AMB-50,50,150,120,3\n')
+        Product.objects.create(name_ar='قريباً', slug='soon', brand=self.brand, gender='women')
+        exported = list(catalogue_io.export_rows())
+        # The product without variants gets a product-only row
+        self.assertEqual([row['sku'] for row in exported], ['OLD-50', 'AMB-50', ''])
+
+        csv_file = io.BytesIO(''.join(catalogue_io.stream_csv(exported)).encode())
+        jsonl_file = io.BytesIO(''.join(catalogue_io.stream_jsonl(exported)).encode())
+        xlsx_file = io.BytesIO()
+        catalogue_io.write_xlsx(exported, xlsx_file)
+        for file_format, fh in (('csv', csv_file), ('jsonl', jsonl_file), ('xlsx', xlsx_file)):
+            fh.seek(0)
+            summary = catalogue_io.import_catalogue(fh, file_format)
+            self.assertEqual(summary['errors'], [], file_format)
+            self.assertEqual((summary['rows'], summary['rows_skipped']), (3, 0), file_format)
+            self.assertEqual((summary['products_updated'], summary['variants_updated'], summary['notes_created']), (0, 0, 0), file_format)
+
+    def test_rows_without_sku_only_touch_the_product(self):
+        summary = self.load(
+            'soon,قريباً,oud,,women,,,,,,,,\n'
+            'old,جديد,,,,,,,,,,,\n'
+            'bad,سيئ,oud,,men,,,,,50,,,\n'
+        )
+        self.assertEqual([(e['row'], list(e['errors'])) for e in summary['errors']], [(4, ['sku'])])
+        summary = self.load('soon,قريباً,oud,,women,,,,,,,,\nold,جديد,,,,,,,,,,,\n')
+        self.assertTrue(summary['committed'])
+        self.assertEqual((summary['products_created'], summary['products_updated'], summary['variants_created']), (1, 1, 0))
+        self.assertFalse(Product.objects.get(slug='soon').variants.exists())
+        self.assertEqual(Product.objects.get(slug='old').name_ar, 'جديد')
+
+    def test_admin_import_and_streaming_export(self):
+        self.client.force_authenticate(user=User.objects.create_superuser(username='admin', password='password', email='admin@example.com'))
+        upload = SimpleUploadedFile('prices.csv', (self.HEADER + 'old,,,,,,,,OLD-50,,95,,4\n').encode(), content_type='text/csv')
+        response = self.client.post(reverse('product-admin-import-catalogue'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['variants_updated'], 1)
+
+        upload = SimpleUploadedFile('prices.csv', (self.HEADER + 'old,,,,,,,,OLD-50,,-1,,4\n').encode(), content_type='text/csv')
+        response = self.client.post(reverse('product-admin-import-catalogue'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+
+        upload = SimpleUploadedFile('prices.csv', (self.HEADER + 'old,,,,,,,,OLD-50,,80,,4\n').encode(), content_type='text/csv')
+        response = self.client.post(reverse('product-admin-import-catalogue'), {'file': upload, 'dry_run': 'True'}, format='multipart')
+        self.assertFalse(response.data['committed'])
+        upload.seek(0)
+        response = self.client.post(reverse('product-admin-import-catalogue'), {'file': upload, 'dry_run': 'nope'}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('product-admin-export'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0].split(','), catalogue_io.COLUMNS)
+        self.assertIn('OLD-50', lines[1])
+        self.assertIn(',95.00,', lines[1])
+
+        response = self.client.get(reverse('product-admin-export'), {'file_format': 'xlsx'})
+        self.assertEqual(response['Content-Type'], catalogue_io.XLSX_CONTENT_TYPE)
+        self.assertEqual(self.client.get(reverse('product-admin-export'), {'file_format': 'pdf'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class VariantBulkUpdateTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(user=User.objects.create_superuser(username='admin', password='password', email='admin@example.com'))
+        oud = Brand.objects.create(name_ar='العود', slug='oud')
+        rose = Brand.objects.create(name_ar='الورد', slug='rose')
+        self.oud = Product.objects.create(name_ar='عود', slug='oud-1', brand=oud, gender='men')
+        self.rose = Product.objects.create(name_ar='ورد', slug='rose-1', brand=rose, gender='women')
+        for product, prefix in ((self.oud, 'OUD'), (self.rose, 'RSE')):
+            for size, price in ((50, 100), (100, 180)):
+                ProductVariant.objects.create(product=product, size_ml=size, price=price, stock_quantity=2, sku=f'{prefix}-{size}')
+        self.url = reverse('variant-admin-bulk-update')
+
+    def test_patches_apply_in_one_batch(self):
+        patches = [
+            {'sku': 'OUD-50', 'price': '90.00', 'stock_delta': 10},
+            {'sku': 'OUD-100', 'sale_price': '150.00'},
+            {'sku': 'RSE-50', 'stock_quantity': 2},
+            {'sku': 'NOPE', 'price': '1.00'},
+        ]
+        # savepoint pair, locking select, variant executemany, summary aggregate + executemany
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, {'patches': patches}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['matched'], response.data['updated'], response.data['products']), (3, 2, 1))
+        self.assertEqual(response.data['missing'], ['NOPE'])
+        self.assertEqual(response.data['changes'], [
+            {'sku': 'OUD-50', 'changes': {'price': ['100.00', '90.00'], 'stock_quantity': [2, 12]}},
+            {'sku': 'OUD-100', 'changes': {'sale_price': [None, '150.00']}},
+        ])
+        variant = ProductVariant.objects.get(sku='OUD-50')
+        self.assertEqual((variant.price, variant.stock_quantity), (90, 12))
+        oud = Product.objects.get(id=self.oud.id)
+        self.assertEqual((oud.min_price, oud.max_price, oud.has_discount), (90, 150, True))
+
+    def test_sale_price_zero_clears_the_offer(self):
+        ProductVariant.objects.filter(sku='OUD-50').update(sale_price=80)
+        response = self.client.post(self.url, {'patches': [{'sku': 'OUD-50', 'sale_price': '0'}]}, format='json')
+        self.assertEqual(response.data['changes'], [{'sku': 'OUD-50', 'changes': {'sale_price': ['80.00', None]}}])
+        self.assertIsNone(ProductVariant.objects.get(sku='OUD-50').sale_price)
+
+    def test_rule_discounts_a_brand(self):
+        response = self.client.post(self.url, {'rule': {'brand': 'oud', 'discount_percent': '10'}}, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            dict(ProductVariant.objects.values_list('sku', 'sale_price')),
+            {'OUD-50': Decimal('90.00'), 'OUD-100': Decimal('162.00'), 'RSE-50': None, 'RSE-100': None},
+        )
+        response = self.client.post(self.url, {'rule': {'brand': 'oud', 'clear_sale': True}, 'dry_run': True}, format='json')
+        self.assertEqual((response.data['dry_run'], response.data['updated']), (True, 2))
+        self.assertEqual(ProductVariant.objects.filter(product__brand__slug='oud', sale_price__isnull=True).count(), 0)
+
+    def test_dry_run_flag_parsing(self):
+        for dry_run, expected in (('true', True), ('1', True), ('false', False), ('0', False), (False, False)):
+            response = self.client.post(self.url, {'patches': [{'sku': 'OUD-50', 'stock_delta': 1}], 'dry_run': dry_run}, format='json')
+            self.assertEqual(response.data['dry_run'], expected, dry_run)
+        self.assertEqual(ProductVariant.objects.get(sku='OUD-50').stock_quantity, 5)
+
+    def test_invalid_requests_write_nothing(self):
+        cases = [
+            {},
+            {'patches': []},
+            {'patches': [{'sku': 'OUD-50'}]},
+            {'patches': [{'sku': 'OUD-50', 'price': '-1'}]},
+            {'patches': [{'sku': 'OUD-50', 'price': '1'}, {'sku': 'OUD-50', 'price': '2'}]},
+            {'patches': [{'sku': 'OUD-50', 'price': '1'}, {'sku': 'RSE-50', 'stock_delta': -3}]},
+            {'rule': {'discount_percent': '10'}},
+            {'rule': {'brand': 'oud', 'discount_percent': '10', 'clear_sale': True}},
+            {'rule': {'brand': 'oud', 'discount_percent': '0'}},
+            {'rule': {'brand': 'oud', 'discount_percent': '100'}},
+            {'patches': [{'sku': 'OUD-50', 'price': '1'}], 'dry_run': 'maybe'},
+        ]
+        for payload in cases:
+            response = self.client.post(self.url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, payload)
+        self.assertEqual(ProductVariant.objects.get(sku='OUD-50').price, 100)
+
+
+class FastSerializerContractTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name_ar='شرقي', slug='oriental')
+        brand = Brand.objects.create(name_ar='العود', slug='oud')
+        for i in range(5):
+            product = Product.objects.create(name_ar=f'عطر {i}', slug=f'p{i}', brand=brand, gender='men' if i % 2 else 'women')
+            product.categories.add(category)
+            ProductVariant.objects.create(product=product, size_ml=50, price=100 + i, sale_price=90 if i == 3 else None, stock_quantity=i, sku=f'SKU-{i}')
+
+    def get_both(self, url, params=None):
+        contents = []
+        for fast in (False, True):
+            cache.clear()
+            with override_settings(FAST_SERIALIZERS=fast):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            contents.append(response.content)
+        return contents
+
+    def test_product_list_is_byte_identical(self):
+        drf, fast = self.get_both(reverse('product-public-list'))
+        self.assertEqual(drf, fast)
+        drf, fast = self.get_both(reverse('product-public-list'), {'fields': 'id,slug,brand.name_ar,categories.slug,min_price'})
+        self.assertEqual(drf, fast)
+
+    def test_variant_batch_is_byte_identical(self):
+        drf, fast = self.get_both(reverse('product-public-batch'), {'skus': 'SKU-3,SKU-1,SKU-0'})
+        self.assertEqual(drf, fast)
+
+
+@override_settings(CATALOGUE_SNAPSHOT_DELAY=0, CATALOGUE_SNAPSHOT_ASYNC=False)
+class CatalogueSnapshotTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        category = Category.objects.create(name_ar='شرقي', slug='oriental')
+        brand = Brand.objects.create(name_ar='العود', slug='oud')
+        family = FragranceFamily.objects.create(name_ar='خشبي', icon='tree', color='#000000')
+        for i in range(3):
+            product = Product.objects.create(name_ar=f'عطر {i}', slug=f'p{i}', brand=brand, gender='men', is_active=i != 2)
+            product.categories.add(category)
+            product.fragrance_families.add(family)
+            ProductNote.objects.create(product=product, note_type='top', name_ar='عود')
+            ProductVariant.objects.create(product=product, size_ml=50, price=100, sale_price=80 if i == 1 else None, stock_quantity=3, sku=f'SKU-{i}')
+
+    def fetch(self, accept_encoding=''):
+        response = self.client.get(reverse('catalogue-snapshot'))
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        return self.client.get(response['Location'], HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    def test_redirects_to_versioned_precompressed_file(self):
+        self.assertEqual(self.client.get(reverse('catalogue-snapshot')).status_code, status.HTTP_404_NOT_FOUND)
+        manifest = snapshot.build()
+        response = self.fetch('gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        data = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual([product['slug'] for product in data['products']], ['p0', 'p1'])
+        self.assertEqual(data['products'][1]['variants'][0]['current_price'], '80.00')
+        self.assertEqual(data['products'][0]['notes'], [{'note_type': 'top', 'name_ar': 'عود', 'icon': ''}])
+        self.assertEqual(len(data['brands']), 1)
+        self.assertEqual(len(data['fragrance_families']), 1)
+
+        plain = self.fetch()
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(b''.join(plain.streaming_content)), data)
+        self.assertEqual(manifest['sizes']['identity'], len(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()))
+        if snapshot.brotli is not None:
+            self.assertEqual(self.fetch('gzip, br')['Content-Encoding'], 'br')
+        self.assertFalse(self.fetch('gzip;q=0').has_header('Content-Encoding'))
+
+    def test_version_follows_content(self):
+        first = snapshot.build()['version']
+        self.assertEqual(snapshot.build()['version'], first)
+        ProductVariant.objects.filter(sku='SKU-0').update(price=90)
+        second = snapshot.build()['version']
+        self.assertNotEqual(second, first)
+        with override_settings(CATALOGUE_SNAPSHOT_KEEP=0):
+            snapshot.build()
+        ProductVariant.objects.filter(sku='SKU-0').update(price=95)
+        with override_settings(CATALOGUE_SNAPSHOT_KEEP=0):
+            third = snapshot.build()['version']
+        self.assertEqual(self.client.get(reverse('catalogue-snapshot-version', args=[second])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('catalogue-snapshot-version', args=[third])).status_code, status.HTTP_200_OK)
+
+    def test_rebuilt_after_catalogue_change(self):
+        self.assertIsNone(snapshot.rebuild_if_due())
+        version = snapshot.build()['version']
+        self.assertIsNone(snapshot.rebuild_if_due())
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.get(sku='SKU-0').save()
+        with override_settings(CATALOGUE_SNAPSHOT_DELAY=60):
+            self.assertIsNone(snapshot.rebuild_if_due())
+        self.assertEqual(snapshot.current()['version'], version)
+
+        ProductVariant.objects.filter(sku='SKU-0').update(price=70)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(slug='p0').save()
+        # Another process holds the lock for this generation
+        cache.add(snapshot.LOCK_KEY, 'other')
+        self.assertIsNone(snapshot.rebuild_if_due())
+        cache.delete(snapshot.LOCK_KEY)
+        manifest = snapshot.rebuild_if_due()
+        self.assertNotEqual(manifest['version'], version)
+        self.assertEqual(snapshot.current(), manifest)
+        self.assertIsNone(snapshot.rebuild_if_due())
+
+    def test_other_generation_with_same_content_settles(self):
+        version = snapshot.build()['version']
+        # A process whose cache never saw this build, with a generation of its own
+        cache.clear()
+        self.assertIsNone(snapshot.rebuild_if_due())
+        self.assertIsNone(snapshot.rebuild_if_due())
+        with patch.object(snapshot, 'build', side_effect=AssertionError('rebuilt again')):
+            self.assertIsNone(snapshot.rebuild_if_due())
+        self.assertEqual(snapshot.current()['version'], version)
+
+    def test_requests_do_not_rebuild(self):
+        version = snapshot.build()['version']
+        ProductVariant.objects.filter(sku='SKU-0').update(price=70)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(slug='p0').save()
+        self.client.get(reverse('catalogue-snapshot'))
+        self.assertEqual(snapshot.current()['version'], version)
+
+
+class HotQueryPlanTests(APITestCase):
+    def test_hot_queries_use_their_indexes(self):
+        if connection.vendor == 'postgresql':
+            # Empty tables would make a sequential scan the cheapest plan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, (queryset, table, index) in query_plans.hot_queries().items():
+            with self.subTest(name):
+                plan = query_plans.explain(queryset)
+                self.assertEqual(query_plans.full_scans(plan, limited=query_plans.is_limited(queryset)), set(), plan)
+                if index and connection.vendor == 'sqlite':
+                    self.assertIn(f'USING INDEX {index}', ' '.join(plan).replace('COVERING INDEX', 'INDEX'))
+
+    def test_full_scan_detection(self):
+        walk = ['5 0 0 SCAN orders_order USING INDEX orders_orde_created_8e2d48_idx']
+        self.assertEqual(query_plans.full_scans(['2 0 0 SCAN products_product'], vendor='sqlite'), {'products_product'})
+        self.assertEqual(query_plans.full_scans(walk, vendor='sqlite'), {'orders_order'})
+        self.assertEqual(query_plans.full_scans(walk, limited=True, vendor='sqlite'), set())
+        self.assertEqual(query_plans.full_scans(['3 0 0 SCAN orders_order USING COVERING INDEX order_city_total_idx'], vendor='sqlite'), set())
+        self.assertEqual(query_plans.full_scans(['Seq Scan on orders_order  (cost=0.00..1.01 rows=1 width=8)'], vendor='postgresql'), {'orders_order'})
+
+
+class QueryBudgetTests(APITestCase):
+    def test_query_counts_do_not_grow_with_result_size(self):
+        report = query_budget.run()
+        self.assertIn('product-public-list', report)
+        self.assertIn('customerprofile-detail', report)
+        for name, entry in report.items():
+            with self.subTest(name):
+                self.assertLess(max(result['status'] for result in entry['sizes'].values()), 500, entry)
+        self.assertEqual({name: report[name]['sizes'] for name in query_budget.growing(report)}, {})
+
+
+class ProductDetailLoaderTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.brand = Brand.objects.create(name_ar='العود', slug='oud')
+        self.category = Category.objects.create(name_ar='شرقي', slug='oriental')
+        self.family = FragranceFamily.objects.create(name_ar='خشبي', icon='', color='#000000')
+        self.small = self.create('small', 1)
+        self.large = self.create('large', 5)
+
+    def create(self, slug, size):
+        product = Product.objects.create(name_ar=slug, slug=slug, brand=self.brand, gender='men')
+        product.categories.add(self.category)
+        product.fragrance_families.add(self.family)
+        for i in range(size):
+            ProductVariant.objects.create(product=product, size_ml=10 * (i + 1), price=100, stock_quantity=1, sku=f'{slug}-{i}')
+            ProductNote.objects.create(product=product, note_type='top', name_ar=f'نوتة {i}')
+            ProductImage.objects.create(product=product, image=f'products/gallery/{slug}-{i}.jpg')
+        return product
+
+    def get(self, slug, **params):
+        return self.client.get(reverse('product-public-detail', args=[slug]), params)
+
+    def test_query_count_is_fixed(self):
+        counts = []
+        for product in (self.small, self.large):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get(product.slug)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            counts.append(len(queries))
+        # slug lookup, product with brand, then categories, families, variants, notes and images
+        self.assertEqual(counts, [7, 7])
+        self.assertEqual(len(response.data['variants']), 5)
+        self.assertEqual(response.data['variants'][0]['product_name_ar'], 'large')
+        self.assertEqual(len(response.data['images']), 5)
+        self.assertEqual(response.data['brand']['slug'], 'oud')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('large')['X-Cache'], 'HIT')
+
+    def test_changes_only_invalidate_their_product(self):
+        self.get('small')
+        self.get('large')
+        ProductVariant.objects.filter(product=self.small).first().save()
+        self.assertEqual(self.get('small')['X-Cache'], 'MISS')
+        self.assertEqual(self.get('large')['X-Cache'], 'HIT')
+
+        ProductImage.objects.filter(product=self.large).first().delete()
+        response = self.get('large')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['images']), 4)
+
+        self.small.categories.clear()
+        self.assertEqual(self.get('small').data['categories'], [])
+        self.assertEqual(self.get('large')['X-Cache'], 'HIT')
+
+        # Nested in every page
+        self.brand.name_ar = 'عود'
+        self.brand.save()
+        for slug in ('small', 'large'):
+            response = self.get(slug)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(response.data['brand']['name_ar'], 'عود')
+
+    def test_fields_are_cached_separately(self):
+        self.get('large')
+        response = self.get('large', fields='slug')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data, {'slug': 'large'})
+
+    def test_renamed_and_deactivated_products(self):
+        self.get('small')
+        self.small.slug = 'renamed'
+        self.small.save()
+        self.assertEqual(self.get('small').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get('renamed').status_code, status.HTTP_200_OK)
+
+        # A cached slug that now belongs to another product
+        self.get('large')
+        self.large.slug = 'large-old'
+        self.large.save()
+        self.small.slug = 'large'
+        self.small.save()
+        self.assertEqual(self.get('large').data['id'], self.small.id)
+
+        self.small.is_active = False
+        self.small.save()
+        self.assertEqual(self.get('large').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ScentNoteIndexTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        brand = Brand.objects.create(name_ar='العود', slug='oud')
+        self.products = {}
+        for slug, product_notes in {
+            'royal': [('base', 'العود'), ('top', 'زعفران')],
+            'night': [('top', 'عود')],
+            'rose': [('top', 'الزعفران'), ('heart', 'ورد')],
+        }.items():
+            product = Product.objects.create(name_ar=slug, slug=slug, brand=brand, gender='men')
+            for note_type, name in product_notes:
+                ProductNote.objects.create(product=product, note_type=note_type, name_ar=name)
+            self.products[slug] = product
+        self.admin = User.objects.create_superuser(username='admin', password='password', email='admin@example.com')
+        self.url = reverse('product-public-list')
+
+    def slugs(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return sorted(row['slug'] for row in response.data['results'])
+
+    def test_spellings_share_one_note(self):
+        self.assertEqual(ScentNote.objects.count(), 3)
+        oud = ScentNote.objects.get(aliases__key='عود')
+        self.assertEqual(set(ProductNote.objects.filter(term=oud).values_list('name_ar', flat=True)), {'العود', 'عود'})
+
+    def test_and_or_and_note_types(self):
+        self.assertEqual(self.slugs(notes='عود,زعفران'), ['royal'])
+        self.assertEqual(self.slugs(notes='عود,زعفران', notes_match='any'), ['night', 'rose', 'royal'])
+        self.assertEqual(self.slugs(notes='عود', note_type='base'), ['royal'])
+        self.assertEqual(self.slugs(notes='base:عود,top:الزعفران'), ['royal'])
+        self.assertEqual(self.slugs(notes='top:عود,heart:ورد', notes_match='any'), ['night', 'rose'])
+        self.assertEqual(self.slugs(notes='عود,عنبر'), [])
+        self.assertEqual(self.slugs(notes='عود,عنبر', notes_match='any'), ['night', 'royal'])
+        self.assertEqual(self.client.get(self.url, {'notes': 'عود', 'note_type': 'middle'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_uses_the_index_not_joins(self):
+        notes.get_index()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.slugs(notes='عود,زعفران'), ['royal'])
+        self.assertFalse([query for query in queries if 'productnote' in query['sql']])
+
+        oud = ScentNote.objects.get(aliases__key='عود')
+        oud.slug = 'oud'
+        oud.save()
+        self.assertEqual(self.slugs(notes='oud'), ['night', 'royal'])
+
+        self.products['night'].is_active = False
+        self.products['night'].save()
+        self.assertEqual(self.slugs(notes='oud'), ['royal'])
+        ProductNote.objects.create(product=self.products['rose'], note_type='base', name_ar='عـود')
+        self.assertEqual(self.slugs(notes='oud'), ['rose', 'royal'])
+
+    def test_merge_duplicate_spellings(self):
+        typo = ProductNote.objects.create(product=self.products['night'], note_type='heart', name_ar='زعفرن')
+        saffron = ScentNote.objects.get(aliases__key='زعفران')
+        self.assertNotEqual(typo.term_id, saffron.id)
+        self.assertEqual(self.slugs(notes='زعفران'), ['rose', 'royal'])
+
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('note-admin-merge', args=[saffron.id])
+        self.assertEqual(self.client.post(url, {'sources': [999]}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'sources': [typo.term_id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['merged'], response.data['product_notes']), (1, 1))
+        self.assertEqual(sorted(response.data['note']['aliases']), ['زعفران', 'زعفرن'])
+        self.assertFalse(ScentNote.objects.filter(id=typo.term_id).exists())
+        self.assertEqual(self.slugs(notes='زعفران'), ['night', 'rose', 'royal'])
+
+        # The merged spelling now lands on the surviving note
+        note = ProductNote.objects.create(product=self.products['rose'], note_type='base', name_ar='زعفرن')
+        self.assertEqual(note.term_id, saffron.id)
+        self.assertEqual(ScentNoteAlias.objects.filter(note=saffron).count(), 2)
+
+
+@override_settings(SUGGEST_REBUILD_ASYNC=False)
+class SuggestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        suggest._current = None
+        self.brand = Brand.objects.create(name_ar='عود الشرق', slug='oud-east')
+        self.royal = Product.objects.create(name_ar='عود ملكي', slug='royal', brand=self.brand, gender='men', sales_count=10)
+        self.night = Product.objects.create(name_ar='ليلة العود', slug='night', brand=self.brand, gender='men', view_count=5)
+        ProductNote.objects.create(product=self.royal, note_type='base', name_ar='عود')
+        self.url = reverse('product-suggest')
+
+    def labels(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['type'], row['label']) for row in response.data['results']]
+
+    def test_ranked_prefix_matches(self):
+        # Brand and note carry their products' weight: 10 sales x 10 + 5 views
+        self.assertEqual(self.labels('عو'), [
+            ('brand', 'عود الشرق'), ('product', 'عود ملكي'), ('note', 'عود'), ('product', 'ليلة العود'),
+        ])
+        self.assertEqual(self.labels('ملك'), [('product', 'عود ملكي')])
+        self.assertEqual(self.labels('الع'), self.labels('عو'))
+        self.assertEqual(self.labels('عود مل'), [('product', 'عود ملكي')])
+        self.assertEqual(self.labels('عو', limit=1), [('brand', 'عود الشرق')])
+        self.assertEqual(self.labels(''), [])
+        self.assertEqual(self.client.get(self.url, {'q': 'عو', 'limit': 100}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_changes_are_replayed_without_a_rebuild(self):
+        self.labels('عو')
+        index = suggest.get_suggester()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.royal.name_ar = 'مسك ملكي'
+            self.royal.save()
+            self.night.is_active = False
+            self.night.save()
+            Category.objects.create(name_ar='عود فاخر', slug='luxury-oud')
+        self.assertEqual(self.labels('عو'), [('brand', 'عود الشرق'), ('note', 'عود'), ('category', 'عود فاخر')])
+        self.assertEqual(self.labels('مس'), [('product', 'مسك ملكي')])
+        self.assertIs(suggest.get_suggester(), index)
+
+        # Bulk writes ask for a full rebuild
+        with self.captureOnCommitCallbacks(execute=True):
+            suggest.changed_all()
+        self.assertIsNot(suggest.get_suggester(), index)
+        self.assertEqual(suggest.get_suggester().overlay, {})
+        self.assertEqual(self.labels('مس'), [('product', 'مسك ملكي')])
+
+    def test_precomputed_prefixes_match_a_full_scan(self):
+        entries = [
+            suggest.Entry('product', i, f'عطر {word} {i}', f's{i}', None, (i * 7919) % 1000)
+            for i, word in enumerate(['عود', 'عنبر', 'ورد'] * 300)
+        ]
+        index = suggest.Suggester(entries)
+        self.assertIn('ع', index.top)
+        for query in ('ع', 'عطر', 'عطر ع', 'عن', 'ورد 1'):
+            with self.subTest(query):
+                prefix = suggest.query_prefixes(query)[0]
+                expected = sorted(
+                    (entry for entry in entries if any(key.startswith(prefix) for key in suggest.index_keys(entry.label))),
+                    key=lambda entry: (-entry.weight, entry.id),
+                )[:8]
+                self.assertEqual(index.search(query, 8), expected)
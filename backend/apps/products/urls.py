@@ -1,16 +1,24 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, BrandViewSet, ProductViewSet, AdminProductViewSet, AdminVariantViewSet, AdminCategoryViewSet, AdminBrandViewSet
+from .views import (
+    CategoryViewSet, BrandViewSet, ProductViewSet, AdminProductViewSet, AdminVariantViewSet, AdminCategoryViewSet, AdminBrandViewSet,
+    CatalogueSnapshotView, CatalogueSnapshotVersionView, ScentNoteViewSet, AdminScentNoteViewSet, SuggestView,
+)
 
 router = DefaultRouter()
 router.register('categories', CategoryViewSet)
 router.register('brands', BrandViewSet)
 router.register('products', ProductViewSet, basename='product-public')
+router.register('notes', ScentNoteViewSet, basename='note-public')
 router.register('admin/products', AdminProductViewSet, basename='product-admin')
 router.register('admin/variants', AdminVariantViewSet, basename='variant-admin')
 router.register('admin/categories', AdminCategoryViewSet, basename='category-admin')
 router.register('admin/brands', AdminBrandViewSet, basename='brand-admin')
+router.register('admin/notes', AdminScentNoteViewSet, basename='note-admin')
 
 urlpatterns = [
+    path('suggest/', SuggestView.as_view(), name='product-suggest'),
+    path('snapshot/', CatalogueSnapshotView.as_view(), name='catalogue-snapshot'),
+    path('snapshot/<str:version>/', CatalogueSnapshotVersionView.as_view(), name='catalogue-snapshot-version'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,134 @@
+"""
+Bulk price and stock updates for variants, keyed by SKU.
+
+Changes come in as explicit per-SKU patches, or as a rule applied to
+every variant matching a filter (``10% off brand X``). Both paths lock
+the matching rows and compute the new values in Python, so the response
+reports the exact before/after of what was written. Only the rows that
+differ are written, with one ``bulk.update_rows`` call, inside a single
+transaction. Bulk writes send no signals, so product price summaries and
+the catalogue generation are refreshed once per batch.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import transaction
+from django.utils import timezone
+from .bulk import update_rows
+from .cache import bump_generation_on_commit
+from . import detail
+from .models import Product, ProductVariant
+
+FIELDS = ['price', 'sale_price', 'cost_price', 'stock_quantity', 'is_active']
+LOOKUP_CHUNK = 900
+
+
+def _money(value):
+    return value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _plain(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def _locked(queryset):
+    return queryset.select_for_update().only('id', 'sku', 'product_id', *FIELDS).order_by('id')
+
+
+def apply_changes(variants, new_values, dry_run=False):
+    """
+    Set ``new_values(variant)`` on each locked variant and write the ones
+    that changed. Must run inside a transaction; returns the diff summary.
+    """
+    now = timezone.now()
+    changed, diff, fields = [], [], set()
+    for variant in variants:
+        values = new_values(variant)
+        if values.get('sale_price') == 0:
+            # Same normalization as ProductVariant.save
+            values['sale_price'] = None
+        changes = {
+            field: [_plain(getattr(variant, field)), _plain(value)]
+            for field, value in values.items() if getattr(variant, field) != value
+        }
+        if not changes:
+            continue
+        for field in changes:
+            setattr(variant, field, values[field])
+        variant.updated_at = now
+        fields.update(changes)
+        changed.append(variant)
+        diff.append({'sku': variant.sku, 'changes': changes})
+
+    product_ids = {variant.product_id for variant in changed}
+    if changed and not dry_run:
+        update_rows(changed, sorted(fields) + ['updated_at'])
+        Product.objects.refresh_price_summary(product_ids)
+        bump_generation_on_commit()
+        detail.invalidate(product_ids)
+    return {
+        'dry_run': dry_run,
+        'matched': len(variants),
+        'updated': len(changed),
+        'products': len(product_ids),
+        'changes': diff,
+    }
+
+
+def patch_variants(patches, dry_run=False):
+    """
+    ``patches`` are validated ``{sku, field: value}`` dicts; ``stock_delta``
+    adjusts the stock relative to the locked row. Returns ``(summary, errors)``;
+    nothing is written when there are errors.
+    """
+    by_sku = {patch['sku']: patch for patch in patches}
+    skus = list(by_sku)
+    with transaction.atomic():
+        variants = []
+        for start in range(0, len(skus), LOOKUP_CHUNK):
+            variants.extend(_locked(ProductVariant.objects.filter(sku__in=skus[start:start + LOOKUP_CHUNK])))
+
+        errors = [
+            {'sku': variant.sku, 'stock_delta': 'لا يمكن أن يصبح المخزون سالباً'}
+            for variant in variants
+            if variant.stock_quantity + by_sku[variant.sku].get('stock_delta', 0) < 0
+        ]
+        if errors:
+            return None, errors
+
+        def new_values(variant):
+            values = {field: value for field, value in by_sku[variant.sku].items() if field in FIELDS}
+            if 'stock_delta' in by_sku[variant.sku]:
+                values['stock_quantity'] = variant.stock_quantity + by_sku[variant.sku]['stock_delta']
+            return values
+
+        summary = apply_changes(variants, new_values, dry_run=dry_run)
+    found = {variant.sku for variant in variants}
+    summary['missing'] = [sku for sku in skus if sku not in found]
+    return summary, []
+
+
+def rule_queryset(rule):
+    queryset = ProductVariant.objects.all()
+    if rule.get('brand'):
+        queryset = queryset.filter(product__brand__slug=rule['brand'])
+    if rule.get('category'):
+        queryset = queryset.filter(product__categories__slug=rule['category'])
+    if rule.get('product'):
+        queryset = queryset.filter(product__slug=rule['product'])
+    if rule.get('skus'):
+        queryset = queryset.filter(sku__in=rule['skus'])
+    return queryset
+
+
+def apply_rule(rule, dry_run=False):
+    """Apply one validated rule action to every variant matched by its filters."""
+    def new_values(variant):
+        if 'discount_percent' in rule:
+            return {'sale_price': _money(variant.price * (100 - rule['discount_percent']) / 100)}
+        if 'price_percent' in rule:
+            return {'price': _money(variant.price * (100 + rule['price_percent']) / 100)}
+        if rule.get('clear_sale'):
+            return {'sale_price': None}
+        return {'is_active': rule['is_active']}
+
+    with transaction.atomic():
+        return apply_changes(list(_locked(rule_queryset(rule))), new_values, dry_run=dry_run)
@@ -1,14 +1,41 @@
-from django.db.models import Min, Case, When, F, DecimalField
-from rest_framework import viewsets, filters, permissions, status
-from rest_framework.response import Response
+import tempfile
+from django.conf import settings
+from django.db.models import Max
+from django.http import FileResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import viewsets, filters, permissions, serializers, status
 from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, Brand, FragranceFamily, Product, ProductVariant, ProductImage, ProductNote
+from .models import Category, Brand, FragranceFamily, Product, ProductVariant, ProductImage, ProductNote, ScentNote
 from .serializers import (
     CategorySerializer, BrandSerializer, FragranceFamilySerializer,
-    ProductListSerializer, ProductDetailSerializer, ProductVariantSerializer
+    ProductListSerializer, ProductDetailSerializer, ProductVariantSerializer,
+    VariantPatchSerializer, VariantRuleSerializer, ScentNoteSerializer, ScentNoteMergeSerializer
 )
+from .cache import cached_response, conditional_response, response_stats
+from .counters import record_view
+from .facets import get_facets
+from .fieldsets import SparseFieldsetViewMixin, shape_queryset
+from .pagination import KeysetPagination
+from .search import ProductSearchFilter
+from . import catalogue_io, detail, notes, snapshot, suggest, variant_updates
+
+
+INVALID_FLAG = '{name} يجب أن تكون true أو false'
+
+
+def parse_bool(value, default=False):
+    """A form string ('1', 'true', 'false', ...) or a JSON boolean; None when it is neither."""
+    if value is None or value == '':
+        return default
+    try:
+        return serializers.BooleanField().to_internal_value(value)
+    except serializers.ValidationError:
+        return None
 
 class AdminCategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
@@ -28,52 +55,146 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
 
+    list = cached_response(viewsets.ReadOnlyModelViewSet.list)
+    retrieve = cached_response(viewsets.ReadOnlyModelViewSet.retrieve)
+
 class BrandViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Brand.objects.filter(is_active=True)
     serializer_class = BrandSerializer
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+    list = cached_response(viewsets.ReadOnlyModelViewSet.list)
+    retrieve = cached_response(viewsets.ReadOnlyModelViewSet.retrieve)
+
+class ScentNoteViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = ScentNote.objects.prefetch_related('aliases')
+    serializer_class = ScentNoteSerializer
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    pagination_class = None
+    lookup_field = 'slug'
+    lookup_value_regex = '[^/]+'
+
+    list = cached_response(viewsets.ReadOnlyModelViewSet.list)
+    retrieve = cached_response(viewsets.ReadOnlyModelViewSet.retrieve)
+
+class AdminScentNoteViewSet(viewsets.ModelViewSet):
+    queryset = ScentNote.objects.prefetch_related('aliases')
+    serializer_class = ScentNoteSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['name_ar', 'slug', 'aliases__key']
+
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """Fold duplicate spellings into this note: ``{"sources": [ids]}``."""
+        target = self.get_object()
+        serializer = ScentNoteMergeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'error': 'قائمة المكونات غير صالحة', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        summary = notes.merge(target, serializer.validated_data['sources'])
+        return Response({**summary, 'note': ScentNoteSerializer(ScentNote.objects.prefetch_related('aliases').get(pk=target.pk)).data})
+
+class ProductViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     authentication_classes = []
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # ?notes= goes through the in-memory posting lists (products.notes), not joins
+    filter_backends = [DjangoFilterBackend, notes.NoteFilter, ProductSearchFilter, filters.OrderingFilter]
     filterset_fields = {
         'categories__slug': ['exact'],
         'brand__slug': ['exact'],
         'gender': ['exact'],
         'is_featured': ['exact'],
         'is_new': ['exact'],
+        'fragrance_families': ['exact'],
+        'min_price': ['gte', 'lte', 'lt'],
+        'in_stock': ['exact'],
+        'has_discount': ['exact'],
     }
-    search_fields = ['name_ar', 'description']
+    # Ranked through the Arabic search index (products.search), not search_fields
     ordering_fields = ['created_at', 'sales_count', 'view_count', 'min_price']
+    # ?cursor= switches the grid to keyset pagination on one of these
+    pagination_class = KeysetPagination
+    cursor_ordering_fields = ['created_at', 'sales_count', 'view_count', 'min_price']
     lookup_field = 'slug'
 
     def get_queryset(self):
-        # Annotate min_price for sorting
-        return Product.objects.filter(is_active=True).annotate(
-            min_price=Min(
-                Case(
-                    When(variants__sale_price__isnull=False, then=F('variants__sale_price')),
-                    default=F('variants__price'),
-                    output_field=DecimalField()
-                )
-            )
-        ).select_related('brand').prefetch_related('variants', 'categories').order_by('-created_at')
+        # min_price is a maintained column (see products.signals), no aggregation needed
+        return Product.objects.filter(is_active=True).select_related('brand').prefetch_related('categories').order_by('-created_at')
+
+    def last_modified(self, request, kwargs):
+        changed = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            Max('updated_at'), Max('variants__updated_at'), Max('images__updated_at'),
+        )
+        return max(filter(None, changed.values()), default=None)
+
+    # Served from the versioned catalogue cache (products.cache), with ETag/Last-Modified
+    list = conditional_response(last_modified)(cached_response(viewsets.ReadOnlyModelViewSet.list))
+
+    def retrieve(self, request, *args, **kwargs):
+        # Fixed-query loader with a per-product payload cache (products.detail)
+        response = detail.respond(self, request, kwargs['slug'])
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            # Buffered in memory and flushed after the response (products.counters)
+            record_view(kwargs['slug'])
+        return response
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        return Response(get_facets(self, request))
+
+    @action(detail=False, methods=['get'])
+    @cached_response
+    def batch(self, request):
+        """Hydrate many products (?ids= / ?slugs=) or variants (?skus=) in request order."""
+        keys = [key for key in ('ids', 'slugs', 'skus') if request.query_params.get(key)]
+        if len(keys) != 1:
+            return Response({'error': 'حدد أحد المعاملات: ids أو slugs أو skus'}, status=status.HTTP_400_BAD_REQUEST)
+        key = keys[0]
+        values = list(dict.fromkeys(v.strip() for v in request.query_params[key].split(',') if v.strip()))
+        max_size = getattr(settings, 'PRODUCT_BATCH_MAX_SIZE', 50)
+        if len(values) > max_size:
+            return Response({'error': f'الحد الأقصى {max_size} عنصراً في الطلب الواحد'}, status=status.HTTP_400_BAD_REQUEST)
+        if key == 'ids':
+            if not all(v.isdigit() for v in values):
+                return Response({'error': 'ids يجب أن تكون أرقاماً'}, status=status.HTTP_400_BAD_REQUEST)
+            values = [int(v) for v in values]
+
+        if key == 'skus':
+            qs = ProductVariant.objects.filter(sku__in=values, is_active=True, product__is_active=True)
+            serializer_class, lookup = ProductVariantSerializer, 'sku'
+        else:
+            lookup = 'id' if key == 'ids' else 'slug'
+            qs = self.get_queryset().filter(**{f'{lookup}__in': values})
+            serializer_class = ProductListSerializer
+        found = {getattr(obj, lookup): obj for obj in shape_queryset(qs, serializer_class, request)}
+
+        ordered = [found[v] for v in values if v in found]
+        serializer = serializer_class(ordered, many=True, context=self.get_serializer_context())
+        return Response({'results': serializer.data, 'missing': [v for v in values if v not in found]})
 
     @action(detail=True, methods=['get'])
+    @cached_response
     def related(self, request, slug=None):
-        product = self.get_object()
-        
-        # Base queryset: active products excluding current
-        qs = Product.objects.filter(is_active=True).exclude(id=product.id)
-        
-        # Scoring logic using Annotate
-        from django.db.models import Case, When, IntegerField, F, Count
-        
+        # Precomputed by products.similarity; one indexed lookup on (product, rank)
+        qs = Product.objects.filter(
+            is_active=True, recommended_in__product__slug=slug, recommended_in__product__is_active=True,
+        ).select_related('brand').prefetch_related('categories').order_by('recommended_in__rank')[:4]
+        related = list(qs)
+        if not related:
+            related = self.live_related(self.get_object())
+
+        serializer = ProductListSerializer(related, many=True)
+        return Response(serializer.data)
+
+    def live_related(self, product):
+        """Fallback scoring for products the similarity table has not caught up with yet."""
+        from django.db.models import Case, When, IntegerField
+
         category_ids = product.categories.values_list('id', flat=True)
-        
-        qs = qs.annotate(
+
+        return Product.objects.filter(is_active=True).exclude(id=product.id).annotate(
             score=Case(
                 When(gender=product.gender, then=3),
                 default=0,
@@ -87,28 +208,153 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 default=0,
                 output_field=IntegerField(),
             )
-        ).order_by('-score', '-created_at').distinct()[:4]
-        
-        serializer = ProductListSerializer(qs, many=True)
-        return Response(serializer.data)
+        ).select_related('brand').prefetch_related('categories').order_by('-score', '-created_at').distinct()[:4]
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ProductDetailSerializer
         return ProductListSerializer
 
-class AdminProductViewSet(viewsets.ModelViewSet):
+class AdminProductViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAdminUser]
     serializer_class = ProductDetailSerializer
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['name_ar', 'slug']
     filterset_fields = {'categories__slug': ['exact']}
+    pagination_class = KeysetPagination
+    cursor_ordering_fields = ['created_at', 'sales_count', 'min_price']
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        return Response(response_stats())
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_catalogue(self, request):
+        """Bulk-load a CSV/XLSX/JSONL catalogue file (see products.catalogue_io)."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'يرجى إرفاق ملف'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or catalogue_io.detect_format(upload.name)
+        flags = {name: parse_bool(request.data.get(name)) for name in ('dry_run', 'skip_invalid')}
+        for name, value in flags.items():
+            if value is None:
+                return Response({'error': INVALID_FLAG.format(name=name)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            summary = catalogue_io.import_catalogue(upload, file_format, **flags)
+        except catalogue_io.CatalogueFileError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if summary['errors'] and not summary['committed']:
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the (filtered) catalogue; ``?file_format=csv|jsonl|xlsx``."""
+        # ``format`` is taken by DRF's renderer negotiation
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in catalogue_io.FORMATS:
+            return Response({'error': 'الصيغ المدعومة: ' + ', '.join(catalogue_io.FORMATS)}, status=status.HTTP_400_BAD_REQUEST)
+        rows = catalogue_io.export_rows(self.filter_queryset(Product.objects.all()))
+        filename = f'catalogue-{timezone.localdate():%Y%m%d}.{file_format}'
+        if file_format == 'xlsx':
+            fh = tempfile.TemporaryFile()
+            catalogue_io.write_xlsx(rows, fh)
+            fh.seek(0)
+            return FileResponse(fh, as_attachment=True, filename=filename, content_type=catalogue_io.XLSX_CONTENT_TYPE)
+        if file_format == 'csv':
+            response = StreamingHttpResponse(catalogue_io.stream_csv(rows), content_type='text/csv; charset=utf-8')
+        else:
+            response = StreamingHttpResponse(catalogue_io.stream_jsonl(rows), content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
     def get_queryset(self):
         return Product.objects.all().select_related('brand').prefetch_related('variants', 'notes', 'images', 'fragrance_families', 'categories').order_by('-created_at')
 
-class AdminVariantViewSet(viewsets.ModelViewSet):
+class AdminVariantViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = ProductVariant.objects.all()
     permission_classes = [permissions.IsAdminUser]
     serializer_class = ProductVariantSerializer
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """Price/stock changes for many SKUs in one transaction: ``{"patches": [...]}`` or ``{"rule": {...}}``."""
+        dry_run = parse_bool(request.data.get('dry_run'))
+        if dry_run is None:
+            return Response({'error': INVALID_FLAG.format(name='dry_run')}, status=status.HTTP_400_BAD_REQUEST)
+        if ('patches' in request.data) == ('rule' in request.data):
+            return Response({'error': 'أرسل patches أو rule'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if 'rule' in request.data:
+            serializer = VariantRuleSerializer(data=request.data['rule'])
+            if not serializer.is_valid():
+                return Response({'error': 'قاعدة غير صالحة', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(variant_updates.apply_rule(serializer.validated_data, dry_run=dry_run))
+
+        patches = request.data['patches']
+        max_size = getattr(settings, 'VARIANT_BULK_UPDATE_MAX_SIZE', 10000)
+        if not isinstance(patches, list) or not patches:
+            return Response({'error': 'patches يجب أن تكون قائمة غير فارغة'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(patches) > max_size:
+            return Response({'error': f'الحد الأقصى {max_size} عنصراً في الطلب الواحد'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = VariantPatchSerializer(data=patches, many=True)
+        if not serializer.is_valid():
+            return Response({'error': 'بعض العناصر غير صالحة', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        skus = [patch['sku'] for patch in serializer.validated_data]
+        if len(set(skus)) != len(skus):
+            return Response({'error': 'رموز SKU مكررة في الطلب'}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary, errors = variant_updates.patch_variants(serializer.validated_data, dry_run=dry_run)
+        if errors:
+            return Response({'error': 'بعض العناصر غير صالحة', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
+
+
+class SuggestView(APIView):
+    """Typeahead for the storefront search box, answered from memory (products.suggest)."""
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        limit = request.query_params.get('limit', '8')
+        max_size = getattr(settings, 'SUGGEST_MAX_RESULTS', 20)
+        if not limit.isdigit() or not 0 < int(limit) <= max_size:
+            return Response({'error': f'limit يجب أن يكون بين 1 و {max_size}'}, status=status.HTTP_400_BAD_REQUEST)
+        results = suggest.get_suggester().search(query, int(limit)) if query else []
+        response = Response({'query': query, 'results': [suggest.serialize(entry) for entry in results]})
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'SUGGEST_CACHE_MAX_AGE', 60)}"
+        return response
+
+
+class CatalogueSnapshotView(APIView):
+    """Redirect to the current static catalogue snapshot (products.snapshot)."""
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        manifest = snapshot.current()
+        if manifest is None:
+            return Response({'error': 'نسخة الكتالوج غير متوفرة بعد'}, status=status.HTTP_404_NOT_FOUND)
+        response = HttpResponseRedirect(reverse('catalogue-snapshot-version', args=[manifest['version']]))
+        # The pointer moves with every rebuild; the version it names never changes
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class CatalogueSnapshotVersionView(APIView):
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request, version):
+        opened = snapshot.open_version(version, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if opened is None:
+            return Response({'error': 'نسخة الكتالوج غير موجودة'}, status=status.HTTP_404_NOT_FOUND)
+        fh, encoding = opened
+        response = FileResponse(fh, content_type='application/json', filename=f'snapshot.{version}.json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
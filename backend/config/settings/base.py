@@ -3,6 +3,7 @@ import sys
 from pathlib import Path
 import environ
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 # BASE_DIR is now /backend
@@ -103,6 +104,18 @@ DATABASES = {
     'default': env.db('DATABASE_URL', default=f"sqlite:///{os.path.join(BASE_DIR, 'db.sqlite3')}")
 }
 
+# Cache
+# Every worker process must see the same cache: a change bumps the catalogue
+# generation and clears entries in the process that made it only. The
+# default is a file-based cache under BASE_DIR/cache; set CACHE_URL for
+# Redis (redis://127.0.0.1:6379/1, needs the redis package). A locmem
+# cache would leave other workers serving stale data.
+CACHES = {
+    'default': env.cache('CACHE_URL', default=f"filecache://{os.path.join(BASE_DIR, 'cache')}")
+}
+# The file backend culls a third of its entries past MAX_ENTRIES (default 300)
+CACHES['default'].setdefault('OPTIONS', {}).setdefault('MAX_ENTRIES', 20000)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -163,6 +176,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5175",
 ]
 CORS_ALLOW_CREDENTIALS = True
+# Checkout retries carry a key so the order is placed once (orders.idempotency)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
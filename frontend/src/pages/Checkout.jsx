@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import useCartStore from '../store/cartStore';
 import { ordersApi } from '../services/api';
 import {
@@ -24,6 +24,7 @@ const Checkout = () => {
     const { cart, clearCart, coupon, applyCoupon, removeCoupon } = useCartStore();
     const navigate = useNavigate();
     const [loading, setLoading] = useState(false);
+    const orderKey = useRef(null);
     const [step, setStep] = useState(1);
 
     // Coupon State
@@ -92,8 +93,15 @@ const Checkout = () => {
         }
     };
 
+    const newOrderKey = () => (window.crypto?.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`);
+
     const handleSubmit = async () => {
+        if (loading) return;
         setLoading(true);
+        // One key per order, kept across retries and double taps
+        if (!orderKey.current) orderKey.current = newOrderKey();
         try {
             const orderData = {
                 ...formData,
@@ -104,12 +112,16 @@ const Checkout = () => {
                 coupon_code: coupon ? coupon.code : null
             };
 
-            const res = await ordersApi.create(orderData);
+            const res = await ordersApi.create(orderData, orderKey.current);
+            orderKey.current = null;
             clearCart();
             toast.success('تم استلام طلبك بنجاح!');
             navigate(`/track?order_number=${res.data.order_number}`);
         } catch (error) {
             console.error('Order error', error);
+            const code = error.response?.status;
+            // A definite answer ends this attempt; timeouts, 409 and 5xx keep the key so a retry is safe
+            if (code && code < 500 && code !== 409) orderKey.current = null;
             const msg = error.response?.data?.error || error.response?.data?.message || 'حدث خطأ أثناء إتمام الطلب';
             toast.error(msg);
         } finally {
@@ -29,6 +29,7 @@ const DashboardCoupons = () => {
         valid_from: new Date().toISOString().split('T')[0],
         valid_to: new Date(Date.now() + 7 * 24 * 60 * 60 * 1000).toISOString().split('T')[0],
         usage_limit: null,
+        per_customer_limit: null,
         is_active: true,
         max_discount_amount: null
     });
@@ -61,6 +62,7 @@ const DashboardCoupons = () => {
                 valid_from: item.valid_from.split('T')[0],
                 valid_to: item.valid_to.split('T')[0],
                 usage_limit: item.usage_limit,
+                per_customer_limit: item.per_customer_limit,
                 is_active: item.is_active,
                 max_discount_amount: item.max_discount_amount
             });
@@ -74,6 +76,8 @@ const DashboardCoupons = () => {
                 valid_from: new Date().toISOString().split('T')[0],
                 valid_to: new Date(Date.now() + 7 * 24 * 60 * 60 * 1000).toISOString().split('T')[0],
                 usage_limit: null,
+                per_customer_limit: null,
+        per_customer_limit: null,
                 is_active: true,
                 max_discount_amount: null
             });
@@ -328,6 +332,16 @@ const DashboardCoupons = () => {
                                         placeholder="اتركه فارغاً للاستخدام غير المحدود"
                                     />
                                 </div>
+                                <div className="space-y-2">
+                                    <label className="text-sm font-bold text-text-secondary dark:text-gold-400 pr-1">عدد المرات لكل عميل</label>
+                                    <input
+                                        type="number"
+                                        value={formData.per_customer_limit || ''}
+                                        onChange={(e) => setFormData({ ...formData, per_customer_limit: e.target.value ? parseInt(e.target.value) : null })}
+                                        className="w-full bg-cream-50 dark:bg-dark-600 border border-gold-50 dark:border-dark-600 px-5 py-3.5 rounded-2xl focus:outline-none focus:ring-2 focus:ring-gold-500/20 text-text-primary dark:text-cream-50"
+                                        placeholder="اتركه فارغاً بلا حد لكل عميل"
+                                    />
+                                </div>
                                 <div className="space-y-2">
                                     <label className="text-sm font-bold text-text-secondary dark:text-gold-400 pr-1">أقصى قيمة للخصم</label>
                                     <input
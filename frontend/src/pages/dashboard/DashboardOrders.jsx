@@ -60,6 +60,18 @@ const DashboardOrders = () => {
         fetchOrders();
     }, [fetchOrders]);
 
+    const openOrder = async (order) => {
+        // The list rows are summaries; items and history come with the detail
+        setSelectedOrder(order);
+        try {
+            const res = await ordersApi.getDetail(order.id);
+            setSelectedOrder((current) => (current && current.id === order.id ? res.data : current));
+        } catch (error) {
+            console.error(error);
+            toast.error('تعذر تحميل تفاصيل الطلب');
+        }
+    };
+
     const handleUpdateStatus = async (orderId, newStatus) => {
         try {
             await ordersApi.updateStatus(orderId, { status: newStatus });
@@ -163,7 +175,7 @@ const DashboardOrders = () => {
                                             <td className="px-8 py-5">
                                                 <div className="flex items-center justify-end gap-2">
                                                     <button
-                                                        onClick={() => setSelectedOrder(order)}
+                                                        onClick={() => openOrder(order)}
                                                         className="p-2 text-text-muted dark:text-gold-400 hover:text-gold-600 bg-gray-50 dark:bg-dark-600 rounded-xl transition-all"
                                                     >
                                                         <Eye size={18} />
@@ -70,9 +70,17 @@ export const accountsApi = {
 
 export const productsApi = {
     getAll: (params) => api.get('products/products/', { params }),
+    getFacets: (params) => api.get('products/products/facets/', { params }),
+    // Typeahead for the search box; answered from memory on the server
+    suggest: (q, limit = 8) => api.get('products/suggest/', { params: { q, limit } }),
     getDetail: (slug) => api.get(`products/products/${slug}/`),
+    getBatch: (params) => api.get('products/products/batch/', { params }),
+    // Whole active catalogue as one static, precompressed file
+    getSnapshot: () => api.get('products/snapshot/'),
     getCategories: () => api.get('products/categories/'),
     getBrands: () => api.get('products/brands/'),
+    // Scent-note vocabulary; filter the list with ?notes=<slug>,base:<slug>&notes_match=any
+    getNotes: () => api.get('products/notes/'),
     getRelated: (slug) => api.get(`products/products/${slug}/related/`),
 };
 
@@ -86,8 +94,11 @@ export const cartApi = {
 
 export const ordersApi = {
     getAll: (params) => api.get('orders/', { params }),
-    create: (data) => api.post('orders/', data),
-    getDetail: (number) => api.get(`orders/${number}/`),
+    // The same key on a retry returns the first order instead of placing another
+    create: (data, idempotencyKey) => api.post('orders/', data, {
+        headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+    }),
+    getDetail: (id) => api.get(`orders/${id}/`),
     track: (number, phone) => api.get('orders/track/', { params: { order_number: number, phone } }),
     updateStatus: (id, data) => api.patch(`orders/${id}/update_status/`, data),
 };
@@ -111,6 +122,7 @@ export const marketingApi = {
     update: (code, data) => api.patch(`marketing/coupons/${encodeURIComponent(code)}/`, data),
     delete: (code) => api.delete(`marketing/coupons/${encodeURIComponent(code)}/`),
     validateCoupon: (code, cartTotal) => api.post('marketing/coupons/validate/', { code, cart_total: cartTotal }),
+    getRedemptions: (code, params) => api.get(`marketing/coupons/${encodeURIComponent(code)}/redemptions/`, { params }),
 };
 
 export const crmApi = {
@@ -137,6 +149,7 @@ export const adminVariantsApi = {
     create: (data) => api.post('products/admin/variants/', data, { headers: { 'Content-Type': 'multipart/form-data' } }),
     update: (id, data) => api.patch(`products/admin/variants/${id}/`, data, { headers: { 'Content-Type': 'multipart/form-data' } }),
     delete: (id) => api.delete(`products/admin/variants/${id}/`),
+    bulkUpdate: (data) => api.post('products/admin/variants/bulk-update/', data),
 };
 
 export const adminCategoriesApi = {
@@ -153,6 +166,13 @@ export const adminBrandsApi = {
     delete: (id) => api.delete(`products/admin/brands/${id}/`),
 };
 
+export const adminNotesApi = {
+    getAll: (params) => api.get('products/admin/notes/', { params }),
+    update: (id, data) => api.patch(`products/admin/notes/${id}/`, data),
+    merge: (id, sources) => api.post(`products/admin/notes/${id}/merge/`, { sources }),
+    delete: (id) => api.delete(`products/admin/notes/${id}/`),
+};
+
 export const analyticsApi = {
     getStats: (params) => api.get('analytics/stats/', { params }),
     getInventory: () => api.get('analytics/inventory/'),